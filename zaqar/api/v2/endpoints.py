@@ -295,16 +295,33 @@ class Endpoints(object):
 
             client_uuid = api_utils.get_client_uuid(req)
 
+            wait = req._body.get('wait')
+            if wait is not None:
+                wait = int(wait)
+
             self._validate.message_listing(**kwargs)
-            results = self._message_controller.list(
-                queue_name,
-                project=project_id,
-                client_uuid=client_uuid,
-                **kwargs)
+            self._validate.message_wait(wait)
+
+            def list_messages():
+                results = self._message_controller.list(
+                    queue_name,
+                    project=project_id,
+                    client_uuid=client_uuid,
+                    **kwargs)
+
+                # Buffer messages
+                messages = list(next(results))
+                if messages:
+                    return results, messages
+
+            if wait:
+                listing = self._message_controller.long_poll(
+                    queue_name, list_messages, project=project_id,
+                    timeout=wait)
+            else:
+                listing = list_messages()
 
-            # Buffer messages
-            cursor = next(results)
-            messages = list(cursor)
+            results, messages = listing or (None, [])
         except (ValueError, api_errors.BadRequest,
                 validation.ValidationFailed) as ex:
             LOG.debug(ex)
@@ -651,21 +668,38 @@ class Endpoints(object):
         claim_options = {} if limit is None else {'limit': limit}
 
         try:
+            wait = req._body.get('wait')
+            if wait is not None:
+                wait = int(wait)
+
             self._validate.claim_creation(metadata, limit=limit)
+            self._validate.message_wait(wait)
         except (ValueError, validation.ValidationFailed) as ex:
             LOG.debug(ex)
             headers = {'status': 400}
             return api_utils.error_response(req, ex, headers)
 
-        cid, msgs = self._claim_controller.create(
-            queue_name,
-            metadata=metadata,
-            project=project_id,
-            **claim_options)
+        def claim_messages():
+            cid, msgs = self._claim_controller.create(
+                queue_name,
+                metadata=metadata,
+                project=project_id,
+                **claim_options)
+
+            # Buffer claimed messages
+            # TODO(vkmc): optimize, along with serialization (below)
+            resp_msgs = list(msgs)
+            if resp_msgs:
+                return cid, resp_msgs
+
+        if wait:
+            claimed = self._claim_controller.long_poll(
+                queue_name, claim_messages, project=project_id,
+                timeout=wait)
+        else:
+            claimed = claim_messages()
 
-        # Buffer claimed messages
-        # TODO(vkmc): optimize, along with serialization (below)
-        resp_msgs = list(msgs)
+        cid, resp_msgs = claimed or (None, [])
 
         # Serialize claimed messages, if any. This logic assumes
         # the storage driver returned well-formed messages.
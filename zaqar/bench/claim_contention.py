@@ -0,0 +1,137 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark for claiming messages from the MongoDB message store.
+
+Runs a number of concurrent claimers against a single queue until it
+is drained, once with each claim strategy supported by the MongoDB
+driver, and reports how many messages each claim request got and how
+long it took. It runs against the message store configured in
+zaqar.conf:
+
+    python -m zaqar.bench.claim_contention \
+        --config-file /etc/zaqar/zaqar.conf
+"""
+
+from __future__ import print_function
+
+import threading
+import time
+import uuid
+
+from oslo_config import cfg
+
+from zaqar import bootstrap
+from zaqar.storage.mongodb import options
+
+CONF = cfg.CONF
+_CLI_OPTIONS = (
+    cfg.IntOpt('contention_claimers', default=10, min=1,
+               help='Number of concurrent claimers'),
+    cfg.IntOpt('contention_messages', default=5000, min=1,
+               help='Number of messages to post for each strategy'),
+    cfg.IntOpt('contention_limit', default=10, min=1,
+               help='Number of messages to claim at a time'),
+    cfg.StrOpt('contention_queue', default='zaqar-bench-claims',
+               help=('Name of the queue used for the benchmark. It is '
+                     'deleted once the benchmark completes.')),
+)
+
+_STRATEGIES = ('batch', 'atomic')
+
+_POST_BATCH_SIZE = 100
+
+
+def _claimer(claim_ctrl, queue, results):
+    while True:
+        start = time.time()
+        claim_id, messages = claim_ctrl.create(queue,
+                                               {'ttl': 300, 'grace': 0},
+                                               limit=CONF.contention_limit)
+        if claim_id is None:
+            # NOTE: The queue has been drained
+            break
+
+        # NOTE: Claims may come back empty when other claimers got
+        # to the messages first, which is counted as a request too.
+        results.append((time.time() - start, len(list(messages))))
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _run(strategy, storage, queue):
+    CONF.set_override('claim_strategy', strategy,
+                      group=options.MESSAGE_MONGODB_GROUP)
+
+    storage.queue_controller.create(queue)
+    try:
+        client_uuid = str(uuid.uuid4())
+        for i in range(0, CONF.contention_messages, _POST_BATCH_SIZE):
+            num = min(_POST_BATCH_SIZE, CONF.contention_messages - i)
+            storage.message_controller.post(
+                queue, [{'ttl': 600, 'body': {'n': i + n}}
+                        for n in range(num)], client_uuid)
+
+        results = []
+        threads = [threading.Thread(target=_claimer,
+                                    args=(storage.claim_controller, queue,
+                                          results))
+                   for _ in range(CONF.contention_claimers)]
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.time() - start
+
+    finally:
+        storage.queue_controller.delete(queue)
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    num_claimed = sum(n for _, n in results)
+
+    stats = {
+        'duration_sec': duration,
+        'messages_claimed': num_claimed,
+        'claim_requests': len(results),
+        'claimed_per_request': float(num_claimed) / len(results),
+        'short_claims_pct': (100.0 * sum(1 for _, n in results
+                                         if n < CONF.contention_limit) /
+                             len(results)),
+        'ms_per_claim': sum(latencies) / len(latencies),
+        'ms_per_claim_p50': _percentile(latencies, 50),
+        'ms_per_claim_p99': _percentile(latencies, 99),
+    }
+
+    name = 'Claim strategy: ' + strategy
+    print(name)
+    print('=' * len(name))
+    print('\n'.join('{}: {:.1f}'.format(*v) for v in sorted(stats.items())))
+    print()  # Blank line
+
+
+def main():
+    CONF.register_cli_opts(_CLI_OPTIONS)
+    CONF(project='zaqar', prog='zaqar-bench-claim-contention')
+
+    storage = bootstrap.Bootstrap(CONF).storage
+
+    for strategy in _STRATEGIES:
+        _run(strategy, storage, CONF.contention_queue)
+
+
+if __name__ == '__main__':
+    main()
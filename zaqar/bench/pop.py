@@ -0,0 +1,106 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark for popping messages directly from the message store.
+
+Compares the driver's native pop implementation against the chain of
+claim create, bulk delete and claim delete that pop used to be built
+on. Both run against the message store configured in zaqar.conf:
+
+    python -m zaqar.bench.pop --config-file /etc/zaqar/zaqar.conf
+"""
+
+from __future__ import print_function
+
+import time
+import uuid
+
+from oslo_config import cfg
+
+from zaqar import bootstrap
+
+CONF = cfg.CONF
+_CLI_OPTIONS = (
+    cfg.IntOpt('pop_rounds', default=100,
+               help='Number of pop operations to time for each strategy'),
+    cfg.IntOpt('pop_limit', default=10,
+               help='Number of messages to pop at a time'),
+    cfg.StrOpt('pop_queue', default='zaqar-bench-pop',
+               help=('Name of the queue used for the benchmark. It is '
+                     'deleted once the benchmark completes.')),
+)
+
+
+def _pop(storage, queue, limit):
+    return storage.message_controller.pop(queue, limit)
+
+
+def _claim_and_delete(storage, queue, limit):
+    claim_ctrl = storage.claim_controller
+
+    claim_id, messages = claim_ctrl.create(queue, {'ttl': 1, 'grace': 0},
+                                           limit=limit)
+    messages = list(messages)
+
+    storage.message_controller.bulk_delete(queue,
+                                           [msg['id'] for msg in messages])
+    if claim_id:
+        claim_ctrl.delete(queue, claim_id)
+
+    return messages
+
+
+def _run(name, func, storage, queue):
+    num_messages = CONF.pop_rounds * CONF.pop_limit
+    storage.message_controller.post(
+        queue, [{'ttl': 300, 'body': {'n': i}} for i in range(num_messages)],
+        str(uuid.uuid4()))
+
+    num_popped = 0
+    start = time.time()
+
+    for _ in range(CONF.pop_rounds):
+        num_popped += len(func(storage, queue, CONF.pop_limit))
+
+    duration = time.time() - start
+
+    stats = {
+        'duration_sec': duration,
+        'messages_popped': num_popped,
+        'ms_per_pop': duration * 1000 / CONF.pop_rounds,
+        'pops_per_sec': CONF.pop_rounds / duration,
+    }
+
+    print(name)
+    print('=' * len(name))
+    print('\n'.join('{}: {:.1f}'.format(*v) for v in sorted(stats.items())))
+    print()  # Blank line
+
+
+def main():
+    CONF.register_cli_opts(_CLI_OPTIONS)
+    CONF(project='zaqar', prog='zaqar-bench-pop')
+
+    storage = bootstrap.Bootstrap(CONF).storage
+    queue = CONF.pop_queue
+
+    storage.queue_controller.create(queue)
+    try:
+        _run('Pop', _pop, storage, queue)
+        _run('Claim + bulk delete', _claim_and_delete, storage, queue)
+    finally:
+        storage.queue_controller.delete(queue)
+
+
+if __name__ == '__main__':
+    main()
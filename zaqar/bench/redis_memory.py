@@ -0,0 +1,122 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark for the memory used by messages in the Redis message store.
+
+Writes the same messages with each of the encodings supported by the
+Redis driver, and reports how much memory the Redis server used to
+store them. It runs against the Redis server configured in zaqar.conf:
+
+    python -m zaqar.bench.redis_memory --config-file /etc/zaqar/zaqar.conf
+"""
+
+from __future__ import print_function
+
+import uuid
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+from zaqar import bootstrap
+from zaqar.storage.redis import driver
+from zaqar.storage.redis import models
+
+CONF = cfg.CONF
+_CLI_OPTIONS = (
+    cfg.IntOpt('memory_messages', default=10000,
+               help='Number of messages to write for each encoding'),
+    cfg.IntOpt('memory_body_size', default=256,
+               help='Approximate size of the message bodies, in bytes'),
+    cfg.StrOpt('memory_key_prefix', default='zaqar-bench-memory.',
+               help=('Prefix of the keys used for the benchmark. They '
+                     'are deleted once the benchmark completes.')),
+)
+
+# (name, compact, compression threshold)
+_ENCODINGS = (
+    ('Hash', False, 0),
+    ('Compact', True, 0),
+    ('Compact + compression', True, 128),
+)
+
+_BATCH_SIZE = 1000
+
+
+def _make_body(size):
+    # NOTE: Make the body look like typical JSON payloads, which are
+    # repetitive enough to compress reasonably well.
+    words = ('status', 'event', 'resource', 'instance', 'updated')
+    body = {}
+    i = 0
+    while len(str(body)) < size:
+        body['%s_%d' % (words[i % len(words)], i)] = i * 37
+        i += 1
+
+    return body
+
+
+def _used_memory(client):
+    return client.info('memory')['used_memory']
+
+
+def _run(name, client, compact, compression_threshold):
+    num_messages = CONF.memory_messages
+    body = _make_body(CONF.memory_body_size)
+    client_uuid = str(uuid.uuid4())
+    now = timeutils.utcnow_ts()
+
+    keys = [CONF.memory_key_prefix + str(i) for i in range(num_messages)]
+    before = _used_memory(client)
+
+    for i in range(0, num_messages, _BATCH_SIZE):
+        with client.pipeline() as pipe:
+            for key in keys[i:i + _BATCH_SIZE]:
+                msg = models.Message(ttl=3600, created=now,
+                                     client_uuid=client_uuid,
+                                     claim_id=None, claim_expires=now,
+                                     compact=compact, body=body)
+                msg.to_redis(pipe, key,
+                             compression_threshold=compression_threshold)
+
+            pipe.execute()
+
+    used = _used_memory(client) - before
+
+    for i in range(0, num_messages, _BATCH_SIZE):
+        client.delete(*keys[i:i + _BATCH_SIZE])
+
+    stats = {
+        'bytes_per_message': float(used) / num_messages,
+        'total_mb': used / (1024.0 * 1024.0),
+    }
+
+    print(name)
+    print('=' * len(name))
+    print('\n'.join('{}: {:.1f}'.format(*v) for v in sorted(stats.items())))
+    print()  # Blank line
+
+
+def main():
+    CONF.register_cli_opts(_CLI_OPTIONS)
+    CONF(project='zaqar', prog='zaqar-bench-redis-memory')
+
+    server = bootstrap.Bootstrap(CONF)
+    data_driver = driver.DataDriver(CONF, server.cache, server.control)
+    client = data_driver.connection
+
+    for name, compact, compression_threshold in _ENCODINGS:
+        _run(name, client, compact, compression_threshold)
+
+
+if __name__ == '__main__':
+    main()
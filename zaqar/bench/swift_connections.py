@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark for the connections made to Swift by the Swift driver.
+
+Makes a number of small object requests through the client of the
+Swift driver, from a few concurrent threads, once without keeping
+connections open between requests, which is how the driver used to
+behave, and once with the connection pool, then reports the latency
+of each request. It runs against the Swift message store configured
+in zaqar.conf:
+
+    python -m zaqar.bench.swift_connections \
+        --config-file /etc/zaqar/zaqar.conf
+"""
+
+from __future__ import print_function
+
+import threading
+import time
+
+from oslo_config import cfg
+
+from zaqar.storage.swift import driver
+from zaqar.storage.swift import options
+
+CONF = cfg.CONF
+_CLI_OPTIONS = (
+    cfg.IntOpt('swift_requests', default=500, min=1,
+               help='Number of requests to make for each run'),
+    cfg.IntOpt('swift_threads', default=4, min=1,
+               help='Number of concurrent threads making requests'),
+    cfg.StrOpt('swift_container', default='zaqar-bench-connections',
+               help=('Name of the container used for the benchmark. It is '
+                     'deleted once the benchmark completes.')),
+)
+
+_OBJECT_NAME = 'message'
+
+
+def _requester(client, num_requests, results):
+    for _ in range(num_requests):
+        start = time.time()
+        client.get_object(CONF.swift_container, _OBJECT_NAME)
+        results.append(time.time() - start)
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _run(name, pool_size):
+    CONF.set_override('connection_pool_size', pool_size,
+                      group=options.MESSAGE_SWIFT_GROUP)
+    client = driver._ClientWrapper(CONF[options.MESSAGE_SWIFT_GROUP])
+
+    # NOTE: Authenticate before timing anything
+    client.head_container(CONF.swift_container)
+
+    results = []
+    per_thread = CONF.swift_requests // CONF.swift_threads
+    threads = [threading.Thread(target=_requester,
+                                args=(client, per_thread, results))
+               for _ in range(CONF.swift_threads)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.time() - start
+
+    client.close()
+
+    latencies = sorted(latency * 1000 for latency in results)
+    stats = {
+        'duration_sec': duration,
+        'requests_per_sec': len(latencies) / duration,
+        'ms_per_req': sum(latencies) / len(latencies),
+        'ms_per_req_p50': _percentile(latencies, 50),
+        'ms_per_req_p99': _percentile(latencies, 99),
+    }
+
+    print(name)
+    print('=' * len(name))
+    print('\n'.join('{}: {:.1f}'.format(*v) for v in sorted(stats.items())))
+    print()  # Blank line
+
+
+def main():
+    CONF.register_cli_opts(_CLI_OPTIONS)
+    CONF.register_opts(options.MESSAGE_SWIFT_OPTIONS,
+                       group=options.MESSAGE_SWIFT_GROUP)
+    CONF(project='zaqar', prog='zaqar-bench-swift-connections')
+
+    client = driver._ClientWrapper(CONF[options.MESSAGE_SWIFT_GROUP])
+    client.put_container(CONF.swift_container)
+    client.put_object(CONF.swift_container, _OBJECT_NAME,
+                      '{"ttl": 300, "body": null, "claim_id": null}',
+                      content_type='application/json')
+    try:
+        _run('New connection per request', 0)
+        _run('Connection pool', CONF.swift_threads)
+    finally:
+        client.delete_object(CONF.swift_container, _OBJECT_NAME)
+        client.delete_container(CONF.swift_container)
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from oslo_config import cfg
+from oslo_log import log
+
+from zaqar import bootstrap
+from zaqar.common import cli
+
+LOG = log.getLogger(__name__)
+
+_CLI_OPTIONS = (
+    cfg.StrOpt('project_id',
+               help=('ID of the project whose messages are removed. When '
+                     'not set, the messages of the queues that do not '
+                     'belong to any project are removed.')),
+)
+
+
+# NOTE: Queues are left in place, only their messages are removed.
+@cli.runnable
+def run():
+    # Use the global CONF instance
+    conf = cfg.CONF
+    conf.register_cli_opts(_CLI_OPTIONS)
+    conf(project='zaqar', prog='zaqar-drain')
+
+    server = bootstrap.Bootstrap(conf)
+
+    LOG.debug(u'Draining the messages of project %s', conf.project_id)
+    try:
+        count = server.storage.drain(project=conf.project_id)
+    except NotImplementedError:
+        LOG.error(u'The storage driver does not support draining the '
+                  u'messages of a project')
+        sys.exit(1)
+
+    LOG.info(u'Removed %(count)d messages of project %(project)s',
+             {'count': count, 'project': conf.project_id})
@@ -19,6 +19,14 @@ from zaqar.common import cli
 
 LOG = log.getLogger(__name__)
 
+_CLI_OPTIONS = (
+    cfg.BoolOpt('incremental', default=False,
+                help=('Stop once the per-pass budget configured for the '
+                      'storage driver has been used up, and resume from '
+                      'the same point on the next run. Suitable for '
+                      'running the garbage collector every minute.')),
+)
+
 
 # In this first approach it's the responsibility of the operator
 # to call the garbage collector manually. Using crontab or a similar
@@ -27,9 +35,10 @@ LOG = log.getLogger(__name__)
 def run():
     # Use the global CONF instance
     conf = cfg.CONF
+    conf.register_cli_opts(_CLI_OPTIONS)
     conf(project='zaqar', prog='zaqar-gc')
 
     server = bootstrap.Bootstrap(conf)
 
     LOG.debug(u'Calling the garbage collector')
-    server.storage.gc()
+    server.storage.gc(incremental=conf.incremental)
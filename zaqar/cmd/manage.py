@@ -0,0 +1,57 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from oslo_config import cfg
+from oslo_log import log
+
+from zaqar import bootstrap
+from zaqar.common import cli
+
+LOG = log.getLogger(__name__)
+
+
+def do_ensure_indexes(server, command):
+    LOG.debug(u'Ensuring storage indexes, force: %s', command.force)
+    server.control.ensure_indexes(force=command.force)
+    server.storage.ensure_indexes(force=command.force)
+    LOG.info(u'Storage indexes are up to date')
+
+
+def add_command_parsers(subparsers):
+    parser = subparsers.add_parser(
+        'ensure-indexes',
+        help=('Create the indexes of the storage drivers, and of the '
+              'drivers of every pool, if missing. Meant to be run '
+              'before starting the API servers, so that they do not '
+              'have to.'))
+    parser.add_argument('--force', action='store_true',
+                        help=('Create the indexes even if they are known '
+                              'to exist already.'))
+    parser.set_defaults(func=do_ensure_indexes)
+
+
+_CLI_OPTIONS = (
+    cfg.SubCommandOpt('command', title='Command', help='Available commands',
+                      handler=add_command_parsers),
+)
+
+
+@cli.runnable
+def run():
+    # Use the global CONF instance
+    conf = cfg.CONF
+    conf.register_cli_opts(_CLI_OPTIONS)
+    conf(project='zaqar', prog='zaqar-manage')
+
+    server = bootstrap.Bootstrap(conf)
+    conf.command.func(server, conf.command)
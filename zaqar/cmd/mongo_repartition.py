@@ -0,0 +1,95 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from oslo_config import cfg
+from oslo_log import log
+
+from zaqar import bootstrap
+from zaqar.common import cli
+from zaqar.storage.mongodb import driver
+from zaqar.storage.mongodb import repartition
+from zaqar.storage import utils as storage_utils
+
+LOG = log.getLogger(__name__)
+
+_CLI_OPTIONS = (
+    cfg.StrOpt('step', required=True,
+               choices=('prepare', 'migrate', 'cutover'),
+               help='Step of the repartitioning to run.'),
+    cfg.IntOpt('target_partitions', min=1,
+               help=('Number of partitions to move to. Required by the '
+                     'prepare step.')),
+    cfg.IntOpt('max_rate', default=0, min=0,
+               help=('Maximum number of messages moved per second, or '
+                     '0 for no limit.')),
+)
+
+
+def _fail(message):
+    LOG.error(message)
+    sys.exit(1)
+
+
+# NOTE: See zaqar.storage.mongodb.repartition for how to run each step
+@cli.runnable
+def run():
+    # Use the global CONF instance
+    conf = cfg.CONF
+    conf.register_cli_opts(_CLI_OPTIONS)
+    conf(project='zaqar', prog='zaqar-mongo-repartition')
+
+    server = bootstrap.Bootstrap(conf)
+
+    # NOTE: Load the configured driver, since the FIFO driver keeps its
+    # messages in collections of its own.
+    data_driver = storage_utils.load_storage_driver(
+        conf, server.cache, control_driver=server.control)
+    if not isinstance(data_driver, driver.DataDriver):
+        _fail(u'The message store is not MongoDB')
+
+    controller = data_driver.message_controller
+    throttle = repartition.Throttle(conf.max_rate)
+
+    repartitioning = controller._previous_partitions not in (
+        0, controller._num_partitions)
+
+    if conf.step == 'prepare':
+        if repartitioning:
+            _fail(u'A repartitioning is already in progress')
+        if conf.target_partitions is None:
+            _fail(u'--target-partitions is required')
+
+        num_queues = repartition.prepare(controller, conf.target_partitions)
+        LOG.info(u'Marked %d queues to move', num_queues)
+        return
+
+    if not repartitioning:
+        _fail(u'previous_partitions is not set')
+
+    if conf.step == 'migrate':
+        num_queues, num_messages = repartition.migrate(controller, throttle)
+        LOG.info(u'Moved %(queues)d queues (%(messages)d messages)',
+                 {'queues': num_queues, 'messages': num_messages})
+        return
+
+    num_messages, num_pending = repartition.cutover(controller, throttle)
+    LOG.info(u'Moved %d messages left behind', num_messages)
+
+    if num_pending:
+        _fail(u'%d queues have not been moved yet, run the migrate step '
+              u'first' % num_pending)
+
+    LOG.info(u'Repartitioning complete, previous_partitions can be set '
+             u'back to 0')
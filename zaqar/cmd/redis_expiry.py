@@ -0,0 +1,38 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from oslo_config import cfg
+from oslo_log import log
+
+from zaqar import bootstrap
+from zaqar.common import cli
+from zaqar.storage.redis import driver
+from zaqar.storage.redis import expiry
+
+LOG = log.getLogger(__name__)
+
+
+# NOTE: The listener works on the Redis server set by the uri option
+# of the [drivers:message_store:redis] section. When pooling is
+# enabled, run one listener per Redis pool, each with its own config.
+@cli.runnable
+def run():
+    # Use the global CONF instance
+    conf = cfg.CONF
+    conf(project='zaqar', prog='zaqar-redis-expiry')
+
+    server = bootstrap.Bootstrap(conf)
+    data_driver = driver.DataDriver(conf, server.cache, server.control)
+
+    LOG.debug(u'Starting the Redis expiry listener')
+    expiry.ExpiryListener(data_driver).run()
@@ -0,0 +1,42 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from oslo_config import cfg
+from oslo_log import log
+
+from zaqar import bootstrap
+from zaqar.common import cli
+from zaqar.storage.redis import driver
+from zaqar.storage.redis import migration
+
+LOG = log.getLogger(__name__)
+
+
+# NOTE: See zaqar.storage.redis.migration for when to run the tool
+@cli.runnable
+def run():
+    # Use the global CONF instance
+    conf = cfg.CONF
+    conf(project='zaqar', prog='zaqar-redis-migrate')
+
+    server = bootstrap.Bootstrap(conf)
+    data_driver = driver.DataDriver(conf, server.cache, server.control)
+
+    num_queues, num_keys = migration.migrate(data_driver.connection)
+    LOG.info(u'Migrated %(queues)d queues (%(keys)d keys)',
+             {'queues': num_queues, 'keys': num_keys})
+
+    # NOTE: Also indexes the messages posted before the free and
+    # claimed message ID sets were introduced.
+    data_driver.message_controller.gc()
+    LOG.info(u'Indexed the free and claimed messages of every queue')
@@ -252,11 +252,17 @@ def inject_context(req, resp, params):
     roles = req.headers.get('X-ROLES')
     roles = roles and roles.split(',') or []
 
+    # NOTE: Storage drivers that read from replicas use the master
+    # instead for requests that must see their own writes.
+    consistency = req.get_header('Read-Consistency') or ''
+    consistent_reads = consistency.lower() == 'strong'
+
     ctxt = context.RequestContext(project_id=project_id,
                                   client_id=client_id,
                                   request_id=request_id,
                                   auth_token=auth_token,
                                   user=user,
                                   tenant=tenant,
-                                  roles=roles)
+                                  roles=roles,
+                                  consistent_reads=consistent_reads)
     req.env['zaqar.context'] = ctxt
@@ -26,7 +26,8 @@ class RequestContext(context.RequestContext):
                  auth_token=None, user=None, tenant=None, domain=None,
                  user_domain=None, project_domain=None, is_admin=False,
                  read_only=False, show_deleted=False, request_id=None,
-                 instance_uuid=None, roles=None, **kwargs):
+                 instance_uuid=None, roles=None, consistent_reads=False,
+                 **kwargs):
         super(RequestContext, self).__init__(auth_token=auth_token,
                                              user=user,
                                              tenant=tenant,
@@ -40,6 +41,7 @@ class RequestContext(context.RequestContext):
                                              roles=roles)
         self.project_id = project_id
         self.client_id = client_id
+        self.consistent_reads = consistent_reads
         if overwrite or not hasattr(context._request_store, 'context'):
             self.update_store()
 
@@ -50,6 +52,7 @@ class RequestContext(context.RequestContext):
         ctx = super(RequestContext, self).to_dict()
         ctx.update({
             'project_id': self.project_id,
-            'client_id': self.client_id
+            'client_id': self.client_id,
+            'consistent_reads': self.consistent_reads
         })
         return ctx
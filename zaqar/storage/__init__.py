@@ -34,3 +34,8 @@ DEFAULT_POOLS_PER_PAGE = base.DEFAULT_POOLS_PER_PAGE
 DEFAULT_SUBSCRIPTIONS_PER_PAGE = base.DEFAULT_SUBSCRIPTIONS_PER_PAGE
 
 DEFAULT_MESSAGES_PER_CLAIM = base.DEFAULT_MESSAGES_PER_CLAIM
+
+MESSAGE_PROJECTION_FULL = base.MESSAGE_PROJECTION_FULL
+MESSAGE_PROJECTION_METADATA = base.MESSAGE_PROJECTION_METADATA
+MESSAGE_PROJECTION_IDS = base.MESSAGE_PROJECTION_IDS
+MESSAGE_PROJECTIONS = base.MESSAGE_PROJECTIONS
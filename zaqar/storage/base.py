@@ -38,6 +38,22 @@ DEFAULT_SUBSCRIPTIONS_PER_PAGE = 10
 
 DEFAULT_MESSAGES_PER_CLAIM = 10
 
+# Fields of the messages returned by Message.list: all of them, all
+# but the body, or only the ID.
+MESSAGE_PROJECTION_FULL = 'full'
+MESSAGE_PROJECTION_METADATA = 'metadata'
+MESSAGE_PROJECTION_IDS = 'ids'
+
+MESSAGE_PROJECTIONS = (
+    MESSAGE_PROJECTION_FULL,
+    MESSAGE_PROJECTION_METADATA,
+    MESSAGE_PROJECTION_IDS,
+)
+
+# Number of seconds between checks for new messages, for drivers that
+# can not tell when messages are posted.
+LONG_POLL_INTERVAL = 1
+
 LOG = logging.getLogger(__name__)
 
 
@@ -76,6 +92,20 @@ class DriverBase(object):
                 except cfg.DuplicateOptError:
                     pass
 
+    def ensure_indexes(self, force=False):
+        """Create the indexes the driver relies on, if missing.
+
+        Drivers check their indexes when their controllers are created,
+        so this is only needed to create them ahead of time, e.g. before
+        starting the API servers on an empty database.
+
+        By default, this method does nothing.
+
+        :param force: If True, create the indexes even if they are
+            known to exist already
+        """
+        pass
+
 
 @six.add_metaclass(abc.ABCMeta)
 class DataDriverBase(DriverBase):
@@ -212,7 +242,7 @@ class DataDriverBase(DriverBase):
             _handle_status('delete_queue', func)
         return op_status
 
-    def gc(self):
+    def gc(self, incremental=False):
         """Perform manual garbage collection of claims and messages.
 
         This method can be overridden in order to provide a trigger
@@ -220,9 +250,27 @@ class DataDriverBase(DriverBase):
         that are required by some drivers.
 
         By default, this method does nothing.
+
+        :param incremental: If True, the driver may stop after doing
+            a bounded amount of work and resume from the same point
+            on the next call. Drivers that do not support incremental
+            collection perform a full pass.
         """
         pass
 
+    def drain(self, project=None):
+        """Remove all the messages of a project, leaving its queues.
+
+        Meant for operators, e.g. to clear out a project flooded with
+        messages without having to delete and recreate its queues.
+
+        :param project: ID of the project to drain, or None for the
+            queues that do not belong to any project
+        :returns: Number of messages removed
+        :raises NotImplementedError: The driver does not support it
+        """
+        raise NotImplementedError
+
     @decorators.lazy_property(write=False)
     def queue_controller(self):
         return self.control_driver.queue_controller
@@ -287,6 +335,22 @@ class ControlDriverBase(DriverBase):
         raise NotImplementedError
 
 
+def _poll(func, timeout):
+    """Calls a function every LONG_POLL_INTERVAL seconds until it
+    returns a true value, or the timeout expires.
+    """
+    deadline = time.time() + timeout
+
+    while True:
+        result = func()
+
+        remaining = deadline - time.time()
+        if result or remaining <= 0:
+            return result
+
+        time.sleep(min(remaining, LONG_POLL_INTERVAL))
+
+
 class ControllerBase(object):
     """Top-level class for controllers.
 
@@ -414,7 +478,8 @@ class Message(ControllerBase):
     def list(self, queue, project=None, marker=None,
              limit=DEFAULT_MESSAGES_PER_PAGE,
              echo=False, client_uuid=None,
-             include_claimed=False):
+             include_claimed=False,
+             projection=MESSAGE_PROJECTION_FULL):
         """Base method for listing messages.
 
         :param queue: Name of the queue to get the
@@ -428,12 +493,55 @@ class Message(ControllerBase):
         :param client_uuid: A UUID object. Required when echo=False.
         :param include_claimed: omit claimed messages from listing?
         :type include_claimed: bool
+        :param projection: (Default full) Fields of the messages to
+            return, one of MESSAGE_PROJECTIONS. The metadata projection
+            leaves out the body of the messages, and the ids projection
+            only returns their ID.
 
         :returns: An iterator giving a sequence of messages and
             the marker of the next page.
         """
         raise NotImplementedError
 
+    @staticmethod
+    def _project_listing(results, projection):
+        """Drops the fields of listed messages left out by a projection.
+
+        Meant for drivers that have to fetch messages as a whole.
+
+        :param results: Iterator giving a sequence of messages and the
+            marker of the next page, as returned by `list`
+        :param projection: One of MESSAGE_PROJECTIONS
+        """
+        messages = next(results)
+
+        if projection == MESSAGE_PROJECTION_IDS:
+            messages = ({'id': msg['id']} for msg in messages)
+        elif projection == MESSAGE_PROJECTION_METADATA:
+            messages = (dict((k, v) for k, v in msg.items() if k != 'body')
+                        for msg in messages)
+
+        yield messages
+        yield next(results)
+
+    def long_poll(self, queue, func, project=None, timeout=0):
+        """Calls a function until messages are available, or time is up.
+
+        Used to list or claim messages on behalf of a consumer that is
+        willing to wait for them. Drivers that can tell when messages
+        are posted to a queue should override this method so that the
+        function is only called again once they are; by default it is
+        called every LONG_POLL_INTERVAL seconds.
+
+        :param queue: Name of the queue the function reads from
+        :param func: Callable without arguments, returning a false value
+            while there are no messages for the consumer
+        :param project: Project id
+        :param timeout: Maximum number of seconds to wait for
+        :returns: The last value returned by `func`
+        """
+        return _poll(func, timeout)
+
     @abc.abstractmethod
     def first(self, queue, project=None, sort=1):
         """Get first message in the queue (including claimed).
@@ -592,6 +700,13 @@ class Claim(ControllerBase):
         """
         raise NotImplementedError
 
+    def long_poll(self, queue, func, project=None, timeout=0):
+        """Calls a function until messages are available, or time is up.
+
+        Same as `Message.long_poll`, for consumers claiming messages.
+        """
+        return _poll(func, timeout)
+
 
 @six.add_metaclass(abc.ABCMeta)
 class Subscription(ControllerBase):
@@ -36,6 +36,9 @@ CATALOGUE_INDEX = [
     (PRIMARY_KEY, 1)
 ]
 
+# NOTE: Names of the indexes, checked for on startup.
+INDEX_NAMES = (utils.index_name(CATALOGUE_INDEX),)
+
 
 class CatalogueController(base.CatalogueBase):
 
@@ -43,7 +46,14 @@ class CatalogueController(base.CatalogueBase):
         super(CatalogueController, self).__init__(*args, **kwargs)
 
         self._col = self.driver.database.catalogue
-        self._col.ensure_index(CATALOGUE_INDEX, unique=True)
+        self._check_indexes()
+
+    def _check_indexes(self, force=False):
+        return utils.ensure_indexes(self._col, INDEX_NAMES,
+                                    self._ensure_indexes, force=force)
+
+    def _ensure_indexes(self, collection):
+        collection.ensure_index(CATALOGUE_INDEX, unique=True)
 
     @utils.raises_conn_error
     def _insert(self, project, queue, pool, upsert):
@@ -22,11 +22,12 @@ Field Mappings:
 """
 
 import datetime
+import random
 
 from bson import objectid
 from oslo_log import log as logging
 from oslo_utils import timeutils
-from pymongo.collection import ReturnDocument
+import pymongo
 
 from zaqar import storage
 from zaqar.storage import errors
@@ -34,6 +35,14 @@ from zaqar.storage.mongodb import utils
 
 LOG = logging.getLogger(__name__)
 
+# NOTE: In the atomic claim mode, this many times the number of
+# messages still to claim are fetched as candidates, so that parallel
+# requests starting at different offsets rarely go for the same ones.
+CLAIM_CANDIDATE_FACTOR = 3
+
+# Maximum number of times to fetch candidates in the atomic claim mode
+MAX_CLAIM_ROUNDS = 3
+
 
 def _messages_iter(msg_iter):
     """Used to iterate through messages."""
@@ -101,6 +110,177 @@ class ClaimController(storage.Claim):
 
         return claim_meta, msgs
 
+    def _claim_batch(self, collection, queue, project, meta, limit):
+        """Claims messages by updating a batch of candidates at once.
+
+        :returns: (list of (message ID, claim count) tuples for the
+            candidates, number of messages actually claimed)
+        """
+        msg_ctrl = self.driver.message_controller
+
+        # Get a list of active, not claimed nor expired
+        # messages that could be claimed.
+        msgs = msg_ctrl._active(queue, projection={'_id': 1, 'c': 1},
+                                project=project,
+                                limit=limit)
+
+        be_claimed = [(msg['_id'], msg['c'].get('c', 0)) for msg in msgs]
+        ids = [_id for _id, _ in be_claimed]
+
+        if len(ids) == 0:
+            return [], 0
+
+        now = timeutils.utcnow_ts()
+
+        # NOTE(kgriffs): Set the claim field for
+        # the active message batch, while also
+        # filtering out any messages that happened
+        # to get claimed just now by one or more
+        # parallel requests.
+        #
+        # Filtering by just 'c.e' works because
+        # new messages have that field initialized
+        # to the current time when the message is
+        # posted. There is no need to check whether
+        # 'c' exists or 'c.id' is None.
+        updated = collection.update_many({'_id': {'$in': ids},
+                                          'c.e': {'$lte': now}},
+                                         {'$set': {'c': meta}},
+                                         upsert=False)
+
+        return be_claimed, updated.modified_count
+
+    def _claim_atomic(self, collection, queue, project, meta, limit):
+        """Claims messages one at a time with find_one_and_update.
+
+        Each message is claimed by a single atomic operation that only
+        succeeds while the message is free, so the list of claimed
+        messages is exact even under contention. Candidates are tried
+        starting at a random offset, which spreads parallel requests
+        over the oldest messages instead of having them all go for the
+        same ones. As a result, messages are not necessarily claimed
+        in the order they were posted.
+
+        :returns: List of (message ID, claim count) tuples for the
+            messages claimed
+        """
+        msg_ctrl = self.driver.message_controller
+        be_claimed = []
+
+        for _ in range(MAX_CLAIM_ROUNDS):
+            remaining = limit - len(be_claimed)
+            window = remaining * CLAIM_CANDIDATE_FACTOR
+
+            msgs = msg_ctrl._active(queue, projection={'_id': 1},
+                                    project=project, limit=window)
+            candidates = [msg['_id'] for msg in msgs]
+            if not candidates:
+                break
+
+            offset = random.randrange(len(candidates))
+            candidates = candidates[offset:] + candidates[:offset]
+
+            now = timeutils.utcnow_ts()
+            for _id in candidates:
+                # NOTE: The document is returned as it was before the
+                # update, which has the claim count of the message.
+                msg = collection.find_one_and_update(
+                    {'_id': _id, 'c.e': {'$lte': now}},
+                    {'$set': {'c': meta}},
+                    projection={'_id': 1, 'c.c': 1})
+
+                if msg is not None:
+                    be_claimed.append((_id, msg['c'].get('c', 0)))
+                    if len(be_claimed) == limit:
+                        return be_claimed
+
+            # NOTE: Every free message was tried
+            if len(candidates) < window:
+                break
+
+        return be_claimed
+
+    def _update_claim_counts(self, collection, project, oid, be_claimed,
+                             queue_meta):
+        """Saves the claim counts of newly claimed messages.
+
+        Messages that have met the max claim count of the queue are
+        moved to its dead letter queue instead. The claim counts are
+        saved with a single bulk write, and the messages moved with
+        another one.
+
+        :returns: Number of messages moved to the dead letter queue
+        """
+        max_claim_count = queue_meta['_max_claim_count']
+        dlq_name = queue_meta['_dead_letter_queue']
+
+        dlq_values = {'p_q': utils.scope_queue_name(dlq_name, project)}
+        dlq_ttl = queue_meta.get("_dead_letter_queue_messages_ttl")
+        if dlq_ttl:
+            dlq_values['t'] = dlq_ttl
+
+        requests = []
+        dlq_requests = []
+        dlq_ids = []
+        for _id, claimed_count in be_claimed:
+            # NOTE(flwang): We have claimed the message above, but we will
+            # update the claim count below. So that means, when the
+            # claimed_count equals queue_meta['_max_claim_count'], the
+            # message has met the threshold. And Zaqar will move it to the
+            # DLQ.
+            if claimed_count < max_claim_count:
+                new_values = {'c.c': claimed_count + 1}
+                requests.append(pymongo.UpdateOne({'_id': _id, 'c.id': oid},
+                                                  {'$set': new_values}))
+                LOG.debug(u"Message %(id)s has been claimed %(count)d "
+                          u"times.", {"id": str(_id),
+                                      "count": claimed_count + 1})
+            else:
+                new_values = dict(dlq_values, **{'c.c': claimed_count})
+                dlq_requests.append(pymongo.UpdateOne(
+                    {'_id': _id, 'c.id': oid}, {'$set': new_values}))
+                dlq_ids.append(_id)
+                LOG.debug(u"Message %(id)s has met the max claim count "
+                          u"%(count)d, now it has been moved to dead "
+                          u"letter queue %(dlq_name)s.",
+                          {"id": str(_id), "count": claimed_count,
+                           "dlq_name": dlq_name})
+
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+
+        if not dlq_requests:
+            return 0
+
+        # NOTE: Only the messages still held by this claim are moved
+        result = collection.bulk_write(dlq_requests, ordered=False)
+        num_moved = result.matched_count
+
+        # NOTE(flwang): We're moving message directly. That means, the
+        # queue and dead letter queue must be created on the same storage
+        # pool. It's a technical tradeoff, because if we re-send the
+        # message to the dead letter queue by message controller, then we
+        # will lost all the claim information.
+        msg_ctrl = self.driver.message_controller
+        dlq_collection = msg_ctrl._collection(dlq_name, project)
+
+        # NOTE(flwang): If dead letter queue and queue are in the same
+        # partition, the messages have been already moved above.
+        if num_moved and collection != dlq_collection:
+            msgs = list(collection.find({'_id': {'$in': dlq_ids},
+                                         'c.id': oid}))
+            if not msgs:
+                return 0
+
+            # NOTE: Messages copied by an interrupted attempt are
+            # already there, which is fine.
+            utils.insert_missing(dlq_collection, msgs)
+            result = collection.delete_many(
+                {'_id': {'$in': [msg['_id'] for msg in msgs]}, 'c.id': oid})
+            num_moved = result.deleted_count
+
+        return num_moved
+
     # NOTE(kgriffs): If we get an autoreconnect or any other connection error,
     # the worst that can happen is you get an orphaned claim, but it will
     # expire eventually and free up those messages to be claimed again. We
@@ -127,6 +307,9 @@ class ClaimController(storage.Claim):
 
         This 2 queries are required because there's no way, as for the
         time being, to execute an update on a limited number of records.
+
+        When the claim_strategy option is set to "atomic", messages are
+        instead claimed one at a time, see `_claim_atomic`.
         """
         msg_ctrl = self.driver.message_controller
         queue_ctrl = self.driver.queue_controller
@@ -150,41 +333,23 @@ class ClaimController(storage.Claim):
             'c': 0   # NOTE(flwang): A placeholder which will be updated later
         }
 
-        # Get a list of active, not claimed nor expired
-        # messages that could be claimed.
-        msgs = msg_ctrl._active(queue, projection={'_id': 1, 'c': 1},
-                                project=project,
-                                limit=limit)
+        collection = msg_ctrl._collection(queue, project)
 
-        messages = iter([])
-        be_claimed = [(msg['_id'], msg['c'].get('c', 0)) for msg in msgs]
-        ids = [_id for _id, _ in be_claimed]
+        if self.driver.mongodb_conf.claim_strategy == 'atomic':
+            be_claimed = self._claim_atomic(collection, queue, project,
+                                            meta, limit)
+            num_claimed = len(be_claimed)
+        else:
+            be_claimed, num_claimed = self._claim_batch(collection, queue,
+                                                        project, meta, limit)
 
-        if len(ids) == 0:
+        messages = iter([])
+        if not be_claimed:
             return None, messages
 
         # Get the maxClaimCount and deadLetterQueue from current queue's meta
         queue_meta = queue_ctrl.get(queue, project=project)
 
-        now = timeutils.utcnow_ts()
-
-        # NOTE(kgriffs): Set the claim field for
-        # the active message batch, while also
-        # filtering out any messages that happened
-        # to get claimed just now by one or more
-        # parallel requests.
-        #
-        # Filtering by just 'c.e' works because
-        # new messages have that field initialized
-        # to the current time when the message is
-        # posted. There is no need to check whether
-        # 'c' exists or 'c.id' is None.
-        collection = msg_ctrl._collection(queue, project)
-        updated = collection.update_many({'_id': {'$in': ids},
-                                          'c.e': {'$lte': now}},
-                                         {'$set': {'c': meta}},
-                                         upsert=False)
-
         # NOTE(flaper87): Dirty hack!
         # This sets the expiration time to
         # `expires` on messages that would
@@ -202,72 +367,17 @@ class ClaimController(storage.Claim):
             LOG.debug(u"The list of messages being claimed: %(be_claimed)s",
                       {"be_claimed": be_claimed})
 
-            for _id, claimed_count in be_claimed:
-                # NOTE(flwang): We have claimed the message above, but we will
-                # update the claim count below. So that means, when the
-                # claimed_count equals queue_meta['_max_claim_count'], the
-                # message has met the threshold. And Zaqar will move it to the
-                # DLQ.
-                if claimed_count < queue_meta['_max_claim_count']:
-                    # 1. Save the new max claim count for message
-                    collection.update_one({'_id': _id,
-                                           'c.id': oid},
-                                          {'$set': {'c.c': claimed_count + 1}},
-                                          upsert=False)
-                    LOG.debug(u"Message %(id)s has been claimed %(count)d "
-                              u"times.", {"id": str(_id),
-                                          "count": claimed_count + 1})
-                else:
-                    # 2. Check if the message's claim count has exceeded the
-                    # max claim count defined in the queue, if so, move the
-                    # message to the dead letter queue.
-
-                    # NOTE(flwang): We're moving message directly. That means,
-                    # the queue and dead letter queue must be created on the
-                    # same storage pool. It's a technical tradeoff, because if
-                    # we re-send the message to the dead letter queue by
-                    # message controller, then we will lost all the claim
-                    # information.
-                    dlq_name = queue_meta['_dead_letter_queue']
-                    new_msg = {'c.c': claimed_count,
-                               'p_q': utils.scope_queue_name(dlq_name,
-                                                             project)}
-                    dlq_ttl = queue_meta.get("_dead_letter_queue_messages_ttl")
-                    if dlq_ttl:
-                        new_msg['t'] = dlq_ttl
-                    kwargs = {"return_document": ReturnDocument.AFTER}
-                    msg = collection.find_one_and_update({'_id': _id,
-                                                          'c.id': oid},
-                                                         {'$set': new_msg},
-                                                         **kwargs)
-                    dlq_collection = msg_ctrl._collection(dlq_name, project)
-                    if not dlq_collection:
-                        LOG.warning(u"Failed to find the message collection "
-                                    u"for queue %(dlq_name)s", {"dlq_name":
-                                                                dlq_name})
-                        return None, iter([])
-                    # NOTE(flwang): If dead letter queue and queue are in the
-                    # same partition, the message has been already
-                    # modified.
-                    if collection != dlq_collection:
-                        result = dlq_collection.insert_one(msg)
-                        if result.inserted_id:
-                            collection.delete_one({'_id': _id})
-                    LOG.debug(u"Message %(id)s has met the max claim count "
-                              u"%(count)d, now it has been moved to dead "
-                              u"letter queue %(dlq_name)s.",
-                              {"id": str(_id), "count": claimed_count,
-                               "dlq_name": dlq_name})
-                    msg_count_moved_to_DLQ += 1
-
-        if updated.modified_count != 0:
+            msg_count_moved_to_DLQ = self._update_claim_counts(
+                collection, project, oid, be_claimed, queue_meta)
+
+        if num_claimed != 0:
             # NOTE(kgriffs): This extra step is necessary because
             # in between having gotten a list of active messages
             # and updating them, some of them may have been
             # claimed by a parallel request. Therefore, we need
             # to find out which messages were actually tagged
             # with the claim ID successfully.
-            if msg_count_moved_to_DLQ < updated.modified_count:
+            if msg_count_moved_to_DLQ < num_claimed:
                 claim, messages = self.get(queue, oid, project=project)
             else:
                 # NOTE(flwang): Though messages are claimed, but all of them
@@ -331,3 +441,8 @@ class ClaimController(storage.Claim):
     def delete(self, queue, claim_id, project=None):
         msg_ctrl = self.driver.message_controller
         msg_ctrl._unclaim(queue, claim_id, project=project)
+
+    def long_poll(self, queue, func, project=None, timeout=0):
+        msg_ctrl = self.driver.message_controller
+        return msg_ctrl.long_poll(queue, func, project=project,
+                                  timeout=timeout)
@@ -17,6 +17,7 @@
 
 import ssl
 
+import futurist
 from osprofiler import profiler
 import pymongo
 import pymongo.errors
@@ -131,27 +132,53 @@ class DataDriver(storage.DataDriverBase):
     def close(self):
         self.connection.close()
 
+        executor = getattr(self, '_lazy_executor', None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
     def _health(self):
         KPI = {}
         KPI['storage_reachable'] = self.is_alive()
         KPI['operation_status'] = self._get_operation_status()
         message_volume = {'free': 0, 'claimed': 0, 'total': 0}
 
-        for msg_col in [db.messages for db in self.message_databases]:
-            msg_count_claimed = msg_col.find({'c.id': {'$ne': None}}).count()
-            message_volume['claimed'] += msg_count_claimed
+        def count(msg_col):
+            return (msg_col.find({'c.id': {'$ne': None}}).count(),
+                    msg_col.find().count())
 
-            msg_count_total = msg_col.find().count()
+        controller = self.message_controller
+        for msg_count_claimed, msg_count_total in controller._fan_out(
+                'message_volume', count):
+            message_volume['claimed'] += msg_count_claimed
             message_volume['total'] += msg_count_total
 
         message_volume['free'] = (message_volume['total'] -
                                   message_volume['claimed'])
         KPI['message_volume'] = message_volume
+        KPI['partition_operations'] = dict(controller._partition_timings)
         return KPI
 
+    def gc(self, incremental=False):
+        # NOTE: Expired messages are removed by the TTL index, so there
+        # is only the cached queue stats to keep up to date.
+        cache_ttl = self.mongodb_conf.stats_cache_ttl
+        if cache_ttl:
+            self.message_controller._refresh_stale_stats_summaries(cache_ttl)
+
+    def drain(self, project=None):
+        return self.message_controller._drain_project(project)
+
+    def ensure_indexes(self, force=False):
+        self.message_controller._check_indexes(force)
+        self.subscription_controller._check_indexes(force)
+
     @decorators.lazy_property(write=False)
     def message_databases(self):
-        """List of message databases, ordered by partition number."""
+        """List of message databases, ordered by partition number.
+
+        While repartitioning to fewer partitions, the databases of the
+        previous partitions that are going away are included too.
+        """
 
         kwargs = {}
         if not self.server_version < (2, 6):
@@ -164,7 +191,8 @@ class DataDriver(storage.DataDriverBase):
             kwargs['write_concern'] = pymongo.WriteConcern(**doc)
 
         name = self.mongodb_conf.database
-        partitions = self.mongodb_conf.partitions
+        partitions = max(self.mongodb_conf.partitions,
+                         self.mongodb_conf.previous_partitions)
 
         databases = []
         for p in range(partitions):
@@ -183,6 +211,18 @@ class DataDriver(storage.DataDriverBase):
         """MongoDB client connection instance."""
         return _connection(self.mongodb_conf)
 
+    @decorators.lazy_property(write=False)
+    def executor(self):
+        """Pool of threads shared by the operations spanning partitions.
+
+        None when partitions are worked on one at a time.
+        """
+        workers = self.mongodb_conf.partition_workers
+        if workers == 1:
+            return None
+
+        return futurist.ThreadPoolExecutor(max_workers=workers)
+
     @decorators.lazy_property(write=False)
     def message_controller(self):
         controller = controllers.MessageController(self)
@@ -221,6 +261,11 @@ class FIFODataDriver(DataDriver):
 
     _COL_SUFIX = "_messages_fifo_p"
 
+    def _health(self):
+        KPI = super(FIFODataDriver, self)._health()
+        KPI['message_posts'] = dict(self.message_controller._post_stats)
+        return KPI
+
     @decorators.lazy_property(write=False)
     def message_controller(self):
         controller = controllers.FIFOMessageController(self)
@@ -244,6 +289,12 @@ class ControlDriver(storage.ControlDriverBase):
     def close(self):
         self.connection.close()
 
+    def ensure_indexes(self, force=False):
+        for controller in (self.queue_controller, self.pools_controller,
+                           self.catalogue_controller,
+                           self.flavors_controller):
+            controller._check_indexes(force)
+
     @decorators.lazy_property(write=False)
     def connection(self):
         """MongoDB client connection instance."""
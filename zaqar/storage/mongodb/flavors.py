@@ -35,6 +35,9 @@ FLAVORS_STORAGE_POOL_INDEX = [
     ('s', 1)
 ]
 
+# NOTE: Names of the indexes, checked for on startup.
+INDEX_NAMES = ('flavors_name', 'flavors_storage_pool_group_name')
+
 # NOTE(cpp-cabrera): used for get/list operations. There's no need to
 # show the marker or the _id - they're implementation details.
 OMIT_FIELDS = (('_id', False),)
@@ -50,16 +53,23 @@ class FlavorsController(base.FlavorsBase):
         super(FlavorsController, self).__init__(*args, **kwargs)
 
         self._col = self.driver.database.flavors
-        self._col.ensure_index(FLAVORS_INDEX,
-                               background=True,
-                               name='flavors_name',
-                               unique=True)
-        self._col.ensure_index(FLAVORS_STORAGE_POOL_INDEX,
-                               background=True,
-                               name='flavors_storage_pool_group_name')
+        self._check_indexes()
 
         self._pools_ctrl = self.driver.pools_controller
 
+    def _check_indexes(self, force=False):
+        return utils.ensure_indexes(self._col, INDEX_NAMES,
+                                    self._ensure_indexes, force=force)
+
+    def _ensure_indexes(self, collection):
+        collection.ensure_index(FLAVORS_INDEX,
+                                background=True,
+                                name='flavors_name',
+                                unique=True)
+        collection.ensure_index(FLAVORS_STORAGE_POOL_INDEX,
+                                background=True,
+                                name='flavors_storage_pool_group_name')
+
     @utils.raises_conn_error
     def _list_by_pool_group(self, pool_group, limit=10, detailed=False):
         query = {'s': pool_group}
@@ -21,10 +21,13 @@ Field Mappings:
     letter of their long name.
 """
 
+import contextlib
 import datetime
+import threading
 import time
 
 from bson import objectid
+from oslo_context import context
 from oslo_log import log as logging
 from oslo_utils import timeutils
 import pymongo.errors
@@ -34,6 +37,7 @@ from zaqar.i18n import _
 from zaqar import storage
 from zaqar.storage import errors
 from zaqar.storage.mongodb import utils
+from zaqar.storage.mongodb import wakeups
 
 
 LOG = logging.getLogger(__name__)
@@ -61,6 +65,11 @@ TTL_INDEX_FIELDS = [
 # storage impls.
 PROJ_QUEUE = utils.PROJ_QUEUE_KEY
 
+# NOTE: Field set on the stats document of a queue, in the partition it
+# used to live in, while its messages have yet to be moved to the
+# partition it hashes to after a repartitioning.
+REPARTITION_PENDING = 'rp'
+
 # NOTE(kgriffs): This index is for listing messages, usually
 # filtering out claimed ones.
 ACTIVE_INDEX_FIELDS = [
@@ -116,6 +125,21 @@ TRANSACTION_INDEX_FIELDS = [
     ('tx', 1),
 ]
 
+# NOTE: Names of the indexes of the messages collections and of their
+# stats collections, checked for on startup. Rename an index whenever
+# it changes, so that it gets created again.
+INDEX_NAMES = ('ttl', 'active', 'claimed', 'counting', 'queue_marker',
+               'transaction')
+
+STATS_INDEX_NAMES = ('queue',)
+
+# Fields to fetch for each listing projection
+_LIST_PROJECTIONS = {
+    storage.MESSAGE_PROJECTION_FULL: None,
+    storage.MESSAGE_PROJECTION_METADATA: {'b': 0},
+    storage.MESSAGE_PROJECTION_IDS: {'_id': 1, 'k': 1},
+}
+
 
 class MessageController(storage.Message):
     """Implements message resource operations using MongoDB.
@@ -142,6 +166,8 @@ class MessageController(storage.Message):
 
         # Cache for convenience and performance
         self._num_partitions = self.driver.mongodb_conf.partitions
+        self._previous_partitions = (
+            self.driver.mongodb_conf.previous_partitions)
         self._queue_ctrl = self.driver.queue_controller
         self._retry_range = range(self.driver.mongodb_conf.max_attempts)
 
@@ -156,13 +182,54 @@ class MessageController(storage.Message):
                              for db in self.driver.message_databases]
 
         # Ensure indexes are initialized before any queries are performed
-        for collection in self._collections:
-            self._ensure_indexes(collection)
+        self._check_indexes()
+
+        # NOTE: Blocks of markers reserved by this process, keyed by
+        # (queue name, project), as [next marker, end of block] lists.
+        self._marker_blocks = {}
+        self._marker_blocks_lock = threading.Lock()
+
+        # NOTE: How long the last run of each operation spanning all
+        # the partitions took, as reported by the health endpoint.
+        self._partition_timings = {}
+
+        # NOTE: Queues known to have been moved to the partition they
+        # hash to, while a repartitioning is in progress. Queues are
+        # never moved back, so this can be cached for good.
+        self._repartitioned = set()
+
+        # NOTE: Listeners waking up requests waiting for messages, by
+        # name of the partition database.
+        self._wakeup_listeners = {}
+        if self.driver.mongodb_conf.long_poll_wakeups:
+            for collection in self._collections:
+                database = collection.database
+                self._wakeup_listeners[database.name] = wakeups.Listener(
+                    wakeups.get_collection(database))
 
     # ----------------------------------------------------------------------
     # Helpers
     # ----------------------------------------------------------------------
 
+    def _check_indexes(self, force=False):
+        """Ensures that the indexes of every partition are created.
+
+        Partitions none of whose indexes are missing are skipped, so
+        this only takes a couple of reads per partition once the
+        indexes have been created.
+        """
+
+        def check(collection):
+            # NOTE: The indexes of the stats collection are created
+            # along with the ones of the messages collection.
+            missing = force or utils.missing_indexes(collection.stats,
+                                                     STATS_INDEX_NAMES)
+            return utils.ensure_indexes(collection, INDEX_NAMES,
+                                        self._ensure_indexes, force=missing)
+
+        return sum(utils.fan_out(check, self._collections,
+                                 self.driver.executor))
+
     def _ensure_indexes(self, collection):
         """Ensures that all indexes are created."""
 
@@ -191,10 +258,126 @@ class MessageController(storage.Message):
                                 name='transaction',
                                 background=True)
 
+        # NOTE: Concurrent first posts to a queue could create several
+        # stats documents for it before the index was unique.
+        _merge_duplicate_stats(collection.stats)
+        collection.stats.ensure_index([(PROJ_QUEUE, 1)],
+                                      name='queue',
+                                      unique=True,
+                                      background=True)
+
     def _collection(self, queue_name, project=None):
-        """Get a partitioned collection instance."""
-        return self._collections[utils.get_partition(self._num_partitions,
-                                                     queue_name, project)]
+        """Get a partitioned collection instance.
+
+        While a repartitioning is in progress, queues whose messages
+        have yet to be moved keep using the partition they hashed to
+        before.
+        """
+        partition = utils.get_partition(self._num_partitions,
+                                        queue_name, project)
+
+        if self._previous_partitions:
+            previous = utils.get_partition(self._previous_partitions,
+                                           queue_name, project)
+
+            if (previous != partition and
+                    self._repartition_pending(queue_name, project,
+                                              previous)):
+                partition = previous
+
+        return self._collections[partition]
+
+    def _queue_collections(self, queue_name, project=None):
+        """Get the collections that may hold messages of a queue.
+
+        While a repartitioning is in progress, the messages of a queue
+        may be in its previous partition as well as in its new one,
+        until they have all been moved. Writes that remove messages
+        are applied to both, so that none of them comes back once
+        moved.
+
+        :returns: List of collections, starting with the one returned
+            by `_collection`
+        """
+        collection = self._collection(queue_name, project)
+        if not self._previous_partitions:
+            return [collection]
+
+        partitions = set([
+            utils.get_partition(self._num_partitions, queue_name, project),
+            utils.get_partition(self._previous_partitions, queue_name,
+                                project),
+        ])
+
+        return [collection] + [self._collections[p]
+                               for p in sorted(partitions)
+                               if self._collections[p] != collection]
+
+    def _repartition_pending(self, queue_name, project, previous):
+        """Checks whether a queue still lives in its previous partition.
+
+        :param previous: Partition the queue used to hash to
+        """
+        if (queue_name, project) in self._repartitioned:
+            return False
+
+        query = _get_scoped_query(queue_name, project)
+        query[REPARTITION_PENDING] = True
+        doc = self._collections[previous].stats.find_one(
+            query, projection={'_id': 1})
+
+        if doc is None:
+            self._repartitioned.add((queue_name, project))
+            return False
+
+        return True
+
+    def _fan_out(self, operation, func):
+        """Runs a function against every partition.
+
+        Partitions are worked on concurrently, by the pool of up to
+        `partition_workers` threads shared by all such operations, and
+        the time taken is recorded under the name of the operation.
+
+        :param operation: Name of the operation, for the health report
+        :param func: Callable taking the messages collection of a
+            partition
+        :returns: List of the values returned by `func`, ordered by
+            partition number
+        """
+        workers = self.driver.mongodb_conf.partition_workers
+
+        start = time.time()
+        results = utils.fan_out(func, self._collections,
+                                self.driver.executor)
+
+        self._partition_timings[operation] = {
+            'seconds': time.time() - start,
+            'partitions': len(self._collections),
+            'workers': min(workers, len(self._collections)),
+        }
+
+        return results
+
+    def _wakeup_listener(self, queue_name, project=None):
+        database = self._collection(queue_name, project).database
+        return self._wakeup_listeners.get(database.name)
+
+    def _send_wakeup(self, queue_name, project=None):
+        """Wakes up the requests waiting for messages on a queue."""
+
+        listener = self._wakeup_listener(queue_name, project)
+        if listener is None:
+            return
+
+        # NOTE: The messages have been posted by now, so a failure
+        # only delays waiting requests until they time out.
+        try:
+            listener.notify(utils.scope_queue_name(queue_name, project))
+        except pymongo.errors.PyMongoError as ex:
+            LOG.warning(u'Could not send a wakeup for queue %(queue)s '
+                        u'of project %(project)s: %(ex)s',
+                        {'queue': queue_name, 'project': project, 'ex': ex})
 
     def _backoff_sleep(self, attempt):
         """Sleep between retries using a jitter algorithm.
@@ -225,8 +408,32 @@ class MessageController(storage.Message):
         :param project: ID of the project to which the queue belongs
         """
         scope = utils.scope_queue_name(queue_name, project)
+        for collection in self._queue_collections(queue_name, project):
+            collection.delete_many({PROJ_QUEUE: scope})
+
         collection = self._collection(queue_name, project)
-        collection.delete_many({PROJ_QUEUE: scope})
+
+        with self._marker_blocks_lock:
+            self._marker_blocks.pop((queue_name, project), None)
+
+        collection.stats.update_one(_get_scoped_query(queue_name, project),
+                                    {'$unset': {'s': ''}})
+
+    def _drain_project(self, project=None):
+        """Removes all the messages of a project, leaving its queues.
+
+        :param project: ID of the project to drain, or None for the
+            queues that do not belong to any project
+        :returns: Number of messages removed
+        """
+        query = utils.scoped_query(None, project)
+
+        def drain(collection):
+            result = collection.delete_many(query)
+            collection.stats.update_many(query, {'$unset': {'s': ''}})
+            return result.deleted_count
+
+        return sum(self._fan_out('drain', drain))
 
     def _list(self, queue_name, project=None, marker=None,
               echo=False, client_uuid=None, projection=None,
@@ -336,6 +543,96 @@ class MessageController(storage.Message):
         collection = self._collection(queue_name, project)
         return collection.count(filter=query, hint=COUNTING_INDEX_FIELDS)
 
+    def _stats_summary(self, queue_name, project=None):
+        """Counts the messages of a queue, for its stats.
+
+        :returns: Summary document with the number of free (f) and of
+            all (t) messages in the queue, the IDs of its oldest (o) and
+            newest (n) messages if any, and the time it was made at (r).
+        """
+        summary = {
+            'f': self._count(queue_name, project=project,
+                             include_claimed=False),
+            't': self._count(queue_name, project=project,
+                             include_claimed=True),
+            'r': timeutils.utcnow_ts(),
+        }
+
+        # NOTE: Only the IDs of the oldest and newest messages are
+        # needed, so leave their bodies on the server.
+        for field, sort in (('o', 1), ('n', -1)):
+            cursor = self._list(queue_name, project=project,
+                                include_claimed=True, sort=sort, limit=1,
+                                projection={'_id': 1})
+            for msg in cursor:
+                summary[field] = str(msg['_id'])
+
+        return summary
+
+    def _get_stats_summary(self, queue_name, project=None, max_age=None):
+        """Returns the summary saved for a queue, if recent enough.
+
+        :param max_age: (Default None) Maximum age of the summary, in
+            seconds. If not specified, the summary is returned whatever
+            its age.
+        :returns: Summary document, or None if there is no summary or
+            it is too old.
+        """
+        collection = self._collection(queue_name, project).stats
+        doc = collection.find_one(_get_scoped_query(queue_name, project),
+                                  projection={'s': 1, '_id': 0})
+
+        if doc is None or 's' not in doc:
+            return None
+
+        summary = doc['s']
+        if max_age is not None:
+            if timeutils.utcnow_ts() - summary['r'] >= max_age:
+                return None
+
+        return summary
+
+    def _refresh_stats_summary(self, queue_name, project=None):
+        """Counts the messages of a queue, and saves the summary."""
+
+        summary = self._stats_summary(queue_name, project)
+
+        while True:
+            try:
+                collection = self._collection(queue_name, project).stats
+                collection.update_one(_get_scoped_query(queue_name, project),
+                                      {'$set': {'s': summary}},
+                                      upsert=True)
+
+                return summary
+            except pymongo.errors.DuplicateKeyError:
+                # NOTE: A concurrent request created the stats document
+                # of the queue first, try again to update it.
+                continue
+
+    def _refresh_stale_stats_summaries(self, max_age):
+        """Refreshes the saved summaries that are too old.
+
+        :returns: Number of summaries refreshed
+        """
+        threshold = timeutils.utcnow_ts() - max_age
+
+        def refresh(collection):
+            docs = collection.stats.find({'s.r': {'$lte': threshold}},
+                                         projection={PROJ_QUEUE: 1,
+                                                     '_id': 0})
+
+            num_refreshed = 0
+            for doc in docs:
+                project, queue_name = utils.parse_scoped_project_queue(
+                    doc[PROJ_QUEUE])
+                self._refresh_stats_summary(queue_name, project or None)
+                num_refreshed += 1
+
+            return num_refreshed
+
+        return sum(self._fan_out('gc', refresh))
+
     def _active(self, queue_name, marker=None, echo=False,
                 client_uuid=None, projection=None, project=None,
                 limit=None):
@@ -394,11 +691,11 @@ class MessageController(storage.Message):
         # and the claim expiration time to now
         now = timeutils.utcnow_ts()
         scope = utils.scope_queue_name(queue_name, project)
-        collection = self._collection(queue_name, project)
 
-        collection.update_many({PROJ_QUEUE: scope, 'c.id': cid},
-                               {'$set': {'c': {'id': None, 'e': now}}},
-                               upsert=False)
+        for collection in self._queue_collections(queue_name, project):
+            collection.update_many({PROJ_QUEUE: scope, 'c.id': cid},
+                                   {'$set': {'c': {'id': None, 'e': now}}},
+                                   upsert=False)
 
     def _inc_counter(self, queue_name, project=None, amount=1, window=None):
         """Increments the message counter and returns the new value.
@@ -500,16 +797,71 @@ class MessageController(storage.Message):
         update = {'$inc': {'c.v': 0, 'c.t': 0}}
         query = _get_scoped_query(queue_name, project)
 
-        try:
-            collection = self._collection(queue_name, project).stats
-            doc = collection.find_one_and_update(
-                query, update, upsert=True,
-                return_document=pymongo.ReturnDocument.AFTER,
-                projection={'c.v': 1, '_id': 0})
+        while True:
+            try:
+                collection = self._collection(queue_name, project).stats
+                doc = collection.find_one_and_update(
+                    query, update, upsert=True,
+                    return_document=pymongo.ReturnDocument.AFTER,
+                    projection={'c.v': 1, '_id': 0})
 
-            return doc['c']['v']
-        except pymongo.errors.AutoReconnect as ex:
-            LOG.exception(ex)
+                return doc['c']['v']
+            except pymongo.errors.DuplicateKeyError:
+                # NOTE: A concurrent request created the stats document
+                # of the queue first, try again to update it.
+                continue
+            except pymongo.errors.AutoReconnect as ex:
+                LOG.exception(ex)
+                return None
+
+    def _reserve_markers(self, queue_name, project=None, amount=1):
+        """Reserves a range of consecutive markers for new messages.
+
+        By default, the message counter is incremented for every post.
+        When the marker_block_size option is set, blocks of that many
+        markers are reserved from the counter at a time, and handed out
+        by this process until they run out, so that a busy queue only
+        touches its counter once per block.
+
+        Markers stay unique, since blocks are reserved by incrementing
+        the counter atomically, and markers of a block are handed out
+        one range at a time under a lock. They are monotonic for the
+        messages posted through a given process, since the counter only
+        ever increases, so every block starts past the blocks reserved
+        before it. However, a message posted through another process
+        may get a lower marker than one posted earlier, in which case
+        clients paging through the queue by marker may skip it.
+
+        :param queue_name: Name of the queue to which the counter is scoped
+        :param project: Queue's project name
+        :param amount: (Default 1) Number of markers to reserve
+        :returns: First marker of the range
+        """
+        block_size = self.driver.mongodb_conf.marker_block_size
+        if not block_size:
+            # NOTE(flaper87): Make sure the counter exists. This method
+            # is an upsert.
+            self._get_counter(queue_name, project)
+            return self._inc_counter(queue_name, project,
+                                     amount=amount) - amount
+
+        key = (queue_name, project)
+        with self._marker_blocks_lock:
+            block = self._marker_blocks.get(key)
+            if block is None or block[1] - block[0] < amount:
+                # NOTE: Whatever is left of the previous block is
+                # skipped, which is fine since markers only have to be
+                # unique and increasing.
+                size = max(block_size, amount)
+
+                self._get_counter(queue_name, project)
+                end = self._inc_counter(queue_name, project, amount=size)
+                block = self._marker_blocks[key] = [end - size, end]
+
+            next_marker = block[0]
+            block[0] += amount
+
+        return next_marker
 
     # ----------------------------------------------------------------------
     # Public interface
@@ -517,7 +869,8 @@ class MessageController(storage.Message):
 
     def list(self, queue_name, project=None, marker=None,
              limit=storage.DEFAULT_MESSAGES_PER_PAGE,
-             echo=False, client_uuid=None, include_claimed=False):
+             echo=False, client_uuid=None, include_claimed=False,
+             projection=storage.MESSAGE_PROJECTION_FULL):
 
         if marker is not None:
             try:
@@ -525,9 +878,11 @@ class MessageController(storage.Message):
             except ValueError:
                 yield iter([])
 
+        # NOTE: Leave the fields that were not asked for on the server
         messages = self._list(queue_name, project=project, marker=marker,
                               client_uuid=client_uuid, echo=echo,
-                              include_claimed=include_claimed, limit=limit)
+                              include_claimed=include_claimed, limit=limit,
+                              projection=_LIST_PROJECTIONS[projection])
 
         marker_id = {}
 
@@ -538,11 +893,36 @@ class MessageController(storage.Message):
         def denormalizer(msg):
             marker_id['next'] = msg['k']
 
+            if projection == storage.MESSAGE_PROJECTION_IDS:
+                return {'id': str(msg['_id'])}
+
             return _basic_message(msg, now)
 
         yield utils.HookedCursor(messages, denormalizer)
         yield str(marker_id['next'])
 
+    def long_poll(self, queue_name, func, project=None, timeout=0):
+        listener = self._wakeup_listener(queue_name, project)
+        if listener is None:
+            return super(MessageController, self).long_poll(
+                queue_name, func, project=project, timeout=timeout)
+
+        deadline = time.time() + timeout
+        scope = utils.scope_queue_name(queue_name, project)
+
+        with listener.watch(scope) as posted:
+            while True:
+                # NOTE: Messages posted while func runs set the event
+                # again, so that they are not missed.
+                posted.clear()
+                result = func()
+
+                remaining = deadline - time.time()
+                if result or remaining <= 0:
+                    return result
+
+                posted.wait(remaining)
+
     @utils.raises_conn_error
     @utils.retries_on_autoreconnect
     def first(self, queue_name, project=None, sort=1):
@@ -618,18 +998,13 @@ class MessageController(storage.Message):
         if not self._queue_ctrl.exists(queue_name, project):
             raise errors.QueueDoesNotExist(queue_name, project)
 
-        # NOTE(flaper87): Make sure the counter exists. This method
-        # is an upsert.
-        self._get_counter(queue_name, project)
         now = timeutils.utcnow_ts()
         now_dt = datetime.datetime.utcfromtimestamp(now)
         collection = self._collection(queue_name, project)
 
         messages = list(messages)
-        msgs_n = len(messages)
-        next_marker = self._inc_counter(queue_name,
-                                        project,
-                                        amount=msgs_n) - msgs_n
+        next_marker = self._reserve_markers(queue_name, project,
+                                            amount=len(messages))
 
         prepared_messages = [
             {
@@ -647,6 +1022,7 @@ class MessageController(storage.Message):
         ]
 
         ids = collection.insert(prepared_messages, check_keys=False)
+        self._send_wakeup(queue_name, project)
 
         return [str(id_) for id_ in ids]
 
@@ -659,8 +1035,6 @@ class MessageController(storage.Message):
         if mid is None:
             return
 
-        collection = self._collection(queue_name, project)
-
         query = {
             '_id': mid,
             PROJ_QUEUE: utils.scope_queue_name(queue_name, project),
@@ -671,11 +1045,19 @@ class MessageController(storage.Message):
             raise errors.ClaimDoesNotExist(claim, queue_name, project)
 
         now = timeutils.utcnow_ts()
-        cursor = collection.find(query).hint(ID_INDEX_FIELDS)
 
-        try:
-            message = next(cursor)
-        except StopIteration:
+        # NOTE: While a repartitioning is in progress, the message may
+        # not have been moved to the partition of its queue yet.
+        collections = self._queue_collections(queue_name, project)
+        for collection in collections:
+            cursor = collection.find(query).hint(ID_INDEX_FIELDS)
+
+            try:
+                message = next(cursor)
+                break
+            except StopIteration:
+                pass
+        else:
             return
 
         if claim is None:
@@ -699,7 +1081,8 @@ class MessageController(storage.Message):
 
                     raise errors.MessageNotClaimed(message_id)
 
-        collection.delete_one(query)
+        for collection in collections:
+            collection.delete_one(query)
 
     @utils.raises_conn_error
     @utils.retries_on_autoreconnect
@@ -710,8 +1093,8 @@ class MessageController(storage.Message):
             PROJ_QUEUE: utils.scope_queue_name(queue_name, project),
         }
 
-        collection = self._collection(queue_name, project)
-        collection.delete_many(query)
+        for collection in self._queue_collections(queue_name, project):
+            collection.delete_many(query)
 
     @utils.raises_conn_error
     @utils.retries_on_autoreconnect
@@ -725,22 +1108,36 @@ class MessageController(storage.Message):
         now = timeutils.utcnow_ts()
         query['c.e'] = {'$lte': now}
 
-        collection = self._collection(queue_name, project)
         projection = {'_id': 1, 't': 1, 'b': 1, 'c.id': 1}
 
-        messages = (collection.find_one_and_delete(query,
-                                                   projection=projection)
-                    for _ in range(limit))
+        final_messages = []
+        for collection in self._queue_collections(queue_name, project):
+            while len(final_messages) < limit:
+                message = collection.find_one_and_delete(
+                    query, projection=projection)
+                if message is None:
+                    break
 
-        final_messages = [_basic_message(message, now)
-                          for message in messages
-                          if message]
+                final_messages.append(_basic_message(message, now))
 
         return final_messages
 
 
 class FIFOMessageController(MessageController):
 
+    def __init__(self, *args, **kwargs):
+        super(FIFOMessageController, self).__init__(*args, **kwargs)
+
+        self._post_locks = _KeyedLocks()
+
+        # NOTE: Totals since the process started, for the health
+        # report. Every insert of a batch of messages is an attempt,
+        # which may fail because of a conflict with a post made by
+        # another process.
+        self._post_stats = {'posts': 0, 'attempts': 0, 'conflicts': 0,
+                            'failures': 0}
+        self._post_stats_lock = threading.Lock()
+
     def _ensure_indexes(self, collection):
         """Ensures that all indexes are created."""
 
@@ -791,6 +1188,27 @@ class FIFOMessageController(MessageController):
         # NOTE(flaper87): Make sure the counter exists. This method
         # is an upsert.
         self._get_counter(queue_name, project)
+
+        # NOTE: Posts to the same queue are made one at a time by this
+        # process, in the order they come in, so that they never
+        # compete with each other for markers. Only posts made by other
+        # processes still can, and then get retried.
+        with self._post_locks.lock((queue_name, project)):
+            return self._post_in_order(queue_name, messages, client_uuid,
+                                       project)
+
+    def _count_posts(self, **counts):
+        with self._post_stats_lock:
+            for name, value in counts.items():
+                self._post_stats[name] += value
+
+    def _post_in_order(self, queue_name, messages, client_uuid, project):
+        """Inserts messages after the last ones posted to their queue.
+
+        :returns: List of the IDs of the messages
+        :raises MessageConflict: The messages could not be inserted
+            before running out of attempts
+        """
         now = timeutils.utcnow_ts()
         now_dt = datetime.datetime.utcfromtimestamp(now)
         collection = self._collection(queue_name, project)
@@ -837,6 +1255,8 @@ class FIFOMessageController(MessageController):
         # max sleep, 1000 max attempts), the max stall time
         # before the operation is abandoned is 49.95 seconds.
         for attempt in self._retry_range:
+            self._count_posts(attempts=1)
+
             try:
                 ids = collection.insert(prepared_messages, check_keys=False)
 
@@ -871,12 +1291,12 @@ class FIFOMessageController(MessageController):
                                            {'$set': {'tx': None}},
                                            upsert=False)
 
+                self._count_posts(posts=1)
+                self._send_wakeup(queue_name, project)
                 return [str(id_) for id_ in ids]
 
             except pymongo.errors.DuplicateKeyError as ex:
-                # TODO(kgriffs): Record stats of how often retries happen,
-                # and how many attempts, on average, are required to insert
-                # messages.
+                self._count_posts(conflicts=1)
 
                 # NOTE(kgriffs): This can be used in conjunction with the
                 # log line, above, that is emitted after all messages have
@@ -968,9 +1388,38 @@ class FIFOMessageController(MessageController):
                          queue=queue_name,
                          project=project))
 
+        self._count_posts(failures=1)
         raise errors.MessageConflict(queue_name, project)
 
 
+class _KeyedLocks(object):
+    """Locks created on demand for each key, e.g. for each queue.
+
+    Locks are dropped once no thread holds or waits for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # NOTE: Lists of [lock, number of threads using it], by key
+        self._locks = {}
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
 def _is_claimed(msg, now):
     return (msg['c']['id'] is not None and
             msg['c']['e'] > now)
@@ -980,14 +1429,19 @@ def _basic_message(msg, now):
     oid = msg['_id']
     age = now - utils.oid_ts(oid)
 
-    return {
+    message = {
         'id': str(oid),
         'age': int(age),
         'ttl': msg['t'],
-        'body': msg['b'],
         'claim_id': str(msg['c']['id']) if msg['c']['id'] else None
     }
 
+    # NOTE: The body is left out of metadata-only listings
+    if 'b' in msg:
+        message['body'] = msg['b']
+
+    return message
+
 
 class MessageQueueHandler(object):
 
@@ -1007,31 +1461,70 @@ class MessageQueueHandler(object):
             raise errors.QueueDoesNotExist(name, project)
 
         controller = self.message_controller
+        cache_ttl = self.driver.mongodb_conf.stats_cache_ttl
 
-        active = controller._count(name, project=project,
-                                   include_claimed=False)
+        summary = None
+        if not cache_ttl:
+            summary = controller._stats_summary(name, project)
+        elif not _exact_stats_requested():
+            summary = controller._get_stats_summary(name, project,
+                                                    max_age=cache_ttl)
 
-        total = controller._count(name, project=project,
-                                  include_claimed=True)
+        if summary is None:
+            summary = controller._refresh_stats_summary(name, project)
 
         message_stats = {
-            'claimed': total - active,
-            'free': active,
-            'total': total,
+            'claimed': summary['t'] - summary['f'],
+            'free': summary['f'],
+            'total': summary['t'],
         }
 
-        try:
-            oldest = controller.first(name, project=project, sort=1)
-            newest = controller.first(name, project=project, sort=-1)
-        except errors.QueueIsEmpty:
-            pass
-        else:
+        if 'o' in summary and 'n' in summary:
             now = timeutils.utcnow_ts()
-            message_stats['oldest'] = utils.stat_message(oldest, now)
-            message_stats['newest'] = utils.stat_message(newest, now)
+            message_stats['oldest'] = utils.stat_message({'id': summary['o']},
+                                                         now)
+            message_stats['newest'] = utils.stat_message({'id': summary['n']},
+                                                         now)
 
         return {'messages': message_stats}
 
 
+def _exact_stats_requested():
+    # NOTE: Requests that must see their own writes, e.g. a client
+    # waiting for a queue to be drained, get exact counts.
+    ctxt = context.get_current()
+    return getattr(ctxt, 'consistent_reads', False)
+
+
 def _get_scoped_query(name, project):
     return {'p_q': utils.scope_queue_name(name, project)}
+
+
+def _merge_duplicate_stats(stats):
+    """Keeps a single stats document per queue.
+
+    The document with the highest message counter is kept, so that
+    markers are not handed out again.
+
+    :param stats: Stats collection of a partition
+    :returns: Number of documents removed
+    """
+    pipeline = [
+        {'$group': {'_id': '$' + PROJ_QUEUE, 'ids': {'$push': '$_id'}}},
+        {'$match': {'ids.1': {'$exists': True}}},
+    ]
+
+    num_removed = 0
+    for group in stats.aggregate(pipeline):
+        docs = sorted(stats.find({'_id': {'$in': group['ids']}}),
+                      key=lambda doc: doc.get('c', {}).get('v', 0),
+                      reverse=True)
+        if any(doc.get(REPARTITION_PENDING) for doc in docs):
+            stats.update_one({'_id': docs[0]['_id']},
+                             {'$set': {REPARTITION_PENDING: True}})
+
+        result = stats.delete_many(
+            {'_id': {'$in': [doc['_id'] for doc in docs[1:]]}})
+        num_removed += result.deleted_count
+
+    return num_removed
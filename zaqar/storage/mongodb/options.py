@@ -126,11 +126,66 @@ MESSAGE_MONGODB_OPTIONS = _COMMON_OPTIONS + (
                help=('Number of databases across which to '
                      'partition message data, in order to '
                      'reduce writer lock %. DO NOT change '
-                     'this setting after initial deployment. '
-                     'It MUST remain static. Also, you '
+                     'this setting after initial deployment '
+                     'without following the steps described '
+                     'for zaqar-mongo-repartition, or existing '
+                     'messages will be lost. Also, you '
                      'should not need a large number of partitions '
                      'to improve performance, esp. if deploying '
                      'MongoDB on SSD storage.')),
+
+    cfg.IntOpt('previous_partitions', default=0, min=0,
+               help=('Number of partitions before the repartitioning in '
+                     'progress, if any. While set, queues whose messages '
+                     'have not been moved by zaqar-mongo-repartition yet '
+                     'keep using the partition they hashed to before. '
+                     'Set back to 0 once the repartitioning is complete.')),
+
+    cfg.StrOpt('claim_strategy', default='batch',
+               choices=('batch', 'atomic'),
+               help=('How messages are claimed. "batch" lists free '
+                     'messages and updates them with a single query, '
+                     'which may claim fewer messages than requested '
+                     'when consumers compete for the same ones. '
+                     '"atomic" claims messages one at a time, starting '
+                     'at a random offset, which keeps parallel '
+                     'requests from colliding at the cost of more '
+                     'round trips and of a relaxed claim order.')),
+
+    cfg.IntOpt('marker_block_size', default=0, min=0,
+               help=('Number of message markers to reserve from the '
+                     'message counter of a queue at a time, so that '
+                     'posting messages to a busy queue only updates its '
+                     'counter once per block. Markers are then only '
+                     'ordered across the messages posted through the '
+                     'same API process, so clients paging through a '
+                     'queue by marker may miss messages posted through '
+                     'other processes; claims are not affected. Set to '
+                     '0 to update the counter on every post. Ignored by '
+                     'the FIFO driver.')),
+
+    cfg.IntOpt('stats_cache_ttl', default=0, min=0,
+               help=('Number of seconds for which the message counts '
+                     'returned by queue stats are cached. Cached counts '
+                     'are approximate; requests sent with the '
+                     '"Read-Consistency: strong" header always get '
+                     'exact counts. The garbage collector refreshes '
+                     'cached counts once they are this old. Set to 0 '
+                     'to count messages on every request.')),
+
+    cfg.IntOpt('partition_workers', default=4, min=1,
+               help=('Maximum number of partitions worked on at the same '
+                     'time by operations spanning all of them, such as '
+                     'garbage collection, health reports and draining '
+                     'the messages of a project. Set to 1 to work on '
+                     'one partition at a time.')),
+
+    cfg.BoolOpt('long_poll_wakeups', default=False,
+                help=('Record message posts in a small capped collection '
+                      'of each partition, and tail it to wake up the '
+                      'requests waiting for messages with the "wait" '
+                      'parameter. When disabled, waiting requests check '
+                      'for new messages every second.')),
 )
 
 MANAGEMENT_MONGODB_GROUP = 'drivers:management_store:mongodb'
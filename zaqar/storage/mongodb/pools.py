@@ -38,6 +38,9 @@ URI_INDEX = [
     ('u', 1)
 ]
 
+# NOTE: Names of the indexes, checked for on startup.
+INDEX_NAMES = ('pools_name', 'pools_uri')
+
 # NOTE(cpp-cabrera): used for get/list operations. There's no need to
 # show the marker or the _id - they're implementation details.
 OMIT_FIELDS = (('_id', False),)
@@ -53,15 +56,22 @@ class PoolsController(base.PoolsBase):
         super(PoolsController, self).__init__(*args, **kwargs)
 
         self._col = self.driver.database.pools
-        self._col.ensure_index(POOLS_INDEX,
-                               background=True,
-                               name='pools_name',
-                               unique=True)
-
-        self._col.ensure_index(URI_INDEX,
-                               background=True,
-                               name='pools_uri',
-                               unique=True)
+        self._check_indexes()
+
+    def _check_indexes(self, force=False):
+        return utils.ensure_indexes(self._col, INDEX_NAMES,
+                                    self._ensure_indexes, force=force)
+
+    def _ensure_indexes(self, collection):
+        collection.ensure_index(POOLS_INDEX,
+                                background=True,
+                                name='pools_name',
+                                unique=True)
+
+        collection.ensure_index(URI_INDEX,
+                                background=True,
+                                name='pools_uri',
+                                unique=True)
 
     @utils.raises_conn_error
     def _list(self, marker=None, limit=10, detailed=False):
@@ -52,6 +52,9 @@ _QUEUE_CACHE_PREFIX = 'queuecontroller:'
 # TODO(kgriffs): Make dynamic?
 _QUEUE_CACHE_TTL = 5
 
+# NOTE: Names of the indexes, checked for on startup.
+INDEX_NAMES = (utils.index_name([(utils.PROJ_QUEUE_KEY, 1)]),)
+
 
 def _queue_exists_key(queue, project=None):
     # NOTE(kgriffs): Use string concatenation for performance,
@@ -90,16 +93,23 @@ class QueueController(storage.Queue):
         self._cache = self.driver.cache
         self._collection = self.driver.queues_database.queues
 
+        self._check_indexes()
+
+    # ----------------------------------------------------------------------
+    # Helpers
+    # ----------------------------------------------------------------------
+
+    def _check_indexes(self, force=False):
+        return utils.ensure_indexes(self._collection, INDEX_NAMES,
+                                    self._ensure_indexes, force=force)
+
+    def _ensure_indexes(self, collection):
         # NOTE(flaper87): This creates a unique index for
         # project and name. Using project as the prefix
         # allows for querying by project and project+name.
         # This is also useful for retrieving the queues list for
         # a specific project, for example. Order matters!
-        self._collection.ensure_index([('p_q', 1)], unique=True)
-
-    # ----------------------------------------------------------------------
-    # Helpers
-    # ----------------------------------------------------------------------
+        collection.ensure_index([('p_q', 1)], unique=True)
 
     def _get_counter(self, name, project=None):
         """Retrieves the current message counter value for a given queue.
@@ -0,0 +1,284 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Move MongoDB message data to a different number of partitions.
+
+Messages are stored in one of the partition databases depending on a
+hash of the name of their queue, so changing the partitions option of
+the [drivers:message_store:mongodb] section loses track of existing
+messages. This tool moves them to the partitions they hash to under
+the new number of partitions, while the API servers keep running:
+
+1. With the current configuration, mark the queues that are going to
+   move:
+
+    zaqar-mongo-repartition --config-file /etc/zaqar/zaqar.conf \
+        --step prepare --target-partitions 16
+
+2. Set the partitions option to the new number of partitions and the
+   previous_partitions option to the current one, then restart the API
+   servers. Marked queues keep using their previous partition until
+   they are moved.
+
+3. Move the messages, optionally limiting how many are moved per
+   second:
+
+    zaqar-mongo-repartition --config-file /etc/zaqar/zaqar.conf \
+        --step migrate --max-rate 1000
+
+4. Move the messages that may have been left behind and check that
+   there is nothing left to move:
+
+    zaqar-mongo-repartition --config-file /etc/zaqar/zaqar.conf \
+        --step cutover
+
+   then set previous_partitions back to 0 and restart the API servers.
+   When going down to fewer partitions, the databases of the partitions
+   no longer used can then be dropped.
+
+While the messages of a queue are being moved, the ones that have not
+been moved yet can not be listed or claimed. Deleting, popping and
+releasing them still works, since these are applied to both the
+previous and the new partition of the queue. Every step can safely be
+run again.
+"""
+
+import time
+
+from oslo_log import log as logging
+import pymongo.errors
+
+from zaqar.storage.mongodb import messages
+from zaqar.storage.mongodb import utils
+
+LOG = logging.getLogger(__name__)
+
+# Number of messages to move at a time
+MOVE_BATCH_SIZE = 1000
+
+# NOTE: Requests that looked up the partition of a queue right before
+# its messages were moved may still post messages to the previous
+# partition. Give them this many seconds to complete before looking
+# for messages left behind.
+SETTLE_SECONDS = 5
+
+_PROJ_QUEUE = messages.PROJ_QUEUE
+
+
+class Throttle(object):
+    """Limits the number of messages moved per second."""
+
+    def __init__(self, max_rate):
+        self._max_rate = max_rate
+        self._start = time.time()
+        self._count = 0
+
+    def __call__(self, count):
+        if not self._max_rate:
+            return
+
+        self._count += count
+        delay = (float(self._count) / self._max_rate -
+                 (time.time() - self._start))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _partition(scope, num_partitions):
+    project, queue = utils.parse_scoped_project_queue(scope)
+    return utils.get_partition(num_partitions, queue, project or None)
+
+
+def _move_messages(source, target, scope, throttle):
+    """Move the messages of a queue from a partition to another.
+
+    :returns: Number of messages moved
+    """
+
+    num_moved = 0
+
+    while True:
+        docs = list(source.find({_PROJ_QUEUE: scope},
+                                limit=MOVE_BATCH_SIZE))
+        if not docs:
+            return num_moved
+
+        # NOTE: Messages copied by an interrupted run are already
+        # there, which is fine.
+        utils.insert_missing(target, docs)
+
+        # NOTE: Messages are removed from both partitions while their
+        # queue is being moved, so the ones no longer in the source
+        # were removed before being copied, and must not come back.
+        ids = [doc['_id'] for doc in docs]
+        remaining = [doc['_id'] for doc in source.find(
+            {'_id': {'$in': ids}}, projection={'_id': 1})]
+        removed = list(set(ids) - set(remaining))
+
+        if remaining:
+            source.delete_many({'_id': {'$in': remaining}})
+        if removed:
+            target.delete_many({'_id': {'$in': removed}})
+
+        num_moved += len(remaining)
+        throttle(len(docs))
+
+
+def _copy_stats(target, scope, doc):
+    """Copy the stats of a queue over to its new partition.
+
+    Besides the cached counts, the stats document holds the message
+    counter of the queue when the control plane does not keep it.
+    The counter has to carry on from where it was, or new messages
+    would get the markers of the messages moved.
+
+    :param target: Messages collection of the new partition
+    :param scope: Scoped name of the queue
+    :param doc: Stats document of the queue in its previous partition
+    """
+
+    update = {}
+    if 'c' in doc:
+        update['$max'] = {'c.v': doc['c']['v'], 'c.t': doc['c']['t']}
+    if 's' in doc:
+        update['$set'] = {'s': doc['s']}
+
+    if not update:
+        return
+
+    while True:
+        try:
+            target.stats.update_one({_PROJ_QUEUE: scope}, update,
+                                    upsert=True)
+            return
+        except pymongo.errors.DuplicateKeyError:
+            # NOTE: An API server created the document first, which
+            # can now be updated.
+            continue
+
+
+def prepare(controller, target_partitions):
+    """Mark the queues whose partition changes with the new count.
+
+    :param controller: MongoDB message controller, configured with the
+        current number of partitions
+    :param target_partitions: Number of partitions to move to
+    :returns: Number of queues marked
+    """
+
+    num_marked = 0
+
+    for partition, collection in enumerate(controller._collections):
+        for scope in collection.distinct(_PROJ_QUEUE):
+            if _partition(scope, target_partitions) == partition:
+                continue
+
+            collection.stats.update_one(
+                {_PROJ_QUEUE: scope},
+                {'$set': {messages.REPARTITION_PENDING: True}},
+                upsert=True)
+            num_marked += 1
+
+    return num_marked
+
+
+def sweep(controller, throttle):
+    """Move messages out of partitions their queue no longer uses.
+
+    These are messages posted by requests that were in flight while
+    their queue was moved, and the messages of queues created after
+    the prepare step.
+
+    :returns: (number of queues, number of messages) moved
+    """
+
+    num_queues = 0
+    num_messages = 0
+
+    for partition, source in enumerate(controller._collections):
+        for scope in source.distinct(_PROJ_QUEUE):
+            new_partition = _partition(scope, controller._num_partitions)
+            if new_partition == partition:
+                continue
+
+            pending = source.stats.find_one(
+                {_PROJ_QUEUE: scope, messages.REPARTITION_PENDING: True})
+            if pending is not None:
+                continue
+
+            target = controller._collections[new_partition]
+            num_messages += _move_messages(source, target, scope, throttle)
+            num_queues += 1
+
+    return num_queues, num_messages
+
+
+def migrate(controller, throttle):
+    """Move the messages of the queues marked by the prepare step.
+
+    :param controller: MongoDB message controller, configured with
+        the new number of partitions and the previous one
+    :returns: (number of queues, number of messages) moved
+    """
+
+    num_queues = 0
+    num_messages = 0
+
+    for partition in range(controller._previous_partitions):
+        source = controller._collections[partition]
+        docs = list(source.stats.find({messages.REPARTITION_PENDING: True},
+                                      projection={_PROJ_QUEUE: 1, '_id': 0}))
+
+        for doc in docs:
+            scope = doc[_PROJ_QUEUE]
+            target = controller._collections[
+                _partition(scope, controller._num_partitions)]
+
+            query = {_PROJ_QUEUE: scope}
+            stats = source.stats.find_one(query)
+            if stats is not None:
+                _copy_stats(target, scope, stats)
+
+            # NOTE: From now on the API servers use the new partition
+            # of the queue. Requests that were still using the previous
+            # one may have posted messages in the meantime, so copy the
+            # counter again.
+            stats = source.stats.find_one_and_delete(query)
+            if stats is not None:
+                _copy_stats(target, scope, stats)
+
+            num_messages += _move_messages(source, target, scope, throttle)
+            num_queues += 1
+
+            LOG.debug(u'Moved queue %s', scope)
+
+    time.sleep(SETTLE_SECONDS)
+
+    swept_queues, swept_messages = sweep(controller, throttle)
+    return num_queues + swept_queues, num_messages + swept_messages
+
+
+def cutover(controller, throttle):
+    """Move the messages left behind, and check nothing else is left.
+
+    :returns: (number of messages moved, number of queues still
+        waiting to be moved)
+    """
+
+    _, num_messages = sweep(controller, throttle)
+
+    num_pending = sum(
+        collection.stats.find({messages.REPARTITION_PENDING: True}).count()
+        for collection in controller._collections)
+
+    return num_messages, num_pending
@@ -35,6 +35,9 @@ TTL_INDEX_FIELDS = [
     ('e', 1),
 ]
 
+# NOTE: Names of the indexes, checked for on startup.
+INDEX_NAMES = (utils.index_name(SUBSCRIPTIONS_INDEX), 'ttl')
+
 
 class SubscriptionController(base.Subscription):
     """Implements subscription resource operations using MongoDB.
@@ -54,15 +57,22 @@ class SubscriptionController(base.Subscription):
     def __init__(self, *args, **kwargs):
         super(SubscriptionController, self).__init__(*args, **kwargs)
         self._collection = self.driver.subscriptions_database.subscriptions
-        self._collection.ensure_index(SUBSCRIPTIONS_INDEX, unique=True)
+        self._check_indexes()
+
+    def _check_indexes(self, force=False):
+        return utils.ensure_indexes(self._collection, INDEX_NAMES,
+                                    self._ensure_indexes, force=force)
+
+    def _ensure_indexes(self, collection):
+        collection.ensure_index(SUBSCRIPTIONS_INDEX, unique=True)
         # NOTE(flwang): MongoDB will automatically delete the subscription
         # from the subscriptions collection when the subscription's 'e' value
         # is older than the number of seconds specified in expireAfterSeconds,
         # i.e. 0 seconds older in this case. As such, the data expires at the
         # specified 'e' value.
-        self._collection.ensure_index(TTL_INDEX_FIELDS, name='ttl',
-                                      expireAfterSeconds=0,
-                                      background=True)
+        collection.ensure_index(TTL_INDEX_FIELDS, name='ttl',
+                                expireAfterSeconds=0,
+                                background=True)
 
     @utils.raises_conn_error
     def list(self, queue, project=None, marker=None,
@@ -24,6 +24,7 @@ import time
 from bson import errors as berrors
 from bson import objectid
 from bson import tz_util
+from futurist import waiters
 from oslo_log import log as logging
 from oslo_utils import timeutils
 from pymongo import errors
@@ -38,6 +39,9 @@ EPOCH = datetime.datetime.utcfromtimestamp(0).replace(tzinfo=tz_util.utc)
 # NOTE(cpp-cabrera): the authoritative form of project/queue keys.
 PROJ_QUEUE_KEY = 'p_q'
 
+# Error code MongoDB uses for unique index violations
+DUPLICATE_KEY_ERROR = 11000
+
 LOG = logging.getLogger(__name__)
 
 
@@ -240,6 +244,87 @@ def get_partition(num_partitions, queue, project=None):
     return binascii.crc32(name.encode('utf-8')) % num_partitions
 
 
+def fan_out(func, items, executor=None):
+    """Calls a function once for each item, using a pool of threads.
+
+    Meant for work spread across partitions, which can be done
+    concurrently since each partition lives in its own database.
+
+    :param func: Callable taking a single item
+    :param items: Iterable of items to pass to `func`
+    :param executor: Executor the calls are submitted to, which
+        bounds the number of concurrent calls. When None, the items
+        are processed one after another by the calling thread.
+    :returns: List of the values returned by `func`, in the same
+        order as the items
+    :raises Exception: The first exception raised by `func`, once all
+        the calls have completed
+    """
+
+    items = list(items)
+
+    if executor is None or len(items) <= 1:
+        return [func(item) for item in items]
+
+    futures = [executor.submit(func, item) for item in items]
+    waiters.wait_for_all(futures)
+
+    return [future.result() for future in futures]
+
+
+def insert_missing(collection, docs):
+    """Inserts documents, skipping the ones that already exist.
+
+    Meant for copying documents over from another collection, which a
+    previous, interrupted attempt may have partly done already.
+
+    :param collection: Collection to insert the documents into
+    :param docs: Non-empty list of documents, with their _id set
+    :returns: Number of documents inserted
+    """
+
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except errors.BulkWriteError as ex:
+        write_errors = ex.details['writeErrors']
+        if any(e['code'] != DUPLICATE_KEY_ERROR for e in write_errors):
+            raise
+
+        return ex.details['nInserted']
+
+
+def index_name(fields):
+    """Returns the name MongoDB gives by default to an index on fields."""
+    return '_'.join('%s_%s' % field for field in fields)
+
+
+def missing_indexes(collection, names):
+    """Tells whether any of the named indexes of a collection is missing."""
+    return not set(names).issubset(collection.index_information())
+
+
+def ensure_indexes(collection, names, create, force=False):
+    """Creates the indexes of a collection, unless already done.
+
+    Checking for the indexes only takes a single read of the indexes
+    of the collection. Indexes must be renamed whenever they are
+    changed, so that they get created again.
+
+    :param collection: Collection the indexes are for
+    :param names: Names of the indexes `create` creates
+    :param create: Callable creating the indexes, taking the collection
+    :param force: If True, create the indexes even if none of them is
+        missing
+    :returns: True if the indexes were created, False otherwise
+    """
+
+    if not force and not missing_indexes(collection, names):
+        return False
+
+    create(collection)
+    return True
+
+
 def raises_conn_error(func):
     """Handles the MongoDB ConnectionFailure error.
 
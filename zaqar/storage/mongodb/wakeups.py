@@ -0,0 +1,140 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Wakeups for requests waiting for messages to be posted.
+
+Posts to the queues of a partition are recorded in a small capped
+collection of the partition's database. Each process tails it with a
+single thread, which wakes up the requests waiting on the queues that
+got messages, so that waiting requests do not query the messages
+collection until there is something new in it.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+from oslo_log import log as logging
+import pymongo
+import pymongo.errors
+
+from zaqar.storage.mongodb import utils
+
+LOG = logging.getLogger(__name__)
+
+COLLECTION_NAME = 'wakeups'
+
+# NOTE: Wakeups are only needed until waiting requests have been
+# woken up, so the collection can be kept small.
+COLLECTION_SIZE = 1024 * 1024
+
+# Number of seconds to wait before tailing the collection again after
+# an error.
+RETRY_DELAY = 1
+
+
+def get_collection(database):
+    """Returns the wakeup collection of a database, creating it if needed.
+
+    Wakeups are sent without waiting for an acknowledgement, since a
+    lost wakeup only delays a waiting request until it times out.
+    """
+
+    try:
+        database.create_collection(COLLECTION_NAME, capped=True,
+                                   size=COLLECTION_SIZE)
+
+        # NOTE: Tailable cursors on an empty capped collection are
+        # closed right away, so start with a placeholder document.
+        database[COLLECTION_NAME].insert_one({utils.PROJ_QUEUE_KEY: None})
+
+    except (pymongo.errors.CollectionInvalid,
+            pymongo.errors.OperationFailure):
+        # NOTE: The collection already exists, possibly because another
+        # process just created it.
+        pass
+
+    return database.get_collection(COLLECTION_NAME,
+                                   write_concern=pymongo.WriteConcern(w=0))
+
+
+class Listener(object):
+    """Wakes up the requests waiting on the queues of a partition.
+
+    :param collection: Wakeup collection of the partition
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # NOTE: Sets of threading.Event objects, by scoped queue name
+        self._waiters = collections.defaultdict(set)
+
+    def notify(self, scope):
+        """Wakes up the requests waiting on a queue, in every process.
+
+        :param scope: Scoped name of the queue
+        """
+        self._collection.insert_one({utils.PROJ_QUEUE_KEY: scope})
+
+    @contextlib.contextmanager
+    def watch(self, scope):
+        """Gives an event that is set whenever a queue gets messages.
+
+        :param scope: Scoped name of the queue
+        """
+        event = threading.Event()
+
+        with self._lock:
+            self._waiters[scope].add(event)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._tail,
+                                                name='zaqar-wakeups')
+                self._thread.daemon = True
+                self._thread.start()
+
+        try:
+            yield event
+        finally:
+            with self._lock:
+                self._waiters[scope].discard(event)
+                if not self._waiters[scope]:
+                    del self._waiters[scope]
+
+    def _wake(self, scope):
+        with self._lock:
+            for event in self._waiters.get(scope, ()):
+                event.set()
+
+    def _tail(self):
+        while True:
+            try:
+                # NOTE: Wakeups are not filtered by ID, since the IDs
+                # generated by different hosts are not strictly ordered.
+                # The ones sent before the cursor was opened wake up
+                # waiting requests for nothing, which is harmless.
+                cursor = self._collection.find(
+                    cursor_type=pymongo.CursorType.TAILABLE_AWAIT)
+
+                while cursor.alive:
+                    for doc in cursor:
+                        self._wake(doc[utils.PROJ_QUEUE_KEY])
+
+            except Exception as ex:
+                LOG.exception(ex)
+
+            time.sleep(RETRY_DELAY)
@@ -138,6 +138,15 @@ class DataDriver(base.DataDriverBase):
     def _health(self):
         return self._storage._health()
 
+    def gc(self, incremental=False):
+        self._storage.gc(incremental)
+
+    def drain(self, project=None):
+        return self._storage.drain(project)
+
+    def ensure_indexes(self, force=False):
+        self._storage.ensure_indexes(force)
+
     @decorators.lazy_property(write=False)
     def queue_controller(self):
         stages = _get_builtin_entry_points('queue', self._storage,
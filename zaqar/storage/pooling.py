@@ -118,11 +118,22 @@ class DataDriver(storage.DataDriverBase):
 
         return KPI
 
-    def gc(self):
+    def gc(self, incremental=False):
         cursor = self._pool_catalog._pools_ctrl.list(limit=0)
         for pool in next(cursor):
             driver = self._pool_catalog.get_driver(pool['name'])
-            driver.gc()
+            driver.gc(incremental)
+
+    def drain(self, project=None):
+        cursor = self._pool_catalog._pools_ctrl.list(limit=0)
+        return sum(self._pool_catalog.get_driver(pool['name']).drain(project)
+                   for pool in next(cursor))
+
+    def ensure_indexes(self, force=False):
+        cursor = self._pool_catalog._pools_ctrl.list(limit=0)
+        for pool in next(cursor):
+            driver = self._pool_catalog.get_driver(pool['name'])
+            driver.ensure_indexes(force)
 
     @decorators.lazy_property(write=False)
     def queue_controller(self):
@@ -305,13 +316,15 @@ class MessageController(storage.Message):
 
     def list(self, queue, project=None, marker=None,
              limit=storage.DEFAULT_MESSAGES_PER_PAGE,
-             echo=False, client_uuid=None, include_claimed=False):
+             echo=False, client_uuid=None, include_claimed=False,
+             projection=storage.MESSAGE_PROJECTION_FULL):
         control = self._get_controller(queue, project)
         if control:
             return control.list(queue, project=project,
                                 marker=marker, limit=limit,
                                 echo=echo, client_uuid=client_uuid,
-                                include_claimed=include_claimed)
+                                include_claimed=include_claimed,
+                                projection=projection)
         return iter([[]])
 
     def get(self, queue, message_id, project=None):
@@ -327,6 +340,13 @@ class MessageController(storage.Message):
             return control.first(queue, project=project, sort=sort)
         raise errors.QueueDoesNotExist(queue, project)
 
+    def long_poll(self, queue, func, project=None, timeout=0):
+        control = self._get_controller(queue, project)
+        if control:
+            return control.long_poll(queue, func, project=project,
+                                     timeout=timeout)
+        return func()
+
 
 class ClaimController(storage.Claim):
     """Routes operations to a claim controller in the appropriate pool.
@@ -369,6 +389,13 @@ class ClaimController(storage.Claim):
                                   project=project)
         return None
 
+    def long_poll(self, queue, func, project=None, timeout=0):
+        control = self._get_controller(queue, project)
+        if control:
+            return control.long_poll(queue, func, project=project,
+                                     timeout=timeout)
+        return func()
+
 
 class SubscriptionController(storage.Subscription):
     """Controller to facilitate processing for subscription operations."""
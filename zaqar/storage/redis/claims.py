@@ -27,29 +27,21 @@ from zaqar.storage.redis import utils
 
 QUEUE_CLAIMS_SUFFIX = 'claims'
 CLAIM_MESSAGES_SUFFIX = 'messages'
-# The rank counter is an atomic index to rank messages
-# in a FIFO manner.
-MESSAGE_RANK_COUNTER_SUFFIX = 'rank_counter'
 
 RETRY_CLAIM_TIMEOUT = 10
 
-# NOTE(kgriffs): Number of claims to read at a time when counting
-# the total number of claimed messages for a queue.
-#
-# TODO(kgriffs): Tune this parameter and/or make it configurable. It
-# takes  ~0.8 ms to retrieve 100 items from a sorted set on a 2.7 GHz
-# Intel Core i7 (not including network latency).
-COUNTING_BATCH_SIZE = 100
-
 
 class ClaimController(storage.Claim, scripting.Mixin):
     """Implements claim resource operations using Redis.
 
+    Like messages, every key is prefixed with the Redis Cluster hash
+    tag of the queue, {<project_id>.<queue_name>}.
+
     Redis Data Structures:
 
     1. Claims list (Redis set) contains claim IDs
 
-        Key: <project_id>.<queue_name>.claims
+        Key: {<project_id>.<queue_name>}.claims
 
         +-------------+---------+
         |  Name       |  Field  |
@@ -60,11 +52,11 @@ class ClaimController(storage.Claim, scripting.Mixin):
     2. Claimed Messages (Redis set) contains the list
     of message ids stored per claim
 
-        Key: <claim_id>.messages
+        Key: {<project_id>.<queue_name>}.<claim_id>.messages
 
     3. Claim info (Redis hash):
 
-        Key: <claim_id>
+        Key: {<project_id>.<queue_name>}.<claim_id>
 
         +----------------+---------+
         |  Name          |  Field  |
@@ -79,7 +71,7 @@ class ClaimController(storage.Claim, scripting.Mixin):
         +----------------+---------+
     """
 
-    script_names = ['claim_messages']
+    script_names = ['claim_messages', 'take_message']
 
     def __init__(self, *args, **kwargs):
         super(ClaimController, self).__init__(*args, **kwargs)
@@ -89,20 +81,27 @@ class ClaimController(storage.Claim, scripting.Mixin):
                                       use_bin_type=True).pack
         self._unpacker = functools.partial(msgpack.unpackb, encoding='utf-8')
 
+    @property
+    def _read_client(self):
+        """Client for read-only operations, which may be a replica."""
+        return self.driver.read_connection
+
     @decorators.lazy_property(write=False)
     def _queue_ctrl(self):
         return self.driver.queue_controller
 
-    def _get_claim_info(self, claim_id, fields, transform=int):
+    def _get_claim_info(self, queue, project, claim_id, fields,
+                        transform=int):
         """Get one or more fields from the claim Info."""
 
-        values = self._client.hmget(claim_id, fields)
+        claim_key = utils.scope_queue_key(queue, project, claim_id)
+        values = self._client.hmget(claim_key, fields)
         if values == [None]:
             return values
         else:
             return [transform(v) for v in values] if transform else values
 
-    def _claim_messages(self, msgset_key, now, limit,
+    def _claim_messages(self, queue, project, now, limit,
                         claim_id, claim_expires, msg_ttl, msg_expires):
 
         # NOTE(kgriffs): A watch on a pipe could also be used, but that
@@ -110,8 +109,13 @@ class ClaimController(storage.Claim, scripting.Mixin):
         # having to do something similar in the MongoDB driver.
         func = self._scripts['claim_messages']
 
-        args = [now, limit, claim_id, claim_expires, msg_ttl, msg_expires]
-        return func(keys=[msgset_key], args=args)
+        keys = [utils.msgset_key(queue, project),
+                utils.freeset_key(queue, project),
+                utils.claimedset_key(queue, project)]
+
+        args = [now, limit, claim_id, claim_expires, msg_ttl, msg_expires,
+                utils.scope_queue_key(queue, project)]
+        return func(keys=keys, args=args)
 
     def _exists(self, queue, claim_id, project):
         client = self._client
@@ -131,7 +135,7 @@ class ClaimController(storage.Claim, scripting.Mixin):
         if client.zscore(claims_set_key, claim_id) is None:
             return False
 
-        expires = self._get_claim_info(claim_id, b'e')[0]
+        expires = self._get_claim_info(queue, project, claim_id, b'e')[0]
         now = timeutils.utcnow_ts()
 
         if expires <= now:
@@ -143,66 +147,68 @@ class ClaimController(storage.Claim, scripting.Mixin):
 
         return True
 
-    def _get_claimed_message_keys(self, claim_msgs_key):
-        return self._client.lrange(claim_msgs_key, 0, -1)
-
-    def _count_messages(self, queue, project):
-        """Count and return the total number of claimed messages."""
-
-        # NOTE(kgriffs): Iterate through all claims, adding up the
-        # number of messages per claim. This is obviously slower
-        # than keeping a side counter, but is also less error-prone.
-        # Plus, it avoids having to do a lot of extra work during
-        # garbage collection passes. Also, considering that most
-        # workloads won't require a large number of claims, most of
-        # the time we can do this in a single pass, so it is still
-        # pretty fast.
+    def _move_message(self, queue, dlq, project, message_id, fields):
+        """Move a message over to another queue.
 
-        claims_set_key = utils.scope_claims_set(queue, project,
-                                                QUEUE_CLAIMS_SUFFIX)
-        num_claimed = 0
-        offset = 0
+        Keys of different queues may be stored on different nodes of a
+        Redis Cluster, so the record is copied over rather than renamed.
+        The message is taken out of its queue atomically, then its
+        record is written, and only then is it indexed into the other
+        queue, so that it can never be listed or claimed there while
+        its record is missing.
 
-        while True:
-            claim_ids = self._client.zrange(claims_set_key, offset,
-                                            offset + COUNTING_BATCH_SIZE - 1)
-            if not claim_ids:
-                break
+        :param fields: Fields of the record to update on the way
+        :returns: True if the message was moved, False if it no longer
+            exists.
+        """
 
-            offset += len(claim_ids)
+        func = self._scripts['take_message']
+        src_key = utils.message_key(queue, project, message_id)
 
-            with self._client.pipeline() as pipe:
-                for cid in claim_ids:
-                    pipe.hmget(cid, 'n')
+        keys = [utils.msgset_key(queue, project),
+                utils.freeset_key(queue, project),
+                utils.claimedset_key(queue, project),
+                src_key]
 
-                claim_infos = pipe.execute()
+        taken = func(keys=keys, args=[message_id])
+        if not taken:
+            return False
 
-            for info in claim_infos:
-                # NOTE(kgriffs): In case the claim was deleted out
-                # from under us, sanity-check that we got a non-None
-                # info list.
-                if info:
-                    num_claimed += int(info[0])
+        record, pttl = taken
+        hmap = dict(zip(record[::2], record[1::2]))
 
-        return num_claimed
+        # NOTE: Should this process die right here, the message is
+        # lost, but it can never be left in both queues, nor be brought
+        # back once deleted.
+        dst_key = utils.message_key(dlq, project, message_id)
+        with self._client.pipeline() as pipe:
+            pipe.hmset(dst_key, hmap)
+            pipe.hmset(dst_key, fields)
+            if pttl > 0:
+                pipe.pexpire(dst_key, pttl)
+            pipe.execute()
 
-    def _del_message(self, queue, project, claim_id, message_id, pipe):
-        """Called by MessageController when messages are being deleted.
+        self.driver.message_controller._index_messages(dlq, project,
+                                                       [message_id])
+        return True
 
-        This method removes the message from claim data structures.
-        """
+    def _get_claimed_message_keys(self, queue, project, claim_msgs_key):
+        message_ids = self._client.lrange(claim_msgs_key, 0, -1)
+        return utils.message_keys(queue, project, message_ids)
 
-        claim_msgs_key = utils.scope_claim_messages(claim_id,
-                                                    CLAIM_MESSAGES_SUFFIX)
+    def _count_messages(self, queue, project):
+        """Count and return the total number of claimed messages."""
 
-        # NOTE(kgriffs): In practice, scanning will be quite fast,
-        # since the usual pattern is to delete messages from oldest
-        # to newest, and the list is sorted in that order. Also,
-        # the length of the list will usually be ~10 messages.
-        pipe.lrem(claim_msgs_key, 1, message_id)
+        # NOTE: The claimed set is scored by claim expiration time, so
+        # counting the entries that expire in the future gives us the
+        # number of messages currently claimed in a single call. Since
+        # expired and released claims are simply not counted, there is
+        # no side counter that could drift and need to be repaired.
+        claimedset_key = utils.claimedset_key(queue, project)
+        now = timeutils.utcnow_ts()
 
-        # NOTE(kgriffs): Decrement the message counter used for stats
-        pipe.hincrby(claim_id, 'n', -1)
+        return self._read_client.zcount(claimedset_key, '(' + str(now),
+                                        '+inf')
 
     @utils.raises_conn_error
     @utils.retries_on_connection_error
@@ -227,11 +233,11 @@ class ClaimController(storage.Claim, scripting.Mixin):
         if not self._exists(queue, claim_id, project):
             raise errors.ClaimDoesNotExist(claim_id, queue, project)
 
-        claim_msgs_key = utils.scope_claim_messages(claim_id,
-                                                    CLAIM_MESSAGES_SUFFIX)
+        claim_msgs_key = _claim_messages_key(queue, project, claim_id)
 
         # basic_messages
-        msg_keys = self._get_claimed_message_keys(claim_msgs_key)
+        msg_keys = self._get_claimed_message_keys(queue, project,
+                                                  claim_msgs_key)
         claimed_msgs = messages.Message.from_redis_bulk(msg_keys,
                                                         self._client)
         now = timeutils.utcnow_ts()
@@ -240,7 +246,8 @@ class ClaimController(storage.Claim, scripting.Mixin):
 
         # claim_meta
         now = timeutils.utcnow_ts()
-        expires, ttl = self._get_claim_info(claim_id, [b'e', b't'])
+        expires, ttl = self._get_claim_info(queue, project, claim_id,
+                                            [b'e', b't'])
         update_time = expires - ttl
         age = now - update_time
 
@@ -258,7 +265,6 @@ class ClaimController(storage.Claim, scripting.Mixin):
                limit=storage.DEFAULT_MESSAGES_PER_CLAIM):
 
         queue_ctrl = self.driver.queue_controller
-        msg_ctrl = self.driver.message_controller
 
         claim_ttl = metadata['ttl']
         grace = metadata['grace']
@@ -275,20 +281,19 @@ class ClaimController(storage.Claim, scripting.Mixin):
         claimed_msgs = []
 
         # NOTE(kgriffs): Claim some messages
-        msgset_key = utils.msgset_key(queue, project)
-        claimed_ids = self._claim_messages(msgset_key, now, limit,
+        claimed_ids = self._claim_messages(queue, project, now, limit,
                                            claim_id, claim_expires,
                                            msg_ttl, msg_expires)
 
         if claimed_ids:
-            claimed_msgs = messages.Message.from_redis_bulk(claimed_ids,
-                                                            self._client)
+            claimed_msgs = messages.Message.from_redis_bulk(
+                utils.message_keys(queue, project, claimed_ids), self._client)
             claimed_msgs = [msg.to_basic(now) for msg in claimed_msgs]
 
             # NOTE(kgriffs): Perist claim records
             with self._client.pipeline() as pipe:
-                claim_msgs_key = utils.scope_claim_messages(
-                    claim_id, CLAIM_MESSAGES_SUFFIX)
+                claim_key = utils.scope_queue_key(queue, project, claim_id)
+                claim_msgs_key = _claim_messages_key(queue, project, claim_id)
 
                 for mid in claimed_ids:
                     pipe.rpush(claim_msgs_key, mid)
@@ -302,8 +307,8 @@ class ClaimController(storage.Claim, scripting.Mixin):
                     'n': len(claimed_ids),
                 }
 
-                pipe.hmset(claim_id, claim_info)
-                pipe.expire(claim_id, claim_ttl)
+                pipe.hmset(claim_key, claim_info)
+                pipe.expire(claim_key, claim_ttl)
 
                 # NOTE(kgriffs): Add the claim ID to a set so that
                 # existence checks can be performed quickly. This
@@ -328,7 +333,8 @@ class ClaimController(storage.Claim, scripting.Mixin):
                                 # 1. Save the new max claim count for message
                                 claim_count = claimed_count + 1
                                 dic = {"c.c": claim_count}
-                                pipe.hmset(msg['id'], dic)
+                                pipe.hmset(utils.message_key(
+                                    queue, project, msg['id']), dic)
                                 pipe.execute()
                             else:
                                 # 2. Check if the message's claim count has
@@ -340,29 +346,14 @@ class ClaimController(storage.Claim, scripting.Mixin):
                                 # letter queue directly.That means, the queue
                                 # and dead letter queue must be created on
                                 # the same pool.
-                                ddl = utils.scope_queue_name(
-                                    queue_meta['_dead_letter_queue'], project)
+                                ddl = queue_meta['_dead_letter_queue']
                                 ddl_ttl = queue_meta.get(
                                     "_dead_letter_queue_messages_ttl")
                                 dic = {"t": msg['ttl']}
                                 if ddl_ttl:
                                     dic = {"t": ddl_ttl}
-                                pipe.hmset(msg['id'], dic)
-                                queueproject = [s for s in ddl.split('.')]
-                                msgs_key_ddl = utils.msgset_key(
-                                    queueproject[1], queueproject[0])
-                                counter_key_ddl = utils.scope_queue_index(
-                                    queueproject[1], queueproject[0],
-                                    MESSAGE_RANK_COUNTER_SUFFIX)
-                                msgs_key = utils.msgset_key(
-                                    queue, project=project)
-                                pipe.zrem(msgs_key, msg['id'])
-                                message_ids = []
-                                message_ids.append(msg['id'])
-                                msg_ctrl._index_messages(msgs_key_ddl,
-                                                         counter_key_ddl,
-                                                         message_ids)
-                                pipe.execute()
+                                self._move_message(queue, ddl, project,
+                                                   msg['id'], dic)
                                 # Add dead letter message to
                                 # claimed_msgs_removed, finally remove
                                 # them from claimed_msgs.
@@ -391,10 +382,11 @@ class ClaimController(storage.Claim, scripting.Mixin):
         msg_ttl = claim_ttl + grace
         msg_expires = claim_expires + grace
 
-        claim_msgs_key = utils.scope_claim_messages(claim_id,
-                                                    CLAIM_MESSAGES_SUFFIX)
+        claim_key = utils.scope_queue_key(queue, project, claim_id)
+        claim_msgs_key = _claim_messages_key(queue, project, claim_id)
 
-        msg_keys = self._get_claimed_message_keys(claim_msgs_key)
+        msg_keys = self._get_claimed_message_keys(queue, project,
+                                                  claim_msgs_key)
         claimed_msgs = messages.MessageEnvelope.from_redis_bulk(msg_keys,
                                                                 self._client)
         claim_info = {
@@ -402,6 +394,8 @@ class ClaimController(storage.Claim, scripting.Mixin):
             'e': claim_expires,
         }
 
+        claimedset_key = utils.claimedset_key(queue, project)
+
         with self._client.pipeline() as pipe:
             for msg in claimed_msgs:
                 if msg:
@@ -418,12 +412,15 @@ class ClaimController(storage.Claim, scripting.Mixin):
                     #
                     # When this change is made, don't forget to
                     # also call pipe.expire with the new TTL value.
-                    msg.to_redis(pipe)
+                    msg.to_redis(pipe, utils.message_key(queue, project,
+                                                         msg.id))
+
+                    pipe.zadd(claimedset_key, claim_expires, msg.id)
 
             # Update the claim id and claim expiration info
             # for all the messages.
-            pipe.hmset(claim_id, claim_info)
-            pipe.expire(claim_id, claim_ttl)
+            pipe.hmset(claim_key, claim_info)
+            pipe.expire(claim_key, claim_ttl)
 
             pipe.expire(claim_msgs_key, claim_ttl)
 
@@ -443,20 +440,22 @@ class ClaimController(storage.Claim, scripting.Mixin):
             return
 
         now = timeutils.utcnow_ts()
-        claim_msgs_key = utils.scope_claim_messages(claim_id,
-                                                    CLAIM_MESSAGES_SUFFIX)
+        claim_key = utils.scope_queue_key(queue, project, claim_id)
+        claim_msgs_key = _claim_messages_key(queue, project, claim_id)
 
-        msg_keys = self._get_claimed_message_keys(claim_msgs_key)
+        msg_keys = self._get_claimed_message_keys(queue, project,
+                                                  claim_msgs_key)
         claimed_msgs = messages.MessageEnvelope.from_redis_bulk(msg_keys,
                                                                 self._client)
         # Update the claim id and claim expiration info
         # for all the messages.
         claims_set_key = utils.scope_claims_set(queue, project,
                                                 QUEUE_CLAIMS_SUFFIX)
+        claimedset_key = utils.claimedset_key(queue, project)
 
         with self._client.pipeline() as pipe:
             pipe.zrem(claims_set_key, claim_id)
-            pipe.delete(claim_id)
+            pipe.delete(claim_key)
             pipe.delete(claim_msgs_key)
 
             for msg in claimed_msgs:
@@ -467,10 +466,20 @@ class ClaimController(storage.Claim, scripting.Mixin):
                     # TODO(kgriffs): Rather than writing back the
                     # entire message, only set the fields that
                     # have changed.
-                    msg.to_redis(pipe)
+                    msg.to_redis(pipe, utils.message_key(queue, project,
+                                                         msg.id))
+
+                    # NOTE: Mark the message as released; it will be
+                    # moved back to the free set by the next claim.
+                    pipe.zadd(claimedset_key, now, msg.id)
 
             pipe.execute()
 
 
+def _claim_messages_key(queue, project, claim_id):
+    return utils.scope_queue_key(queue, project,
+                                 claim_id + '.' + CLAIM_MESSAGES_SUFFIX)
+
+
 def _msg_would_expire(message, now):
     return message.expires <= now
@@ -12,8 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import random
+import time
+
+from oslo_context import context
+from oslo_utils import importutils
+from oslo_utils import strutils
 from osprofiler import profiler
 import redis
+import redis.connection
 import redis.sentinel
 from six.moves import urllib
 
@@ -27,10 +34,42 @@ from zaqar.storage.redis import options
 REDIS_DEFAULT_PORT = 6379
 SENTINEL_DEFAULT_PORT = 26379
 DEFAULT_SOCKET_TIMEOUT = 0.1
+DEFAULT_POOL_TIMEOUT = 20.0
 
 STRATEGY_TCP = 1
 STRATEGY_UNIX = 2
 STRATEGY_SENTINEL = 3
+STRATEGY_CLUSTER = 4
+
+SCHEME_CLUSTER = 'redis+cluster'
+
+rediscluster = importutils.try_import('rediscluster')
+
+
+def _parse_hosts(netloc, default_port):
+    """Parse a comma-separated list of host[:port] entries."""
+
+    hosts = []
+
+    # NOTE(kgriffs): Have to parse list of hosts ourselves
+    # since urllib doesn't support it.
+    for each_host in netloc.split(','):
+        name, sep, port = each_host.partition(':')
+
+        if port:
+            try:
+                port = int(port)
+            except ValueError:
+                msg = _('The Redis configuration URI contains an '
+                        'invalid port')
+                raise errors.ConfigurationError(msg)
+
+        else:
+            port = default_port
+
+        hosts.append((name, port))
+
+    return hosts
 
 
 class ConnectionURI(object):
@@ -41,7 +80,7 @@ class ConnectionURI(object):
         except SyntaxError:
             raise errors.ConfigurationError(_('Malformed Redis URI'))
 
-        if parsed_url.scheme != 'redis':
+        if parsed_url.scheme not in ('redis', SCHEME_CLUSTER):
             raise errors.ConfigurationError(_('Invalid scheme in Redis URI'))
 
         # NOTE(kgriffs): Python 2.6 has a bug that causes the
@@ -60,6 +99,22 @@ class ConnectionURI(object):
         self.socket_timeout = float(query_params.get('socket_timeout',
                                                      DEFAULT_SOCKET_TIMEOUT))
 
+        # Authentication and encryption
+        self.password = parsed_url.password
+        try:
+            self.ssl = strutils.bool_from_string(
+                query_params.get('ssl', False), strict=True)
+        except ValueError:
+            msg = _('The Redis configuration URI contains an invalid '
+                    'ssl option')
+            raise errors.ConfigurationError(msg)
+
+        # NOTE: The password, if any, is not part of the host list
+        netloc = parsed_url.netloc.rpartition('@')[2]
+
+        # Connection pool
+        self._parse_pool_options(query_params)
+
         # TCP
         self.port = None
         self.hostname = None
@@ -71,36 +126,37 @@ class ConnectionURI(object):
         self.master = None
         self.sentinels = []
 
-        if 'master' in query_params:
-            # NOTE(prashanthr_): Configure redis driver in sentinel mode
-            self.strategy = STRATEGY_SENTINEL
-            self.master = query_params['master']
-
-            # NOTE(kgriffs): Have to parse list of sentinel hosts ourselves
-            # since urllib doesn't support it.
-            for each_host in parsed_url.netloc.split(','):
-                name, sep, port = each_host.partition(':')
+        # Cluster
+        self.startup_nodes = []
 
-                if port:
-                    try:
-                        port = int(port)
-                    except ValueError:
-                        msg = _('The Redis configuration URI contains an '
-                                'invalid port')
-                        raise errors.ConfigurationError(msg)
+        if parsed_url.scheme == SCHEME_CLUSTER:
+            self.strategy = STRATEGY_CLUSTER
+            self.startup_nodes = [
+                {'host': name, 'port': port}
+                for name, port in _parse_hosts(netloc,
+                                               REDIS_DEFAULT_PORT)
+                if name
+            ]
 
-                else:
-                    port = SENTINEL_DEFAULT_PORT
+            if not self.startup_nodes:
+                msg = _('The Redis configuration URI does not define any '
+                        'cluster nodes')
+                raise errors.ConfigurationError(msg)
 
-                self.sentinels.append((name, port))
+        elif 'master' in query_params:
+            # NOTE(prashanthr_): Configure redis driver in sentinel mode
+            self.strategy = STRATEGY_SENTINEL
+            self.master = query_params['master']
+            self.sentinels = _parse_hosts(netloc,
+                                          SENTINEL_DEFAULT_PORT)
 
             if not self.sentinels:
                 msg = _('The Redis configuration URI does not define any '
                         'sentinel hosts')
                 raise errors.ConfigurationError(msg)
 
-        elif parsed_url.netloc:
-            if ',' in parsed_url.netloc:
+        elif netloc:
+            if ',' in netloc:
                 # NOTE(kgriffs): They probably were specifying
                 # a list of sentinel hostnames, but forgot to
                 # add 'master' to the query string.
@@ -135,7 +191,114 @@ class ConnectionURI(object):
             self.unix_socket_path = path
 
         assert self.strategy in (STRATEGY_TCP, STRATEGY_UNIX,
-                                 STRATEGY_SENTINEL)
+                                 STRATEGY_SENTINEL, STRATEGY_CLUSTER)
+
+        self._check_pool_options()
+
+    def _parse_pool_options(self, query_params):
+        try:
+            max_connections = query_params.get('max_connections')
+            self.max_connections = (int(max_connections)
+                                    if max_connections else None)
+            self.blocking = strutils.bool_from_string(
+                query_params.get('blocking', False), strict=True)
+            self.pool_timeout = float(query_params.get(
+                'pool_timeout', DEFAULT_POOL_TIMEOUT))
+            self.socket_keepalive = strutils.bool_from_string(
+                query_params.get('socket_keepalive', False), strict=True)
+            self.health_check_interval = float(query_params.get(
+                'health_check_interval', 0))
+        except ValueError:
+            msg = _('The Redis configuration URI contains an invalid '
+                    'connection pool option')
+            raise errors.ConfigurationError(msg)
+
+    def _check_pool_options(self):
+        # NOTE: Sentinel and Redis Cluster clients manage their own
+        # connection pools, which never block.
+        if self.blocking and self.strategy not in (STRATEGY_TCP,
+                                                   STRATEGY_UNIX):
+            msg = _('Blocking connection pools are only supported for '
+                    'direct connections to a Redis server')
+            raise errors.ConfigurationError(msg)
+
+        if self.health_check_interval and self.strategy == STRATEGY_CLUSTER:
+            msg = _('Connection health checks are not supported with '
+                    'Redis Cluster')
+            raise errors.ConfigurationError(msg)
+
+        if self.ssl and self.strategy not in (STRATEGY_TCP,
+                                              STRATEGY_CLUSTER):
+            msg = _('SSL is only supported for TCP connections to a '
+                    'Redis server or a Redis Cluster')
+            raise errors.ConfigurationError(msg)
+
+
+class _HealthCheckMixin(object):
+    """Checks that idle connections are still alive before using them.
+
+    After a failover, or when a firewall drops idle sessions, pooled
+    connections may be dead without the client knowing. Connections
+    that have been idle for longer than the given interval are pinged
+    before sending the next command, and replaced if that fails, so the
+    command does not have to fail and be retried.
+
+    :param health_check_interval: Idle time, in seconds, after which a
+        connection is checked before it is used
+    """
+
+    def __init__(self, health_check_interval=0, **kwargs):
+        super(_HealthCheckMixin, self).__init__(**kwargs)
+        self.health_check_interval = health_check_interval
+        self._next_health_check = 0
+
+    def _check_health(self):
+        try:
+            super(_HealthCheckMixin, self).send_packed_command(
+                self.pack_command('PING'))
+            if self.read_response() not in (b'PONG', 'PONG'):
+                raise redis.exceptions.ConnectionError()
+
+        except (redis.exceptions.ConnectionError,
+                redis.exceptions.TimeoutError):
+            # NOTE: The command is sent over a new connection instead
+            self.disconnect()
+
+    def send_packed_command(self, command):
+        if (self.health_check_interval and self._sock is not None and
+                0 < self._next_health_check < time.time()):
+            self._check_health()
+
+        super(_HealthCheckMixin, self).send_packed_command(command)
+
+    def read_response(self):
+        response = super(_HealthCheckMixin, self).read_response()
+        self._next_health_check = time.time() + self.health_check_interval
+        return response
+
+    def disconnect(self):
+        super(_HealthCheckMixin, self).disconnect()
+        self._next_health_check = 0
+
+
+class _HealthCheckedConnection(_HealthCheckMixin,
+                               redis.connection.Connection):
+    pass
+
+
+class _HealthCheckedSSLConnection(_HealthCheckMixin,
+                                  redis.connection.SSLConnection):
+    pass
+
+
+class _HealthCheckedUnixConnection(
+        _HealthCheckMixin, redis.connection.UnixDomainSocketConnection):
+    pass
+
+
+class _HealthCheckedSentinelConnection(
+        _HealthCheckMixin, redis.sentinel.SentinelManagedConnection):
+    pass
 
 
 class DataDriver(storage.DataDriverBase):
@@ -153,9 +316,19 @@ class DataDriver(storage.DataDriverBase):
         super(DataDriver, self).__init__(conf, cache, control_driver)
         self.redis_conf = self.conf[options.MESSAGE_REDIS_GROUP]
 
-        server_version = self.connection.info()['redis_version']
-        if tuple(map(int, server_version.split('.'))) < (2, 6):
-            msg = _('The Redis driver requires redis-server>=2.6, '
+        info = self.connection.info()
+
+        # NOTE: Redis Cluster clients return the info of every node
+        if 'redis_version' in info:
+            server_versions = [info['redis_version']]
+        else:
+            server_versions = [node['redis_version']
+                               for node in info.values()]
+
+        server_version = min(server_versions,
+                             key=lambda v: tuple(map(int, v.split('.'))))
+        if tuple(map(int, server_version.split('.'))) < (2, 8, 9):
+            msg = _('The Redis driver requires redis-server>=2.8.9, '
                     '%s found') % server_version
 
             raise RuntimeError(msg)
@@ -181,22 +354,76 @@ class DataDriver(storage.DataDriverBase):
         KPI['storage_reachable'] = self.is_alive()
         KPI['operation_status'] = self._get_operation_status()
 
+        KPI['connection_pool'] = _get_pool_stats(
+            self.connection.connection_pool)
+
+        if self.replica_connection is not None:
+            KPI['replicas'] = self._get_replica_status()
+            KPI['replica_connection_pool'] = _get_pool_stats(
+                self.replica_connection.connection_pool)
+
         # TODO(kgriffs): Add metrics re message volume
         return KPI
 
-    def gc(self):
+    def _get_replica_status(self):
+        """Report how far each replica lags behind its master."""
+
+        try:
+            info = self.connection.info('replication')
+        except redis.exceptions.ConnectionError:
+            return []
+
+        # NOTE: Redis Cluster clients return the info of every node
+        if 'role' in info:
+            infos = [info]
+        else:
+            infos = info.values()
+
+        replicas = []
+        for node_info in infos:
+            if node_info.get('role') != 'master':
+                continue
+
+            master_offset = node_info.get('master_repl_offset', 0)
+            for i in range(node_info.get('connected_slaves', 0)):
+                slave = node_info.get('slave%d' % i)
+                if not slave:
+                    continue
+
+                replicas.append({
+                    'host': slave.get('ip'),
+                    'port': slave.get('port'),
+                    'state': slave.get('state'),
+                    'offset_lag': master_offset - slave.get('offset', 0),
+                    # NOTE: Only reported by redis-server>=3.0
+                    'lag': slave.get('lag'),
+                })
+
+        return replicas
+
+    def gc(self, incremental=False):
         # TODO(kgriffs): Check time since last run, and if
         # it hasn't been very long, skip. This allows for
         # running the GC script on multiple boxes for HA,
         # without having them all attempting to GC at the
         # same moment.
-        self.message_controller.gc()
+        self.message_controller.gc(incremental)
 
     @decorators.lazy_property(write=False)
     def connection(self):
         """Redis client connection instance."""
         return _get_redis_client(self)
 
+    @decorators.lazy_property(write=False)
+    def replica_connection(self):
+        """Redis client connection to a read replica, if enabled."""
+        return _get_redis_replica_client(self)
+
+    @property
+    def read_connection(self):
+        """Redis client connection for read-only operations."""
+        return _get_read_client(self)
+
     @decorators.lazy_property(write=False)
     def message_controller(self):
         controller = controllers.MessageController(self)
@@ -244,6 +471,16 @@ class ControlDriver(storage.ControlDriverBase):
         """Redis client connection instance."""
         return _get_redis_client(self)
 
+    @decorators.lazy_property(write=False)
+    def replica_connection(self):
+        """Redis client connection to a read replica, if enabled."""
+        return _get_redis_replica_client(self)
+
+    @property
+    def read_connection(self):
+        """Redis client connection for read-only operations."""
+        return _get_read_client(self)
+
     @decorators.lazy_property(write=False)
     def queue_controller(self):
         controller = controllers.QueueController(self)
@@ -267,26 +504,178 @@ class ControlDriver(storage.ControlDriverBase):
         raise NotImplementedError()
 
 
+def _get_pool_kwargs(connection_uri, connection_class=None):
+    kwargs = {
+        'socket_timeout': connection_uri.socket_timeout,
+        'socket_keepalive': connection_uri.socket_keepalive,
+    }
+
+    if connection_uri.password:
+        kwargs['password'] = connection_uri.password
+
+    if connection_uri.max_connections:
+        kwargs['max_connections'] = connection_uri.max_connections
+
+    if connection_uri.health_check_interval and connection_class:
+        kwargs['connection_class'] = connection_class
+        kwargs['health_check_interval'] = (
+            connection_uri.health_check_interval)
+
+    return kwargs
+
+
+def _get_direct_client(connection_uri):
+    if connection_uri.strategy == STRATEGY_TCP:
+        if connection_uri.ssl:
+            kwargs = _get_pool_kwargs(connection_uri,
+                                      _HealthCheckedSSLConnection)
+            kwargs.setdefault('connection_class',
+                              redis.connection.SSLConnection)
+        else:
+            kwargs = _get_pool_kwargs(connection_uri,
+                                      _HealthCheckedConnection)
+        kwargs['host'] = connection_uri.hostname
+        kwargs['port'] = connection_uri.port
+    else:
+        kwargs = _get_pool_kwargs(connection_uri,
+                                  _HealthCheckedUnixConnection)
+        kwargs.setdefault('connection_class',
+                          redis.connection.UnixDomainSocketConnection)
+        kwargs['path'] = connection_uri.unix_socket_path
+
+        # NOTE: Keepalive only applies to TCP connections
+        del kwargs['socket_keepalive']
+
+    if connection_uri.blocking:
+        pool = redis.BlockingConnectionPool(
+            timeout=connection_uri.pool_timeout, **kwargs)
+    else:
+        pool = redis.ConnectionPool(**kwargs)
+
+    return redis.StrictRedis(connection_pool=pool)
+
+
+def _get_sentinel(connection_uri):
+    return redis.sentinel.Sentinel(
+        connection_uri.sentinels,
+        socket_timeout=connection_uri.socket_timeout)
+
+
 def _get_redis_client(driver):
     conf = driver.redis_conf
     connection_uri = ConnectionURI(conf.uri)
 
     if connection_uri.strategy == STRATEGY_SENTINEL:
-        sentinel = redis.sentinel.Sentinel(
-            connection_uri.sentinels,
-            socket_timeout=connection_uri.socket_timeout)
+        sentinel = _get_sentinel(connection_uri)
 
         # NOTE(prashanthr_): The socket_timeout parameter being generic
         # to all redis connections is inherited from the parameters for
         # sentinel.
-        return sentinel.master_for(connection_uri.master)
+        return sentinel.master_for(
+            connection_uri.master,
+            **_get_pool_kwargs(connection_uri,
+                               _HealthCheckedSentinelConnection))
+
+    elif connection_uri.strategy == STRATEGY_CLUSTER:
+        if rediscluster is None:
+            msg = _('The redis-py-cluster package is required to connect '
+                    'to a Redis Cluster')
+            raise errors.ConfigurationError(msg)
+
+        return rediscluster.StrictRedisCluster(
+            startup_nodes=connection_uri.startup_nodes,
+            ssl=connection_uri.ssl,
+            **_get_pool_kwargs(connection_uri))
 
-    elif connection_uri.strategy == STRATEGY_TCP:
-        return redis.StrictRedis(
-            host=connection_uri.hostname,
-            port=connection_uri.port,
-            socket_timeout=connection_uri.socket_timeout)
     else:
-        return redis.StrictRedis(
-            unix_socket_path=connection_uri.unix_socket_path,
-            socket_timeout=connection_uri.socket_timeout)
+        return _get_direct_client(connection_uri)
+
+
+def _get_redis_replica_client(driver):
+    conf = driver.redis_conf
+    if not conf.read_from_replicas:
+        return None
+
+    if conf.replica_uris:
+        # NOTE: Each driver sticks to a single replica, so that the
+        # reads made while handling a request are consistent with one
+        # another. Picking it at random spreads the API workers over
+        # the replicas.
+        connection_uri = ConnectionURI(random.choice(conf.replica_uris))
+        if connection_uri.strategy not in (STRATEGY_TCP, STRATEGY_UNIX):
+            msg = _('Redis replica URIs must refer to a single Redis '
+                    'server')
+            raise errors.ConfigurationError(msg)
+
+        return _get_direct_client(connection_uri)
+
+    connection_uri = ConnectionURI(conf.uri)
+
+    if connection_uri.strategy == STRATEGY_SENTINEL:
+        sentinel = _get_sentinel(connection_uri)
+
+        # NOTE: The slave pool falls back to the master when none of
+        # its slaves are available.
+        return sentinel.slave_for(
+            connection_uri.master,
+            **_get_pool_kwargs(connection_uri,
+                               _HealthCheckedSentinelConnection))
+
+    elif connection_uri.strategy == STRATEGY_CLUSTER:
+        if rediscluster is None:
+            msg = _('The redis-py-cluster package is required to connect '
+                    'to a Redis Cluster')
+            raise errors.ConfigurationError(msg)
+
+        return rediscluster.StrictRedisCluster(
+            startup_nodes=connection_uri.startup_nodes,
+            readonly_mode=True,
+            ssl=connection_uri.ssl,
+            **_get_pool_kwargs(connection_uri))
+
+    msg = _('Reading from replicas requires either a list of replica '
+            'URIs, or a Redis URI that uses Sentinel or Redis Cluster')
+    raise errors.ConfigurationError(msg)
+
+
+def _get_read_client(driver):
+    replica = driver.replica_connection
+    if replica is None:
+        return driver.connection
+
+    # NOTE: Requests that need to read their own writes, e.g. listing
+    # messages right after claiming them, can ask for the master.
+    ctxt = context.get_current()
+    if getattr(ctxt, 'consistent_reads', False):
+        return driver.connection
+
+    return replica
+
+
+def _get_pool_stats(pool):
+    """Report how many connections of a pool are in use."""
+
+    if isinstance(pool, redis.BlockingConnectionPool):
+        created = len(pool._connections)
+        available = len([conn for conn in list(pool.pool.queue)
+                         if conn is not None])
+    else:
+        in_use = pool._in_use_connections
+        available = pool._available_connections
+
+        # NOTE: Redis Cluster pools keep connections per node
+        if isinstance(in_use, dict):
+            in_use = sum(len(conns) for conns in in_use.values())
+            available = sum(len(conns) for conns in available.values())
+        else:
+            in_use = len(in_use)
+            available = len(available)
+
+        created = in_use + available
+
+    return {
+        'max_connections': pool.max_connections,
+        'created': created,
+        'in_use': created - available,
+        'available': available,
+    }
@@ -0,0 +1,167 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from oslo_log import log as logging
+from oslo_utils import encodeutils
+import redis
+
+from zaqar.storage.redis import utils
+
+LOG = logging.getLogger(__name__)
+
+NOTIFY_CONFIG_KEY = 'notify-keyspace-events'
+
+# NOTE: Maximum number of expired keys to handle at a time. Batching
+# them up saves round trips when many messages expire at once.
+EXPIRED_BATCH_SIZE = 100
+
+# Number of seconds to wait for a notification before checking again
+POLL_TIMEOUT = 1.0
+
+
+class ExpiryListener(object):
+    """Removes the IDs of expired messages from their queue.
+
+    Redis expires message hashes on its own, but their IDs stay in the
+    queue's msgset, free and claimed sets until the garbage collector
+    runs. The listener subscribes to the notifications Redis publishes
+    when it expires a key, and removes the IDs right away. The queue of
+    each message is taken from the hash tag its key is scoped with.
+
+    Notifications are not queued while the listener is not running, so
+    the garbage collector is still needed to catch up with those.
+
+    :param driver: Redis data driver to listen on
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._client = driver.connection
+
+    def _node_clients(self):
+        """Returns a client for each server that expires keys."""
+
+        pool = self._client.connection_pool
+        nodes = getattr(pool, 'nodes', None)
+        if nodes is None:
+            return [self._client]
+
+        # NOTE: Keyspace notifications are only published by the node
+        # that holds the key, so every master of a Redis Cluster has to
+        # be listened to. Connect to them with the same options as the
+        # cluster client, including its password and SSL settings.
+        kwargs = dict(pool.connection_kwargs)
+        kwargs.pop('readonly', None)
+
+        return [redis.StrictRedis(host=node['host'], port=node['port'],
+                                  **kwargs)
+                for node in nodes.all_masters()]
+
+    def _enable_notifications(self, client):
+        """Make Redis publish notifications for expired keys."""
+
+        try:
+            flags = client.config_get(NOTIFY_CONFIG_KEY).get(
+                NOTIFY_CONFIG_KEY, '')
+
+            missing = ''
+            if 'E' not in flags:
+                missing += 'E'
+            if 'x' not in flags and 'A' not in flags:
+                missing += 'x'
+
+            if missing:
+                LOG.info(u'Enabling expired key notifications on the '
+                         u'Redis server')
+                client.config_set(NOTIFY_CONFIG_KEY, flags + missing)
+
+        except redis.exceptions.ResponseError:
+            # NOTE: Some hosted Redis services disable CONFIG, in which
+            # case notifications must be enabled by the operator.
+            LOG.warning(u'Unable to configure the %s setting of the Redis '
+                        u'server; make sure that it includes "Ex".',
+                        NOTIFY_CONFIG_KEY)
+
+    def _channel(self, client):
+        db = client.connection_pool.connection_kwargs.get('db', 0)
+        return '__keyevent@%d__:expired' % db
+
+    def _remove_expired(self, keys):
+        """Remove the IDs of expired messages from their queue.
+
+        :param keys: Keys that Redis expired. Keys other than those
+            of messages are ignored.
+        :returns: Number of message IDs removed
+        """
+
+        with self._client.pipeline() as pipe:
+            for key in keys:
+                # NOTE: Message IDs are UUIDs, so this skips the other
+                # keys that expire, such as claim message lists. Claim
+                # and subscription records look the same as messages,
+                # but removing their IDs from the sets is a no-op.
+                tag, sep, message_id = key.partition('}.')
+                if not (tag.startswith('{') and message_id and
+                        '.' not in message_id):
+                    continue
+
+                queue, project = utils.descope_queue_key(key)
+
+                pipe.zrem(utils.msgset_key(queue, project), message_id)
+                pipe.zrem(utils.freeset_key(queue, project), message_id)
+                pipe.zrem(utils.claimedset_key(queue, project), message_id)
+
+            results = pipe.execute()
+
+        # NOTE: Only count the IDs that were actually in a msgset
+        return sum(results[::3])
+
+    def _listen(self, pubsubs):
+        keys = []
+        timeout = POLL_TIMEOUT / len(pubsubs)
+
+        for pubsub in pubsubs:
+            message = pubsub.get_message(timeout=timeout)
+            while message is not None:
+                keys.append(encodeutils.safe_decode(message['data']))
+
+                if len(keys) >= EXPIRED_BATCH_SIZE:
+                    break
+
+                message = pubsub.get_message()
+
+        if keys:
+            num_removed = self._remove_expired(keys)
+            LOG.debug(u'Removed %d expired message IDs', num_removed)
+
+    def run(self):
+        """Listen for expired messages until interrupted."""
+
+        pubsubs = []
+        for client in self._node_clients():
+            self._enable_notifications(client)
+
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self._channel(client))
+            pubsubs.append(pubsub)
+
+        while True:
+            try:
+                self._listen(pubsubs)
+            except redis.exceptions.ConnectionError:
+                # NOTE: The subscription is renewed automatically once
+                # the connection is reestablished.
+                LOG.exception(u'Lost the connection to the Redis server')
+                time.sleep(self.driver.redis_conf.reconnect_sleep)
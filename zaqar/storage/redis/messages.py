@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import functools
+import time
 import uuid
 
 from oslo_utils import encodeutils
@@ -32,6 +33,9 @@ MessageEnvelope = models.MessageEnvelope
 
 MSGSET_INDEX_KEY = 'msgset_index'
 
+# Position at which the next incremental GC pass resumes.
+GC_CHECKPOINT_KEY = 'gc.checkpoint'
+
 # The rank counter is an atomic index to rank messages
 # in a FIFO manner.
 MESSAGE_RANK_COUNTER_SUFFIX = 'rank_counter'
@@ -45,12 +49,23 @@ RETRY_POST_TIMEOUT = 10
 # 1-2 milliseconds.
 GC_BATCH_SIZE = 100
 
+# Results of the delete_messages script when authorizing a deletion
+# based on the claim ID given by the client.
+DELETE_STATUS_OK = 0
+DELETE_STATUS_CLAIMED = 1
+DELETE_STATUS_NOT_CLAIMED = 2
+DELETE_STATUS_NOT_CLAIMED_BY = 3
+
 
 class MessageController(storage.Message, scripting.Mixin):
     """Implements message resource operations using Redis.
 
     Messages are scoped by project + queue.
 
+    Every key that holds data for a queue is prefixed with the queue's
+    Redis Cluster hash tag, {<project_id>.<queue_name>}, so that it is
+    stored in the same hash slot as the rest of the queue's data.
+
     Redis Data Structures:
 
     1. Message id's list (Redis sorted set)
@@ -60,7 +75,7 @@ class MessageController(storage.Message, scripting.Mixin):
         incremented atomically using the counter(MESSAGE_RANK_COUNTER_SUFFIX)
         also stored in the database for every queue.
 
-        Key: <project_id>.<queue_name>.messages
+        Key: {<project_id>.<queue_name>}.messages
 
     2. Index of message ID lists (Redis sorted set)
 
@@ -75,6 +90,8 @@ class MessageController(storage.Message, scripting.Mixin):
         Scoped by the UUID of the message, the redis datastructure
         has the following information.
 
+        Key: {<project_id>.<queue_name>}.<message_id>
+
         +---------------------+---------+
         |  Name               |  Field  |
         +=====================+=========+
@@ -97,28 +114,98 @@ class MessageController(storage.Message, scripting.Mixin):
         |  created time       |  cr     |
         +---------------------+---------+
 
+        When the compact encoding is enabled, new messages store the
+        id, client uuid and created time packed together into a single
+        field, ``m``, instead. Their body is prefixed with a byte that
+        tells whether it is compressed.
+
     4. Messages rank counter (Redis Hash):
 
-        Key: <project_id>.<queue_name>.rank_counter
+        Key: {<project_id>.<queue_name>}.rank_counter
+
+    5. Free message id's list (Redis sorted set)
+
+        Subset of the message id's list containing only the messages
+        that are not currently claimed, using the same ranking. Claims
+        are always made from the head of this set, so that claimed
+        messages do not have to be skipped over.
+
+        Key: {<project_id>.<queue_name>}.free
+
+    6. Claimed message id's list (Redis sorted set)
+
+        Subset of the message id's list containing the messages that
+        are currently claimed, sorted by claim expiration time. When a
+        claim expires or is released, the message id is moved back to
+        the free set during the next claim operation.
+
+        Key: {<project_id>.<queue_name>}.claimed
+
+    7. Garbage collection checkpoint (Redis Hash):
+
+        Records the message id's list and the message rank at which
+        the next incremental garbage collection pass resumes.
+
+        +---------------------+---------+
+        |  Name               |  Field  |
+        +=====================+=========+
+        |  message id's list  |  m      |
+        +---------------------+---------+
+        |  last rank examined |  r      |
+        +---------------------+---------+
+
+        Key: gc.checkpoint
     """
 
-    script_names = ['index_messages']
+    script_names = ['delete_messages', 'index_messages', 'pop_messages']
 
     def __init__(self, *args, **kwargs):
         super(MessageController, self).__init__(*args, **kwargs)
         self._client = self.driver.connection
 
+    @property
+    def _read_client(self):
+        """Client for read-only operations, which may be a replica."""
+        return self.driver.read_connection
+
     @decorators.lazy_property(write=False)
     def _queue_ctrl(self):
         return self.driver.queue_controller
 
-    def _index_messages(self, msgset_key, counter_key, message_ids):
+    def _index_messages(self, queue, project, message_ids):
         # NOTE(kgriffs): A watch on a pipe could also be used to ensure
         # messages are inserted in order, but that would be less efficient.
         func = self._scripts['index_messages']
 
+        msgset_key = utils.msgset_key(queue, project)
+        freeset_key = utils.freeset_key(queue, project)
+        counter_key = utils.scope_queue_index(queue, project,
+                                              MESSAGE_RANK_COUNTER_SUFFIX)
+
         arguments = [len(message_ids)] + message_ids
-        func(keys=[msgset_key, counter_key], args=arguments)
+        func(keys=[msgset_key, freeset_key, counter_key], args=arguments)
+
+    def _delete_messages(self, queue, project, message_ids,
+                         authorize=False, claim_id=None):
+        """Delete messages and their claim bookkeeping in a single call.
+
+        :param authorize: Whether to check that each message is claimed
+            by `claim_id` (or not claimed at all when `claim_id` is
+            None) before deleting it. The first message that fails
+            this check stops the deletion.
+        :returns: (status, num_deleted) where status is one of the
+            DELETE_STATUS_* constants.
+        """
+
+        func = self._scripts['delete_messages']
+
+        keys = [utils.msgset_key(queue, project),
+                utils.freeset_key(queue, project),
+                utils.claimedset_key(queue, project)]
+
+        args = [timeutils.utcnow_ts(), int(authorize), claim_id or '',
+                utils.scope_queue_key(queue, project)]
+        return func(keys=keys, args=args + message_ids)
 
     def _count(self, queue, project):
         """Return total number of messages in a queue.
@@ -127,7 +214,7 @@ class MessageController(storage.Message, scripting.Mixin):
             they haven't been GC'd yet. This is done for performance.
         """
 
-        return self._client.zcard(utils.msgset_key(queue, project))
+        return self._read_client.zcard(utils.msgset_key(queue, project))
 
     def _create_msgset(self, queue, project, pipe):
         pipe.zadd(MSGSET_INDEX_KEY, 1, utils.msgset_key(queue, project))
@@ -149,37 +236,61 @@ class MessageController(storage.Message, scripting.Mixin):
         message_ids = client.zrange(msgset_key, 0, -1)
 
         pipe.delete(msgset_key)
-        for msg_id in message_ids:
-            pipe.delete(msg_id)
+        pipe.delete(utils.freeset_key(queue, project))
+        pipe.delete(utils.claimedset_key(queue, project))
+        for key in utils.message_keys(queue, project, message_ids):
+            pipe.delete(key)
 
-    # TODO(prashanthr_): Look for better ways to solve the issue.
-    def _find_first_unclaimed(self, queue, project, limit):
+    def _find_first_unclaimed(self, queue, project, limit, client):
         """Find the first unclaimed message in the queue."""
 
         msgset_key = utils.msgset_key(queue, project)
+        freeset_key = utils.freeset_key(queue, project)
+        claimedset_key = utils.claimedset_key(queue, project)
         now = timeutils.utcnow_ts()
 
+        # NOTE: Messages whose claims have expired are only moved back
+        # to the free set the next time messages are claimed, so they
+        # have to be taken into account here as well.
+        candidates = client.zrangebyscore(claimedset_key, '-inf', now)
+
         # TODO(kgriffs): Generalize this paging pattern (DRY)
         offset = 0
 
         while True:
-            msg_keys = self._client.zrange(msgset_key, offset,
-                                           offset + limit - 1)
+            msg_keys = client.zrange(freeset_key, offset,
+                                     offset + limit - 1)
             if not msg_keys:
-                return None
+                break
 
             offset += len(msg_keys)
 
-            messages = [MessageEnvelope.from_redis(msg_key, self._client)
-                        for msg_key in msg_keys]
+            messages = MessageEnvelope.from_redis_bulk(
+                utils.message_keys(queue, project, msg_keys), client)
+            first = next((msg.id for msg in messages
+                          if msg and not utils.msg_claimed_filter(msg, now)),
+                         None)
 
-            for msg in messages:
-                if msg and not utils.msg_claimed_filter(msg, now):
-                    return msg.id
+            if first is not None:
+                candidates.append(first)
+                break
+
+        if not candidates:
+            return None
+
+        with client.pipeline() as pipe:
+            for mid in candidates:
+                pipe.zscore(msgset_key, mid)
 
-    def _exists(self, message_id):
-        """Check if message exists in the Queue."""
-        return self._client.exists(message_id)
+            ranks = pipe.execute()
+
+        ranked = [(rank, mid) for rank, mid in zip(ranks, candidates)
+                  if rank is not None]
+
+        if not ranked:
+            return None
+
+        return min(ranked, key=lambda ranked_mid: ranked_mid[0])[1]
 
     def _get_first_message_id(self, queue, project, sort):
         """Fetch head/tail of the Queue.
@@ -189,37 +300,11 @@ class MessageController(storage.Message, scripting.Mixin):
         """
         msgset_key = utils.msgset_key(queue, project)
 
-        zrange = self._client.zrange if sort == 1 else self._client.zrevrange
+        client = self._read_client
+        zrange = client.zrange if sort == 1 else client.zrevrange
         message_ids = zrange(msgset_key, 0, 0)
         return message_ids[0] if message_ids else None
 
-    def _get_claim(self, message_id):
-        """Gets minimal claim doc for a message.
-
-        :returns: {'id': cid, 'expires': ts} IFF the message is claimed,
-            and that claim has not expired.
-        """
-
-        claim = self._client.hmget(message_id, 'c', 'c.e')
-
-        if claim == [None, None]:
-            # NOTE(kgriffs): message_id was not found
-            return None
-
-        info = {
-            # NOTE(kgriffs): A "None" claim is serialized as an empty str
-            'id': encodeutils.safe_decode(claim[0]) or None,
-            'expires': int(claim[1]),
-        }
-
-        # Is the message claimed?
-        now = timeutils.utcnow_ts()
-        if info['id'] and (now < info['expires']):
-            return info
-
-        # Not claimed
-        return None
-
     def _list(self, queue, project=None, marker=None,
               limit=storage.DEFAULT_MESSAGES_PER_PAGE,
               echo=False, client_uuid=None,
@@ -231,13 +316,14 @@ class MessageController(storage.Message, scripting.Mixin):
                                            project)
 
         msgset_key = utils.msgset_key(queue, project)
-        client = self._client
+        client = self._read_client
 
         if not marker and not include_claimed:
             # NOTE(kgriffs): Skip claimed messages at the head
             # of the queue; otherwise we would just filter them all
             # out and likely end up with an empty list to return.
-            marker = self._find_first_unclaimed(queue, project, limit)
+            marker = self._find_first_unclaimed(queue, project, limit,
+                                                client)
             start = client.zrank(msgset_key, marker) or 0
         else:
             rank = client.zrank(msgset_key, marker)
@@ -246,7 +332,8 @@ class MessageController(storage.Message, scripting.Mixin):
         message_ids = client.zrange(msgset_key, start,
                                     start + (limit - 1))
 
-        messages = Message.from_redis_bulk(message_ids, client)
+        messages = Message.from_redis_bulk(
+            utils.message_keys(queue, project, message_ids), client)
 
         # NOTE(prashanthr_): Build a list of filters for checking
         # the following:
@@ -271,71 +358,163 @@ class MessageController(storage.Message, scripting.Mixin):
         yield _filter_messages(messages, filters, to_basic, marker)
         yield marker['next']
 
+    def _gc_messages(self, queue, project, ranked_mids):
+        """Garbage-collect and reconcile a batch of message IDs.
+
+        Removes the IDs of expired messages from the msgset, free and
+        claimed sets, and makes sure every remaining message is tracked
+        by the set that matches its current claim state.
+
+        :param ranked_mids: List of (message ID, rank) tuples taken
+            from the queue's msgset.
+        :returns: Number of messages removed
+        """
+
+        client = self._client
+        msgset_key = utils.msgset_key(queue, project)
+        freeset_key = utils.freeset_key(queue, project)
+        claimedset_key = utils.claimedset_key(queue, project)
+        now = timeutils.utcnow_ts()
+
+        with client.pipeline() as pipe:
+            for mid, rank in ranked_mids:
+                pipe.hmget(utils.message_key(queue, project, mid), 'c', 'c.e')
+                pipe.zscore(freeset_key, mid)
+                pipe.zscore(claimedset_key, mid)
+
+            results = pipe.execute()
+
+        num_removed = 0
+
+        with client.pipeline() as pipe:
+            for i, (mid, rank) in enumerate(ranked_mids):
+                claim, free_rank, claimed_score = results[i * 3:i * 3 + 3]
+                claim_id, claim_expires = claim
+
+                # NOTE(kgriffs): If redis expired the message, it will
+                # not exist, so all we have to do is remove mid from
+                # the msgset collection.
+                if claim_expires is None:
+                    pipe.zrem(msgset_key, mid)
+                    pipe.zrem(freeset_key, mid)
+                    pipe.zrem(claimedset_key, mid)
+                    num_removed += 1
+                    continue
+
+                claim_expires = int(claim_expires)
+
+                if claim_id and now < claim_expires:
+                    # NOTE: Recount claimed messages that are missing
+                    # from the claimed set or tracked with a stale
+                    # expiration time.
+                    if claimed_score != claim_expires:
+                        pipe.zadd(claimedset_key, claim_expires, mid)
+                        pipe.zrem(freeset_key, mid)
+
+                elif free_rank is None and claimed_score is None:
+                    pipe.zadd(freeset_key, rank, mid)
+
+            pipe.execute()
+
+        return num_removed
+
     @utils.raises_conn_error
     @utils.retries_on_connection_error
-    def gc(self):
+    def gc(self, incremental=False):
         """Garbage-collect expired message data.
 
         Not all message data can be automatically expired. This method
         cleans up the remainder.
 
+        Message ID lists are walked by name, and the message IDs in
+        each list by rank, so that removing entries along the way
+        does not cause other entries to be skipped.
+
+        :param incremental: If True, stop once the budget set by the
+            gc_max_keys and gc_max_time options has been used up, and
+            save a checkpoint so that the next incremental pass
+            resumes where this one left off.
         :returns: Number of messages removed
         """
         claim_ctrl = self.driver.claim_controller
         client = self._client
 
+        max_keys = 0
+        deadline = None
+        msgset_key = None
+        min_rank = '-inf'
+
+        if incremental:
+            max_keys = self.driver.redis_conf.gc_max_keys
+            max_time = self.driver.redis_conf.gc_max_time
+            if max_time:
+                deadline = time.time() + max_time / 1000.0
+
+            msgset_key, last_rank = client.hmget(GC_CHECKPOINT_KEY, 'm', 'r')
+            if msgset_key is not None:
+                msgset_key = encodeutils.safe_decode(msgset_key)
+                min_rank = '(' + encodeutils.safe_decode(last_rank)
+
+        # NOTE: Every message set is indexed with the same score, so
+        # the index can be walked in lexicographical order, starting
+        # right after the last message set that was visited.
+        index_min = '-' if msgset_key is None else '(' + msgset_key
+        pending_msgset_keys = []
+
         num_removed = 0
-        offset_msgsets = 0
+        num_examined = 0
 
         while True:
-            # NOTE(kgriffs): Iterate across all message sets; there will
-            # be one set of message IDs per queue.
-            msgset_keys = client.zrange(MSGSET_INDEX_KEY,
-                                        offset_msgsets,
-                                        offset_msgsets + GC_BATCH_SIZE - 1)
-            if not msgset_keys:
-                break
+            if msgset_key is None:
+                if not pending_msgset_keys:
+                    pending_msgset_keys = [
+                        encodeutils.safe_decode(k) for k in
+                        client.zrangebylex(MSGSET_INDEX_KEY, index_min, '+',
+                                           start=0, num=GC_BATCH_SIZE)]
+
+                    if not pending_msgset_keys:
+                        # NOTE: Every message set has been visited, so
+                        # the next incremental pass starts over.
+                        if incremental:
+                            client.delete(GC_CHECKPOINT_KEY)
+                        break
 
-            offset_msgsets += len(msgset_keys)
+                    index_min = '(' + pending_msgset_keys[-1]
 
-            for msgset_key in msgset_keys:
-                msgset_key = encodeutils.safe_decode(msgset_key)
+                msgset_key = pending_msgset_keys.pop(0)
+                min_rank = '-inf'
 
+            queue, project = utils.descope_message_ids_set(msgset_key)
+
+            if min_rank == '-inf':
                 # NOTE(kgriffs): Drive the claim controller GC from
                 # here, because we already know the queue and project
                 # scope.
-                queue, project = utils.descope_message_ids_set(msgset_key)
                 claim_ctrl._gc(queue, project)
 
-                offset_mids = 0
-
-                while True:
-                    # NOTE(kgriffs): Look up each message in the message set,
-                    # see if it has expired, and if so, remove it from msgset.
-                    mids = client.zrange(msgset_key, offset_mids,
-                                         offset_mids + GC_BATCH_SIZE - 1)
-
-                    if not mids:
-                        break
+            # NOTE(kgriffs): Look up each message in the message set,
+            # see if it has expired, and if so, remove it from msgset.
+            ranked_mids = client.zrangebyscore(msgset_key, min_rank, '+inf',
+                                               start=0, num=GC_BATCH_SIZE,
+                                               withscores=True)
+            if not ranked_mids:
+                msgset_key = None
+                continue
 
-                    offset_mids += len(mids)
+            num_removed += self._gc_messages(queue, project, ranked_mids)
+            num_examined += len(ranked_mids)
 
-                    # NOTE(kgriffs): If redis expired the message, it will
-                    # not exist, so all we have to do is remove mid from
-                    # the msgset collection.
-                    with client.pipeline() as pipe:
-                        for mid in mids:
-                            pipe.exists(mid)
+            last_rank = int(ranked_mids[-1][1])
+            min_rank = '(' + str(last_rank)
 
-                        mid_exists_flags = pipe.execute()
+            if not incremental:
+                continue
 
-                    with client.pipeline() as pipe:
-                        for mid, exists in zip(mids, mid_exists_flags):
-                            if not exists:
-                                pipe.zrem(msgset_key, mid)
-                                num_removed += 1
-
-                        pipe.execute()
+            if ((max_keys and num_examined >= max_keys) or
+                    (deadline is not None and time.time() >= deadline)):
+                client.hmset(GC_CHECKPOINT_KEY,
+                             {'m': msgset_key, 'r': last_rank})
+                break
 
         return num_removed
 
@@ -344,10 +523,12 @@ class MessageController(storage.Message, scripting.Mixin):
     def list(self, queue, project=None, marker=None,
              limit=storage.DEFAULT_MESSAGES_PER_PAGE,
              echo=False, client_uuid=None,
-             include_claimed=False):
+             include_claimed=False,
+             projection=storage.MESSAGE_PROJECTION_FULL):
 
-        return self._list(queue, project, marker, limit, echo,
-                          client_uuid, include_claimed)
+        results = self._list(queue, project, marker, limit, echo,
+                             client_uuid, include_claimed)
+        return self._project_listing(results, projection)
 
     @utils.raises_conn_error
     @utils.retries_on_connection_error
@@ -360,7 +541,9 @@ class MessageController(storage.Message, scripting.Mixin):
         if not message_id:
             raise errors.QueueIsEmpty(queue, project)
 
-        message = Message.from_redis(message_id, self._client)
+        message = Message.from_redis(
+            utils.message_key(queue, project, message_id),
+            self._read_client)
         if message is None:
             raise errors.QueueIsEmpty(queue, project)
 
@@ -373,7 +556,9 @@ class MessageController(storage.Message, scripting.Mixin):
         if not self._queue_ctrl.exists(queue, project):
             raise errors.QueueDoesNotExist(queue, project)
 
-        message = Message.from_redis(message_id, self._client)
+        message = Message.from_redis(
+            utils.message_key(queue, project, message_id),
+            self._read_client)
         now = timeutils.utcnow_ts()
 
         if message and not utils.msg_expired_filter(message, now):
@@ -389,9 +574,9 @@ class MessageController(storage.Message, scripting.Mixin):
 
         # NOTE(prashanthr_): Pipelining is used here purely
         # for performance.
-        with self._client.pipeline() as pipe:
-            for mid in message_ids:
-                    pipe.hgetall(mid)
+        with self._read_client.pipeline() as pipe:
+            for key in utils.message_keys(queue, project, message_ids):
+                pipe.hgetall(key)
 
             messages = pipe.execute()
 
@@ -403,13 +588,13 @@ class MessageController(storage.Message, scripting.Mixin):
     @utils.raises_conn_error
     @utils.retries_on_connection_error
     def post(self, queue, messages, client_uuid, project=None):
-        msgset_key = utils.msgset_key(queue, project)
-        counter_key = utils.scope_queue_index(queue, project,
-                                              MESSAGE_RANK_COUNTER_SUFFIX)
-
         message_ids = []
         now = timeutils.utcnow_ts()
 
+        redis_conf = self.driver.redis_conf
+        compact = redis_conf.message_encoding == 'compact'
+        compression_threshold = redis_conf.compression_threshold
+
         with self._client.pipeline() as pipe:
             for msg in messages:
                 prepared_msg = Message(
@@ -419,10 +604,13 @@ class MessageController(storage.Message, scripting.Mixin):
                     claim_id=None,
                     claim_expires=now,
                     claim_count=0,
+                    compact=compact,
                     body=msg.get('body', {}),
                 )
 
-                prepared_msg.to_redis(pipe)
+                prepared_msg.to_redis(
+                    pipe, utils.message_key(queue, project, prepared_msg.id),
+                    compression_threshold=compression_threshold)
                 message_ids.append(prepared_msg.id)
 
             pipe.execute()
@@ -432,7 +620,7 @@ class MessageController(storage.Message, scripting.Mixin):
         # orphaned, but Redis will remove them when they
         # expire, so we will just pretend they don't exist
         # in that case.
-        self._index_messages(msgset_key, counter_key, message_ids)
+        self._index_messages(queue, project, message_ids)
 
         return message_ids
 
@@ -443,9 +631,13 @@ class MessageController(storage.Message, scripting.Mixin):
         if not self._queue_ctrl.exists(queue, project):
             return
 
-        # NOTE(kgriffs): The message does not exist, so
-        # it is essentially "already" deleted.
-        if not self._exists(message_id):
+        # NOTE(kgriffs): If the message does not exist, it is
+        # essentially "already" deleted, and the script simply
+        # skips it.
+        status = self._delete_messages(queue, project, [message_id],
+                                       authorize=True, claim_id=claim)[0]
+
+        if status == DELETE_STATUS_OK:
             return
 
         # TODO(kgriffs): Create decorator for validating claim and message
@@ -457,76 +649,48 @@ class MessageController(storage.Message, scripting.Mixin):
             except ValueError:
                 raise errors.ClaimDoesNotExist(claim, queue, project)
 
-        msg_claim = self._get_claim(message_id)
-        is_claimed = (msg_claim is not None)
+        if status == DELETE_STATUS_CLAIMED:
+            raise errors.MessageIsClaimed(message_id)
 
-        # Authorize the request based on having the correct claim ID
-        if claim is None:
-            if is_claimed:
-                raise errors.MessageIsClaimed(message_id)
-
-        elif not is_claimed:
+        elif status == DELETE_STATUS_NOT_CLAIMED:
             raise errors.MessageNotClaimed(message_id)
 
-        elif msg_claim['id'] != claim:
-            if not claim_ctrl._exists(queue, claim, project):
-                raise errors.ClaimDoesNotExist(claim, queue, project)
+        if not claim_ctrl._exists(queue, claim, project):
+            raise errors.ClaimDoesNotExist(claim, queue, project)
 
-            raise errors.MessageNotClaimedBy(message_id, claim)
-
-        msgset_key = utils.msgset_key(queue, project)
-
-        with self._client.pipeline() as pipe:
-            pipe.delete(message_id)
-            pipe.zrem(msgset_key, message_id)
-
-            if is_claimed:
-                claim_ctrl._del_message(queue, project, msg_claim['id'],
-                                        message_id, pipe)
-
-            pipe.execute()
+        raise errors.MessageNotClaimedBy(message_id, claim)
 
     @utils.raises_conn_error
     @utils.retries_on_connection_error
     def bulk_delete(self, queue, message_ids, project=None):
-        claim_ctrl = self.driver.claim_controller
         if not self._queue_ctrl.exists(queue, project):
             return
 
-        msgset_key = utils.msgset_key(queue, project)
-
-        with self._client.pipeline() as pipe:
-            for mid in message_ids:
-                if not self._exists(mid):
-                    continue
-
-                pipe.delete(mid)
-                pipe.zrem(msgset_key, mid)
-
-                msg_claim = self._get_claim(mid)
-                if msg_claim is not None:
-                    claim_ctrl._del_message(queue, project, msg_claim['id'],
-                                            mid, pipe)
-            pipe.execute()
+        if message_ids:
+            self._delete_messages(queue, project, list(message_ids))
 
     @utils.raises_conn_error
     @utils.retries_on_connection_error
     def pop(self, queue, limit, project=None):
-        # Pop is implemented as a chain of the following operations:
-        # 1. Create a claim.
-        # 2. Delete the messages claimed.
-        # 3. Delete the claim.
-        claim_ctrl = self.driver.claim_controller
-        claim_id, messages = claim_ctrl.create(
-            queue, dict(ttl=1, grace=0), project, limit=limit)
-
-        message_ids = [message['id'] for message in messages]
-        self.bulk_delete(queue, message_ids, project)
-        # NOTE(prashanthr_): Creating a claim controller reference
-        # causes a recursive reference. Hence, using the reference
-        # from the driver.
-        claim_ctrl.delete(queue, claim_id, project)
-        return messages
+        # NOTE: Messages are selected and deleted by a single script,
+        # so there is no intermediate claim that could be left behind
+        # if the operation is interrupted.
+        func = self._scripts['pop_messages']
+
+        keys = [utils.msgset_key(queue, project),
+                utils.freeset_key(queue, project),
+                utils.claimedset_key(queue, project)]
+
+        now = timeutils.utcnow_ts()
+        hmaps = func(keys=keys,
+                     args=[now, limit, utils.scope_queue_key(queue, project)])
+
+        # NOTE: HGETALL replies are returned by the script as flat
+        # lists of alternating field names and values.
+        messages = [Message.from_hmap(dict(zip(hmap[::2], hmap[1::2])))
+                    for hmap in hmaps]
+
+        return [msg.to_basic(now) for msg in messages]
 
 
 def _filter_messages(messages, filters, to_basic, marker):
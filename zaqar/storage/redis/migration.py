@@ -0,0 +1,164 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Re-key Redis message store data with per-queue hash tags.
+
+Older releases stored messages, claims and subscriptions under keys
+made of their bare IDs, which end up in different hash slots than the
+rest of their queue's data. This tool moves them over to keys scoped
+with the queue's hash tag. It works in place, on the Redis server set
+by the [drivers:message_store:redis] section, and must be run while
+the API servers using that server are stopped:
+
+    zaqar-redis-migrate --config-file /etc/zaqar/zaqar.conf
+
+Once re-keyed, the data can be imported into a Redis Cluster with
+the standard Redis tools. Running the tool again is harmless.
+
+The tool then runs the garbage collector over every queue, which also
+indexes the messages posted before the free and claimed message ID
+sets were introduced, so that they can be claimed again.
+"""
+
+from oslo_log import log as logging
+from oslo_utils import encodeutils
+
+from zaqar.storage.redis import claims
+from zaqar.storage.redis import messages
+from zaqar.storage.redis import subscriptions
+from zaqar.storage.redis import utils
+
+LOG = logging.getLogger(__name__)
+
+# Number of keys to move at a time
+MIGRATION_BATCH_SIZE = 100
+
+# NOTE: Suffixes of the per-queue keys that only have to be renamed
+_QUEUE_KEY_SUFFIXES = (
+    utils.MESSAGE_IDS_SUFFIX,
+    utils.FREE_MESSAGE_IDS_SUFFIX,
+    utils.CLAIMED_MESSAGE_IDS_SUFFIX,
+    messages.MESSAGE_RANK_COUNTER_SUFFIX,
+    claims.QUEUE_CLAIMS_SUFFIX,
+    subscriptions.SUBSCRIPTION_IDS_SUFFIX,
+)
+
+
+def _legacy_queue_key(queue, project, suffix):
+    return (utils.normalize_none_str(project) + '.' +
+            utils.normalize_none_str(queue) + '.' + suffix)
+
+
+def _legacy_claim_messages_key(claim_id):
+    return claims.CLAIM_MESSAGES_SUFFIX + '.' + claim_id
+
+
+def _move_keys(client, key_pairs):
+    """Rename keys, keeping their TTL.
+
+    :param key_pairs: List of (old key, new key) tuples. Old keys that
+        do not exist, e.g. because they have expired in the meantime,
+        are skipped.
+    :returns: Number of keys moved
+    """
+
+    num_moved = 0
+
+    for i in range(0, len(key_pairs), MIGRATION_BATCH_SIZE):
+        batch = key_pairs[i:i + MIGRATION_BATCH_SIZE]
+
+        with client.pipeline(transaction=False) as pipe:
+            for old_key, new_key in batch:
+                pipe.rename(old_key, new_key)
+
+            # NOTE: Renaming a key that does not exist is an error,
+            # which only affects that key.
+            results = pipe.execute(raise_on_error=False)
+
+        num_moved += sum(1 for r in results if r is True)
+
+    return num_moved
+
+
+def _member_ids(client, key):
+    return [encodeutils.safe_decode(m) for m in client.zrange(key, 0, -1)]
+
+
+def migrate_queue(client, queue, project):
+    """Move the data of a single queue over to hash-tagged keys.
+
+    :returns: Number of keys moved
+    """
+
+    key_pairs = []
+
+    msgset_key = _legacy_queue_key(queue, project, utils.MESSAGE_IDS_SUFFIX)
+    for mid in _member_ids(client, msgset_key):
+        key_pairs.append((mid, utils.message_key(queue, project, mid)))
+
+    claims_key = _legacy_queue_key(queue, project,
+                                   claims.QUEUE_CLAIMS_SUFFIX)
+    for claim_id in _member_ids(client, claims_key):
+        key_pairs.append((claim_id,
+                          utils.scope_queue_key(queue, project, claim_id)))
+        key_pairs.append((_legacy_claim_messages_key(claim_id),
+                          claims._claim_messages_key(queue, project,
+                                                     claim_id)))
+
+    subset_key = _legacy_queue_key(queue, project,
+                                   subscriptions.SUBSCRIPTION_IDS_SUFFIX)
+    for sid in _member_ids(client, subset_key):
+        key_pairs.append((sid, utils.scope_queue_key(queue, project, sid)))
+
+    # NOTE: The per-queue keys go last, so that an interrupted run can
+    # still find the records above when it is started again.
+    for suffix in _QUEUE_KEY_SUFFIXES:
+        key_pairs.append((_legacy_queue_key(queue, project, suffix),
+                          utils.scope_queue_key(queue, project, suffix)))
+
+    return _move_keys(client, key_pairs)
+
+
+def migrate(client):
+    """Move the data of every queue over to hash-tagged keys.
+
+    :returns: (number of queues migrated, number of keys moved)
+    """
+
+    num_queues = 0
+    num_keys = 0
+
+    index = messages.MSGSET_INDEX_KEY
+    legacy_keys = [k for k in _member_ids(client, index)
+                   if not k.startswith('{')]
+
+    for legacy_key in legacy_keys:
+        project, queue = legacy_key.split('.')[:2]
+        queue = queue or None
+        project = project or None
+
+        num_keys += migrate_queue(client, queue, project)
+        num_queues += 1
+
+        with client.pipeline() as pipe:
+            pipe.zadd(index, 1, utils.msgset_key(queue, project))
+            pipe.zrem(index, legacy_key)
+            pipe.execute()
+
+        LOG.debug(u'Migrated queue %(queue)s of project %(project)s',
+                  {'queue': queue, 'project': project})
+
+    # NOTE: The GC checkpoint refers to a msgset by its old name
+    client.delete(messages.GC_CHECKPOINT_KEY)
+
+    return num_queues, num_keys
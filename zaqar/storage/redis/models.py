@@ -17,14 +17,20 @@
 import datetime
 import functools
 import uuid
+import zlib
 
 import msgpack
 from oslo_utils import encodeutils
 from oslo_utils import uuidutils
 
-MSGENV_FIELD_KEYS = (b'id', b't', b'cr', b'e', b'u', b'c', b'c.e', b'c.c')
+MSGENV_FIELD_KEYS = (b't', b'e', b'c', b'c.e', b'c.c', b'id', b'cr', b'u',
+                     b'm')
 SUBENV_FIELD_KEYS = (b'id', b's', b'u', b't', b'e', b'o', b'p', b'c')
 
+# NOTE: Prefixes of message bodies stored with the compact encoding
+BODY_RAW = b'\x00'
+BODY_ZLIB = b'\x01'
+
 
 # TODO(kgriffs): Make similar classes for claims and queues
 class MessageEnvelope(object):
@@ -38,6 +44,9 @@ class MessageEnvelope(object):
     :param claim_id: If claimed, the UUID of the claim. Set to None
         for messages that have never been claimed.
     :param claim_expires: Claim expiration as a UNIX timestamp
+    :param compact: Whether the message is stored with the compact
+        encoding, in which the ID, creation time and client UUID are
+        packed into a single field (default False)
     """
 
     __slots__ = [
@@ -49,6 +58,7 @@ class MessageEnvelope(object):
         'claim_id',
         'claim_expires',
         'claim_count',
+        'compact',
     ]
 
     def __init__(self, **kwargs):
@@ -64,6 +74,7 @@ class MessageEnvelope(object):
             _validate_uuid4(self.claim_id)
         self.claim_expires = kwargs['claim_expires']
         self.claim_count = kwargs.get('claim_count', 0)
+        self.compact = kwargs.get('compact', False)
 
     @staticmethod
     def from_hmap(hmap):
@@ -71,8 +82,8 @@ class MessageEnvelope(object):
         return MessageEnvelope(**kwargs)
 
     @staticmethod
-    def from_redis(mid, client):
-        values = client.hmget(mid, MSGENV_FIELD_KEYS)
+    def from_redis(key, client):
+        values = client.hmget(key, MSGENV_FIELD_KEYS)
 
         # NOTE(kgriffs): If the key does not exist, redis-py returns
         # an array of None values.
@@ -82,16 +93,18 @@ class MessageEnvelope(object):
         return _hmap_kv_to_msgenv(MSGENV_FIELD_KEYS, values)
 
     @staticmethod
-    def from_redis_bulk(message_ids, client):
+    def from_redis_bulk(keys, client):
         with client.pipeline() as pipe:
-            for mid in message_ids:
-                pipe.hmget(mid, MSGENV_FIELD_KEYS)
+            for key in keys:
+                pipe.hmget(key, MSGENV_FIELD_KEYS)
 
             results = pipe.execute()
 
         message_envs = []
         for value_list in results:
-            if value_list is None:
+            # NOTE(kgriffs): If the key does not exist, redis-py returns
+            # an array of None values.
+            if value_list is None or value_list[0] is None:
                 env = None
             else:
                 env = _hmap_kv_to_msgenv(MSGENV_FIELD_KEYS, value_list)
@@ -100,11 +113,11 @@ class MessageEnvelope(object):
 
         return message_envs
 
-    def to_redis(self, pipe):
+    def to_redis(self, pipe, key):
         hmap = _msgenv_to_hmap(self)
 
-        pipe.hmset(self.id, hmap)
-        pipe.expire(self.id, self.ttl)
+        pipe.hmset(key, hmap)
+        pipe.expire(key, self.ttl)
 
 
 class SubscriptionEnvelope(object):
@@ -131,8 +144,8 @@ class SubscriptionEnvelope(object):
         self.confirmed = kwargs.get('confirmed', 'True')
 
     @staticmethod
-    def from_redis(sid, client):
-        values = client.hmget(sid, SUBENV_FIELD_KEYS)
+    def from_redis(key, client):
+        values = client.hmget(key, SUBENV_FIELD_KEYS)
 
         # NOTE(kgriffs): If the key does not exist, redis-py returns
         # an array of None values.
@@ -141,11 +154,11 @@ class SubscriptionEnvelope(object):
 
         return _hmap_kv_to_subenv(SUBENV_FIELD_KEYS, values)
 
-    def to_redis(self, pipe):
+    def to_redis(self, pipe, key):
         hmap = _subenv_to_hmap(self)
 
-        pipe.hmset(self.id, hmap)
-        pipe.expire(self.id, self.ttl)
+        pipe.hmset(key, hmap)
+        pipe.expire(key, self.ttl)
 
     def to_basic(self, now):
         created = self.expires - self.ttl
@@ -177,6 +190,8 @@ class Message(MessageEnvelope):
     :param claim_id: If claimed, the UUID of the claim. Set to None
         for messages that have never been claimed.
     :param claim_expires: Claim expiration as a UNIX timestamp
+    :param compact: Whether the message is stored with the compact
+        encoding (default False)
     :param body: Message payload. Must be serializable to mspack.
     """
 
@@ -189,20 +204,20 @@ class Message(MessageEnvelope):
     @staticmethod
     def from_hmap(hmap):
         kwargs = _hmap_to_msgenv_kwargs(hmap)
-        kwargs['body'] = _unpack(hmap[b'b'])
+        kwargs['body'] = _decode_body(hmap[b'b'], kwargs['compact'])
 
         return Message(**kwargs)
 
     @staticmethod
-    def from_redis(mid, client):
-        hmap = client.hgetall(mid)
+    def from_redis(key, client):
+        hmap = client.hgetall(key)
         return Message.from_hmap(hmap) if hmap else None
 
     @staticmethod
-    def from_redis_bulk(message_ids, client):
+    def from_redis_bulk(keys, client):
         with client.pipeline() as pipe:
-            for mid in message_ids:
-                pipe.hgetall(mid)
+            for key in keys:
+                pipe.hgetall(key)
 
             results = pipe.execute()
 
@@ -211,15 +226,24 @@ class Message(MessageEnvelope):
 
         return messages
 
-    def to_redis(self, pipe, include_body=True):
+    def to_redis(self, pipe, key, include_body=True,
+                 compression_threshold=0):
+        """Write the message to Redis.
+
+        :param compression_threshold: Size in bytes above which the
+            body of a compact message is compressed (default 0, for
+            never)
+        """
+
         if not include_body:
-            super(Message, self).to_redis(pipe)
+            super(Message, self).to_redis(pipe, key)
 
         hmap = _msgenv_to_hmap(self)
-        hmap['b'] = _pack(self.body)
+        hmap['b'] = _encode_body(self.body, self.compact,
+                                 compression_threshold)
 
-        pipe.hmset(self.id, hmap)
-        pipe.expire(self.id, self.ttl)
+        pipe.hmset(key, hmap)
+        pipe.expire(key, self.ttl)
 
     def to_basic(self, now, include_created=False):
         basic_msg = {
@@ -263,32 +287,86 @@ def _hmap_to_msgenv_kwargs(hmap):
 
     # NOTE(kgriffs): Under Py3K, redis-py converts all strings
     # into binary. Woohoo!
-    return {
-        'id': encodeutils.safe_decode(hmap[b'id']),
+    kwargs = {
         'ttl': int(hmap[b't']),
-        'created': int(hmap[b'cr']),
         'expires': int(hmap[b'e']),
 
-        'client_uuid': encodeutils.safe_decode(hmap[b'u']),
-
         'claim_id': claim_id,
         'claim_expires': int(hmap[b'c.e']),
         'claim_count': int(hmap[b'c.c']),
     }
 
+    # NOTE: Messages stored with the compact encoding pack the fields
+    # that never change into a single one; the others are updated in
+    # place by claims, including from Lua scripts, so they are kept
+    # as separate fields by both encodings.
+    packed = hmap.get(b'm')
+    if packed:
+        message_id, created, client_uuid = _unpack(packed)
+        kwargs.update({
+            'id': str(uuid.UUID(bytes=message_id)),
+            'created': created,
+            'client_uuid': str(uuid.UUID(bytes=client_uuid)),
+            'compact': True,
+        })
+
+    else:
+        kwargs.update({
+            'id': encodeutils.safe_decode(hmap[b'id']),
+            'created': int(hmap[b'cr']),
+            'client_uuid': encodeutils.safe_decode(hmap[b'u']),
+            'compact': False,
+        })
+
+    return kwargs
+
 
 def _msgenv_to_hmap(msg):
-    return {
-        'id': msg.id,
+    hmap = {
         't': msg.ttl,
-        'cr': msg.created,
         'e': msg.expires,
-        'u': msg.client_uuid,
         'c': msg.claim_id or '',
         'c.e': msg.claim_expires,
         'c.c': msg.claim_count,
     }
 
+    if msg.compact:
+        hmap['m'] = _pack([uuid.UUID(msg.id).bytes, msg.created,
+                           uuid.UUID(str(msg.client_uuid)).bytes])
+    else:
+        hmap.update({
+            'id': msg.id,
+            'cr': msg.created,
+            'u': msg.client_uuid,
+        })
+
+    return hmap
+
+
+def _encode_body(body, compact, compression_threshold):
+    packed = _pack(body)
+    if not compact:
+        return packed
+
+    if compression_threshold and len(packed) > compression_threshold:
+        compressed = zlib.compress(packed)
+
+        # NOTE: Bodies that do not compress well are stored as is
+        if len(compressed) < len(packed):
+            return BODY_ZLIB + compressed
+
+    return BODY_RAW + packed
+
+
+def _decode_body(data, compact):
+    if not compact:
+        return _unpack(data)
+
+    if data[:1] == BODY_ZLIB:
+        return _unpack(zlib.decompress(data[1:]))
+
+    return _unpack(data[1:])
+
 
 def _hmap_kv_to_subenv(keys, values):
     hmap = dict(zip(keys, values))
@@ -23,7 +23,7 @@ _COMMON_REDIS_OPTIONS = (
                deprecated_opts=[cfg.DeprecatedOpt(
                                 'uri',
                                 group=_deprecated_group), ],
-               help=('Redis connection URI, taking one of three forms. '
+               help=('Redis connection URI, taking one of four forms. '
                      'For a direct connection to a Redis server, use '
                      'the form "redis://host[:port][?options]", where '
                      'port defaults to 6379 if not specified. For an '
@@ -34,14 +34,36 @@ _COMMON_REDIS_OPTIONS = (
                      'instance of redis-sentinel. In this form, the '
                      'name of the Redis master used in the Sentinel '
                      'configuration must be included in the query '
-                     'string as "master=<name>". Finally, to connect '
+                     'string as "master=<name>". To connect to a Redis '
+                     'Cluster, use the form "redis+cluster://host1'
+                     '[:port1][,host2[:port2],...,hostN[:portN]]'
+                     '[?options]", listing one or more of the cluster '
+                     'nodes; this form requires the redis-py-cluster '
+                     'package. Finally, to connect '
                      'to a local instance of Redis over a unix socket, '
                      'you may use the form '
                      '"redis:/path/to/redis.sock[?options]". In all '
                      'forms, the "socket_timeout" option may be '
                      'specified in the query string. Its value is '
                      'given in seconds. If not provided, '
-                     '"socket_timeout" defaults to 0.1 seconds.')),
+                     '"socket_timeout" defaults to 0.1 seconds. The '
+                     'connection pool can be tuned with the following '
+                     'query string options as well: "max_connections" '
+                     'limits the number of connections of each API '
+                     'worker; "blocking=true" makes requests wait up to '
+                     '"pool_timeout" seconds (20 by default) for a '
+                     'connection once the limit is reached, instead of '
+                     'failing, and is only supported for direct '
+                     'connections; "socket_keepalive=true" enables TCP '
+                     'keepalive; and "health_check_interval" pings '
+                     'connections that have been idle for that many '
+                     'seconds before using them, so that dead '
+                     'connections are replaced, e.g. after a failover. '
+                     'Health checks are not supported with Redis '
+                     'Cluster. A password may be given in the URI, as '
+                     'in "redis://:password@host", and "ssl=true" '
+                     'encrypts TCP connections to a Redis server or a '
+                     'Redis Cluster.')),
 
     cfg.IntOpt('max_reconnect_attempts', default=10,
                deprecated_opts=[cfg.DeprecatedOpt(
@@ -55,12 +77,57 @@ _COMMON_REDIS_OPTIONS = (
                                   'reconnect_sleep',
                                   group=_deprecated_group), ],
                  help=('Base sleep interval between attempts to reconnect '
-                       'after a redis node failover. '))
+                       'after a redis node failover. ')),
+
+    cfg.BoolOpt('read_from_replicas', default=False,
+                help=('Send read-only operations, such as listing and '
+                      'getting messages, queues and subscriptions, and '
+                      'getting queue stats, to a read replica instead of '
+                      'the master. The replica is taken from '
+                      'replica_uris if set; otherwise the Sentinel slaves '
+                      'of the master, or the replica nodes of the Redis '
+                      'Cluster, are used. Replicas may lag behind the '
+                      'master, so clients that need to read their own '
+                      'writes should send the "Read-Consistency: strong" '
+                      'header.')),
+
+    cfg.ListOpt('replica_uris', default=[],
+                help=('Redis connection URIs of the read replicas to use '
+                      'when read_from_replicas is enabled, each in the '
+                      'form "redis://host[:port][?options]" or '
+                      '"redis:/path/to/redis.sock[?options]". Each API '
+                      'worker picks one of them at random.')),
 
 )
 
 MANAGEMENT_REDIS_OPTIONS = _COMMON_REDIS_OPTIONS
-MESSAGE_REDIS_OPTIONS = _COMMON_REDIS_OPTIONS
+MESSAGE_REDIS_OPTIONS = _COMMON_REDIS_OPTIONS + (
+    cfg.IntOpt('gc_max_keys', default=10000,
+               help=('Maximum number of message IDs to examine during a '
+                     'single incremental garbage collection pass. Once '
+                     'the limit is reached, the pass is checkpointed and '
+                     'the next pass resumes from the same position. Set '
+                     'to 0 to disable the limit.')),
+
+    cfg.IntOpt('gc_max_time', default=500,
+               help=('Maximum amount of time, in milliseconds, to spend '
+                     'on a single incremental garbage collection pass. '
+                     'Set to 0 to disable the limit.')),
+
+    cfg.StrOpt('message_encoding', default='hash',
+               choices=('hash', 'compact'),
+               help=('How new messages are stored. "hash" stores each '
+                     'field of a message separately. "compact" packs the '
+                     'fields that never change into a single binary '
+                     'field, which takes less memory. Messages stored '
+                     'with either encoding can always be read, so this '
+                     'can be changed at any time, e.g. per pool.')),
+
+    cfg.IntOpt('compression_threshold', default=0, min=0,
+               help=('Size, in bytes, above which the bodies of messages '
+                     'stored with the compact encoding are compressed '
+                     'with zlib. Set to 0 to disable compression.')),
+)
 
 MANAGEMENT_REDIS_GROUP = 'drivers:management_store:redis'
 MESSAGE_REDIS_GROUP = 'drivers:message_store:redis'
@@ -75,6 +75,11 @@ class QueueController(storage.Queue):
     def _subscription_ctrl(self):
         return self.driver.subscription_controller
 
+    @property
+    def _read_client(self):
+        """Client for read-only operations, which may be a replica."""
+        return self.driver.read_connection
+
     def _get_queue_info(self, queue_key, fields, transform=str):
         """Get one or more fields from Queue Info."""
 
@@ -85,7 +90,7 @@ class QueueController(storage.Queue):
     @utils.retries_on_connection_error
     def _list(self, project=None, marker=None,
               limit=storage.DEFAULT_QUEUES_PER_PAGE, detailed=False):
-        client = self._client
+        client = self._read_client
         qset_key = utils.scope_queue_name(QUEUES_SET_STORE_NAME, project)
         marker = utils.scope_queue_name(marker, project)
         rank = client.zrank(qset_key, marker)
@@ -103,7 +108,7 @@ class QueueController(storage.Queue):
 
             return queue
 
-        yield utils.QueueListCursor(self._client, cursor, denormalizer)
+        yield utils.QueueListCursor(client, cursor, denormalizer)
         yield marker_next and marker_next['next']
 
     def _get(self, name, project=None):
@@ -19,6 +19,8 @@ limitations under the License.
 
 -- Read params
 local msgset_key = KEYS[1]
+local freeset_key = KEYS[2]
+local claimedset_key = KEYS[3]
 
 local now = tonumber(ARGV[1])
 local limit = tonumber(ARGV[2])
@@ -27,75 +29,80 @@ local claim_expires = tonumber(ARGV[4])
 local msg_ttl = tonumber(ARGV[5])
 local msg_expires = tonumber(ARGV[6])
 
--- Scan for up to 'limit' unclaimed messages
-local BATCH_SIZE = 100
+-- NOTE: Message hashes are keyed by the message ID scoped with the
+-- queue's hash tag, so that they live in the same slot as the KEYS.
+local key_prefix = ARGV[7]
+
+-- NOTE: Messages are claimed from the free set, which only
+-- contains the IDs of unclaimed messages, so we never have to scan
+-- through the claimed head of the queue. The claimed set is scored by
+-- claim expiration time, so messages whose claims have expired (or
+-- been released) can be moved back to the free set cheaply.
+--
+-- NOTE: pop_messages.lua uses the same logic to find unclaimed
+-- messages, so keep the two scripts in sync.
+local expired_ids = redis.call('ZRANGEBYSCORE', claimedset_key, '-inf', now)
+for i, mid in ipairs(expired_ids) do
+    local rank = redis.call('ZSCORE', msgset_key, mid)
+
+    -- NOTE: If the message is no longer in the msgset, it
+    -- was deleted, so we just have to forget about it.
+    if rank then
+        redis.call('ZADD', freeset_key, rank, mid)
+    end
+end
 
-local start = 0
-local claimed_msgs = {}
-local msg_ids_to_cleanup = {}
+if (#expired_ids ~= 0) then
+    redis.call('ZREMRANGEBYSCORE', claimedset_key, '-inf', now)
+end
 
-local found_unclaimed = false
+-- Claim up to 'limit' messages from the head of the free set
+local claimed_msgs = {}
 
 while (#claimed_msgs < limit) do
-    local stop = (start + BATCH_SIZE - 1)
-    local msg_ids = redis.call('ZRANGE', msgset_key, start, stop)
+    -- NOTE: Every ID we look at is removed from the free set
+    -- below, so we can always read from the head of the set.
+    local stop = (limit - #claimed_msgs - 1)
+    local msg_ids = redis.call('ZRANGE', freeset_key, 0, stop)
 
     if (#msg_ids == 0) then
         break
     end
 
-    start = start + BATCH_SIZE
-
-    -- TODO(kgriffs): Try moving claimed IDs to a different set
-    -- to avoid scanning through already-claimed messages.
     for i, mid in ipairs(msg_ids) do
-        -- NOTE(kgriffs): Since execution of this script can not
-        -- happen in parallel, once we find the first unclaimed
-        -- message, the remaining messages will always be
-        -- unclaimed as well.
-
-        if not found_unclaimed then
-            local msg = redis.call('HMGET', mid, 'c', 'c.e')
-            if msg[1] == false and msg[2] == false then
-                -- NOTE(Eva-i): It means the message expired and does not
-                -- actually exist anymore, we must later garbage collect it's
-                -- ID from the set and move on.
-                msg_ids_to_cleanup[#msg_ids_to_cleanup + 1] = mid
-            elseif msg[1] == '' or tonumber(msg[2]) <= now then
-                found_unclaimed = true
-            end
-        end
+        redis.call('ZREM', freeset_key, mid)
+
+        local msg = redis.call('HMGET', key_prefix .. mid, 'c', 'c.e', 'e')
+
+        if msg[3] == false then
+            -- NOTE(Eva-i): It means the message expired and does not
+            -- actually exist anymore, we must garbage collect it's
+            -- ID from the set and move on.
+            redis.call('ZREM', msgset_key, mid)
+
+        elseif msg[1] and msg[1] ~= '' and tonumber(msg[2]) > now then
+            -- NOTE: The message is already claimed, e.g. it
+            -- was moved here from another queue's claim to a dead
+            -- letter queue, so just make sure it is tracked as such.
+            redis.call('ZADD', claimedset_key, msg[2], mid)
 
-        if found_unclaimed then
+        else
             -- Found an unclaimed message, so claim it.
-            local msg_expires_prev = redis.call('HGET', mid, 'e')
-            if msg_expires_prev ~= false then
-                -- NOTE(Eva-i): Condition above means the message is not
-                -- expired and we really can claim it.
-                redis.call('HMSET', mid,
-                           'c', claim_id,
-                           'c.e', claim_expires)
-
-                -- Will the message expire early?
-                if tonumber(msg_expires_prev) < claim_expires then
-                    redis.call('HMSET', mid,
-                               't', msg_ttl,
-                               'e', msg_expires)
-                end
-
-                claimed_msgs[#claimed_msgs + 1] = mid
-
-                if (#claimed_msgs == limit) then
-                    break
-                end
+            redis.call('HMSET', key_prefix .. mid,
+                       'c', claim_id,
+                       'c.e', claim_expires)
+
+            -- Will the message expire early?
+            if tonumber(msg[3]) < claim_expires then
+                redis.call('HMSET', key_prefix .. mid,
+                           't', msg_ttl,
+                           'e', msg_expires)
             end
+
+            redis.call('ZADD', claimedset_key, claim_expires, mid)
+            claimed_msgs[#claimed_msgs + 1] = mid
         end
     end
 end
 
-if (#msg_ids_to_cleanup ~= 0) then
-    -- Garbage collect expired message IDs stored in msgset_key.
-    redis.call('ZREM', msgset_key, unpack(msg_ids_to_cleanup))
-end
-
 return claimed_msgs
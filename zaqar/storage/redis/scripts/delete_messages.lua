@@ -0,0 +1,90 @@
+--[[
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+--]]
+
+-- Read params
+local msgset_key = KEYS[1]
+local freeset_key = KEYS[2]
+local claimedset_key = KEYS[3]
+
+local now = tonumber(ARGV[1])
+local authorize = (ARGV[2] == '1')
+local claim_id = ARGV[3]
+
+-- NOTE: Message and claim records are keyed by their ID scoped with
+-- the queue's hash tag, so that they live in the same slot as the KEYS.
+local key_prefix = ARGV[4]
+
+-- NOTE: These must be kept in sync with the DELETE_STATUS_* constants
+-- defined by the message controller.
+local STATUS_OK = 0
+local STATUS_CLAIMED = 1
+local STATUS_NOT_CLAIMED = 2
+local STATUS_NOT_CLAIMED_BY = 3
+
+local num_deleted = 0
+
+for i = 5, #ARGV do
+    local mid = ARGV[i]
+    local msg = redis.call('HMGET', key_prefix .. mid, 'c', 'c.e')
+
+    -- NOTE: A message that does not exist is essentially "already"
+    -- deleted, so it is simply skipped.
+    if msg[2] ~= false then
+        local msg_claim_id = msg[1]
+        local is_claimed = (msg_claim_id ~= false and msg_claim_id ~= '' and
+                            tonumber(msg[2]) > now)
+
+        -- Authorize the request based on having the correct claim ID
+        if authorize then
+            if claim_id == '' then
+                if is_claimed then
+                    return {STATUS_CLAIMED, num_deleted}
+                end
+
+            elseif not is_claimed then
+                return {STATUS_NOT_CLAIMED, num_deleted}
+
+            elseif msg_claim_id ~= claim_id then
+                return {STATUS_NOT_CLAIMED_BY, num_deleted}
+            end
+        end
+
+        if is_claimed then
+            -- NOTE: The key of the list of messages in a claim is scoped
+            -- by the claim ID, see ClaimController. The list is sorted
+            -- oldest to newest and messages are usually deleted in that
+            -- order, so scanning it is quite fast.
+            local claim_key = key_prefix .. msg_claim_id
+            redis.call('LREM', claim_key .. '.messages', 1, mid)
+
+            -- Decrement the message counter of the claim, unless the
+            -- claim record has already expired.
+            if redis.call('EXISTS', claim_key) == 1 then
+                redis.call('HINCRBY', claim_key, 'n', -1)
+            end
+        end
+
+        redis.call('DEL', key_prefix .. mid)
+        redis.call('ZREM', msgset_key, mid)
+        redis.call('ZREM', freeset_key, mid)
+        redis.call('ZREM', claimedset_key, mid)
+
+        num_deleted = num_deleted + 1
+    end
+end
+
+return {STATUS_OK, num_deleted}
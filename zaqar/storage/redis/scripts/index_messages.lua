@@ -19,7 +19,8 @@ limitations under the License.
 
 -- Read params
 local msgset_key = KEYS[1]
-local counter_key = KEYS[2]
+local freeset_key = KEYS[2]
+local counter_key = KEYS[3]
 
 local num_message_ids = tonumber(ARGV[1])
 
@@ -35,5 +36,10 @@ end
 
 redis.call(unpack(zadd_args))
 
+-- New messages are unclaimed, so they are also added to the free set
+-- using the same rank.
+zadd_args[2] = freeset_key
+redis.call(unpack(zadd_args))
+
 -- Set next rank value
 return redis.call('SET', counter_key, rank_counter + num_message_ids)
@@ -0,0 +1,87 @@
+--[[
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+--]]
+
+-- Read params
+local msgset_key = KEYS[1]
+local freeset_key = KEYS[2]
+local claimedset_key = KEYS[3]
+
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+
+-- NOTE: Message hashes are keyed by the message ID scoped with the
+-- queue's hash tag, so that they live in the same slot as the KEYS.
+local key_prefix = ARGV[3]
+
+-- NOTE: Keep the following in sync with claim_messages.lua, so that
+-- popping messages sees the same set of unclaimed messages that
+-- claiming them would.
+local expired_ids = redis.call('ZRANGEBYSCORE', claimedset_key, '-inf', now)
+for i, mid in ipairs(expired_ids) do
+    local rank = redis.call('ZSCORE', msgset_key, mid)
+
+    -- NOTE: If the message is no longer in the msgset, it
+    -- was deleted, so we just have to forget about it.
+    if rank then
+        redis.call('ZADD', freeset_key, rank, mid)
+    end
+end
+
+if (#expired_ids ~= 0) then
+    redis.call('ZREMRANGEBYSCORE', claimedset_key, '-inf', now)
+end
+
+-- Pop up to 'limit' messages from the head of the free set
+local popped_msgs = {}
+
+while (#popped_msgs < limit) do
+    -- NOTE: Every ID we look at is removed from the free set
+    -- below, so we can always read from the head of the set.
+    local stop = (limit - #popped_msgs - 1)
+    local msg_ids = redis.call('ZRANGE', freeset_key, 0, stop)
+
+    if (#msg_ids == 0) then
+        break
+    end
+
+    for i, mid in ipairs(msg_ids) do
+        redis.call('ZREM', freeset_key, mid)
+
+        local claim = redis.call('HMGET', key_prefix .. mid, 'c', 'c.e')
+
+        if claim[2] == false then
+            -- NOTE(Eva-i): It means the message expired and does not
+            -- actually exist anymore, we must garbage collect it's
+            -- ID from the set and move on.
+            redis.call('ZREM', msgset_key, mid)
+
+        elseif claim[1] and claim[1] ~= '' and tonumber(claim[2]) > now then
+            -- NOTE: The message is already claimed, e.g. it was moved
+            -- here from another queue's claim to a dead letter queue,
+            -- so just make sure it is tracked as such.
+            redis.call('ZADD', claimedset_key, claim[2], mid)
+
+        else
+            popped_msgs[#popped_msgs + 1] = redis.call('HGETALL', key_prefix .. mid)
+
+            redis.call('DEL', key_prefix .. mid)
+            redis.call('ZREM', msgset_key, mid)
+        end
+    end
+end
+
+return popped_msgs
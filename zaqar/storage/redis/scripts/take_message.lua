@@ -0,0 +1,42 @@
+--[[
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+--]]
+
+-- Read params
+local msgset_key = KEYS[1]
+local freeset_key = KEYS[2]
+local claimedset_key = KEYS[3]
+local msg_key = KEYS[4]
+
+local mid = ARGV[1]
+
+-- NOTE: The message is read and removed from its queue in one go, so
+-- that a concurrent delete either happens before, in which case there
+-- is nothing left to take, or after, in which case there is nothing
+-- left to delete.
+local msg = redis.call('HGETALL', msg_key)
+if #msg == 0 then
+    return false
+end
+
+local pttl = redis.call('PTTL', msg_key)
+
+redis.call('DEL', msg_key)
+redis.call('ZREM', msgset_key, mid)
+redis.call('ZREM', freeset_key, mid)
+redis.call('ZREM', claimedset_key, mid)
+
+return {msg, pttl}
@@ -15,6 +15,7 @@
 import functools
 
 import msgpack
+from oslo_utils import encodeutils
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import redis
@@ -35,7 +36,8 @@ SUBSCRIPTION_IDS_SUFFIX = 'subscriptions'
 class SubscriptionController(base.Subscription):
     """Implements subscription resource operations using MongoDB.
 
-    Subscriptions are unique by project + queue/topic + subscriber.
+    Subscriptions are unique by project + queue/topic + subscriber, and
+    are stored in hashes keyed by {<project_id>.<queue_name>}.<id>.
 
     Schema:
       's': source :: six.text_type
@@ -52,10 +54,15 @@ class SubscriptionController(base.Subscription):
                                       use_bin_type=True).pack
         self._unpacker = functools.partial(msgpack.unpackb, encoding='utf-8')
 
+    @property
+    def _read_client(self):
+        """Client for read-only operations, which may be a replica."""
+        return self.driver.read_connection
+
     @utils.raises_conn_error
     @utils.retries_on_connection_error
     def list(self, queue, project=None, marker=None, limit=10):
-        client = self._client
+        client = self._read_client
         subset_key = utils.scope_subscription_ids_set(queue,
                                                       project,
                                                       SUBSCRIPTION_IDS_SUFFIX)
@@ -87,7 +94,9 @@ class SubscriptionController(base.Subscription):
 
             return ret
 
-        yield utils.SubscriptionListCursor(self._client, cursor, denormalizer)
+        yield utils.SubscriptionListCursor(
+            client, cursor, denormalizer,
+            key_prefix=utils.scope_queue_key(queue, project))
         yield marker_next and marker_next['next']
 
     @utils.raises_conn_error
@@ -95,8 +104,9 @@ class SubscriptionController(base.Subscription):
     def get(self, queue, subscription_id, project=None):
         subscription = None
         if self.exists(queue, subscription_id, project):
-            subscription = SubscriptionEnvelope.from_redis(subscription_id,
-                                                           self._client)
+            subscription = SubscriptionEnvelope.from_redis(
+                utils.scope_queue_key(queue, project, subscription_id),
+                self._client)
         if subscription:
             now = timeutils.utcnow_ts()
             return subscription.to_basic(now)
@@ -111,6 +121,9 @@ class SubscriptionController(base.Subscription):
                                                       project,
                                                       SUBSCRIPTION_IDS_SUFFIX)
 
+        subscription_key = utils.scope_queue_key(queue, project,
+                                                 subscription_id)
+
         source = queue
         now = timeutils.utcnow_ts()
         expires = now + ttl
@@ -132,9 +145,9 @@ class SubscriptionController(base.Subscription):
                                                       queue,
                                                       project):
                     pipe.zadd(subset_key, 1,
-                              subscription_id).hmset(subscription_id,
+                              subscription_id).hmset(subscription_key,
                                                      subscription)
-                    pipe.expire(subscription_id, ttl)
+                    pipe.expire(subscription_key, ttl)
                     pipe.execute()
                 else:
                     return None
@@ -158,8 +171,10 @@ class SubscriptionController(base.Subscription):
         try:
             sub_ids = (q for q in self._client.zrange(subset_key, 0, -1))
             for s_id in sub_ids:
-                subscription = self._client.hmget(s_id,
-                                                  ['s', 'u', 't', 'o', 'c'])
+                subscription = self._client.hmget(
+                    utils.scope_queue_key(queue, project,
+                                          encodeutils.safe_decode(s_id)),
+                    ['s', 'u', 't', 'o', 'c'])
                 if subscription == [None, None, None, None, None]:
                     # NOTE(flwang): Under this check, that means the
                     # subscription has been expired. So redis can't get
@@ -220,11 +235,14 @@ class SubscriptionController(base.Subscription):
             expires = now + new_ttl
             fields['e'] = expires
 
+        subscription_key = utils.scope_queue_key(queue, project,
+                                                 subscription_id)
+
         # Pipeline ensures atomic inserts.
         with self._client.pipeline() as pipe:
-            pipe.hmset(subscription_id, fields)
+            pipe.hmset(subscription_key, fields)
             if new_ttl is not None:
-                pipe.expire(subscription_id, new_ttl)
+                pipe.expire(subscription_key, new_ttl)
             pipe.execute()
 
     @utils.raises_conn_error
@@ -237,7 +255,8 @@ class SubscriptionController(base.Subscription):
             # NOTE(prashanthr_): Pipelining is used to mitigate race conditions
             with self._client.pipeline() as pipe:
                 pipe.zrem(subset_key, subscription_id)
-                pipe.delete(subscription_id)
+                pipe.delete(utils.scope_queue_key(queue, project,
+                                                  subscription_id))
                 pipe.execute()
 
     @utils.raises_conn_error
@@ -248,11 +267,13 @@ class SubscriptionController(base.Subscription):
                                                       SUBSCRIPTION_IDS_SUFFIX)
         sub_ids = (q for q in self._client.zrange(subset_key, 0, -1))
         for s_id in sub_ids:
-            subscription = self._client.hmget(s_id,
+            subscription_key = utils.scope_queue_key(
+                queue, project, encodeutils.safe_decode(s_id))
+            subscription = self._client.hmget(subscription_key,
                                               ['s', 'u', 't', 'o', 'c'])
             if subscription[1] == subscriber:
-                subscription = SubscriptionEnvelope.from_redis(s_id,
-                                                               self._client)
+                subscription = SubscriptionEnvelope.from_redis(
+                    subscription_key, self._client)
                 now = timeutils.utcnow_ts()
                 return subscription.to_basic(now)
 
@@ -265,5 +286,6 @@ class SubscriptionController(base.Subscription):
 
         fields = {'c': confirmed}
         with self._client.pipeline() as pipe:
-            pipe.hmset(subscription_id, fields)
+            pipe.hmset(utils.scope_queue_key(queue, project, subscription_id),
+                       fields)
             pipe.execute()
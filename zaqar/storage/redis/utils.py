@@ -27,6 +27,8 @@ from zaqar.storage import errors
 
 LOG = logging.getLogger(__name__)
 MESSAGE_IDS_SUFFIX = 'messages'
+FREE_MESSAGE_IDS_SUFFIX = 'free'
+CLAIMED_MESSAGE_IDS_SUFFIX = 'claimed'
 SUBSCRIPTION_IDS_SUFFIX = 'subscriptions'
 
 
@@ -68,56 +70,74 @@ def scope_queue_name(queue=None, project=None):
     return normalize_none_str(project) + '.' + normalize_none_str(queue)
 
 # NOTE(prashanthr_): Aliase the scope_queue_name function
-# to be used in the pools and claims controller as similar
+# to be used in the pools controller as similar
 # functionality is required to scope redis id's.
-scope_pool_catalogue = scope_claim_messages = scope_queue_name
+scope_pool_catalogue = scope_queue_name
+
+
+def scope_queue_key(queue=None, project=None, name=''):
+    """Scope a key holding data that belongs to a queue.
+
+    The scoped queue name is used as a Redis Cluster hash tag, so that
+    all the keys of a queue's messages, claims and subscriptions are
+    stored in the same hash slot, and can be used together in a single
+    Lua script.
+
+    :returns: '{project-id.queue-name}.name'
+    """
+
+    return '{' + scope_queue_name(queue, project) + '}.' + name
+
+
+def descope_queue_key(key):
+    """Descope a key scoped by scope_queue_key.
+
+    :returns: (queue, project)
+    """
+
+    scoped_name = key[1:key.index('}')]
+    project, sep, queue = scoped_name.partition('.')
+
+    return queue or None, project or None
 
 
 def scope_message_ids_set(queue=None, project=None, message_suffix=''):
-    """Scope messages set with '.'
+    """Scope messages set with the queue's hash tag
 
     Returns a scoped name for the list of messages in the form
-    project-id_queue-name_suffix
+    {project-id.queue-name}.suffix
     """
 
-    return (normalize_none_str(project) + '.' +
-            normalize_none_str(queue) + '.' +
-            message_suffix)
+    return scope_queue_key(queue, project, message_suffix)
 
 
 def descope_message_ids_set(msgset_key):
-    """Descope messages set with '.'
+    """Descope messages set
 
     :returns: (queue, project)
     """
 
-    tokens = msgset_key.split('.')
-
-    return tokens[1] or None, tokens[0] or None
+    return descope_queue_key(msgset_key)
 
 
 def scope_subscription_ids_set(queue=None, project=None,
                                subscription_suffix=''):
-    """Scope subscriptions set with '.'
+    """Scope subscriptions set with the queue's hash tag
 
     Returns a scoped name for the list of subscriptions in the form
-    project-id_queue-name_suffix
+    {project-id.queue-name}.suffix
     """
 
-    return (normalize_none_str(project) + '.' +
-            normalize_none_str(queue) + '.' +
-            subscription_suffix)
+    return scope_queue_key(queue, project, subscription_suffix)
 
 
 def descope_subscription_ids_set(subset_key):
-    """Descope subscriptions set with '.'
+    """Descope subscriptions set
 
     :returns: (queue, project)
     """
 
-    tokens = subset_key.split('.')
-
-    return (tokens[1] or None, tokens[0] or None)
+    return descope_queue_key(subset_key)
 
 
 # NOTE(prashanthr_): Aliasing the scope_message_ids_set function
@@ -131,6 +151,24 @@ def msgset_key(queue, project=None):
     return scope_message_ids_set(queue, project, MESSAGE_IDS_SUFFIX)
 
 
+def freeset_key(queue, project=None):
+    return scope_message_ids_set(queue, project, FREE_MESSAGE_IDS_SUFFIX)
+
+
+def claimedset_key(queue, project=None):
+    return scope_message_ids_set(queue, project, CLAIMED_MESSAGE_IDS_SUFFIX)
+
+
+def message_key(queue, project, message_id):
+    return scope_queue_key(queue, project,
+                           encodeutils.safe_decode(message_id))
+
+
+def message_keys(queue, project, message_ids):
+    prefix = scope_queue_key(queue, project)
+    return [prefix + encodeutils.safe_decode(mid) for mid in message_ids]
+
+
 def subset_key(queue, project=None):
     return scope_subscription_ids_set(queue, project, SUBSCRIPTION_IDS_SUFFIX)
 
@@ -253,25 +291,27 @@ class QueueListCursor(object):
 
 class SubscriptionListCursor(object):
 
-    def __init__(self, client, subscriptions, denormalizer):
+    def __init__(self, client, subscriptions, denormalizer, key_prefix=''):
         self.subscription_iter = subscriptions
         self.denormalizer = denormalizer
         self.client = client
+        self.key_prefix = key_prefix
 
     def __iter__(self):
         return self
 
     @raises_conn_error
     def next(self):
-        curr = next(self.subscription_iter)
-        subscription = self.client.hmget(curr, ['s', 'u', 't', 'e', 'o', 'c'])
+        curr = encodeutils.safe_decode(next(self.subscription_iter))
+        subscription = self.client.hmget(self.key_prefix + curr,
+                                         ['s', 'u', 't', 'e', 'o', 'c'])
         # NOTE(flwang): The expired subscription will be removed
         # automatically, but the key can't be deleted automatically as well.
         # Though we clean up those expired ids when create new subscription,
         # we still need to filter them out before a new subscription creation.
         if not subscription[0]:
             return self.next()
-        return self.denormalizer(subscription, encodeutils.safe_decode(curr))
+        return self.denormalizer(subscription, curr)
 
     def __next__(self):
         return self.next()
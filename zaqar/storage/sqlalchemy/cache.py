@@ -0,0 +1,149 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process cache of the control plane tables.
+
+Every write to a cached table bumps the version of the table, kept in
+the Versions table. Each process caches the rows it reads, and checks
+the versions of all the tables with a single query, at most once per
+poll interval, dropping what it cached from the tables that changed.
+Reads may thus be stale for up to a poll interval after a write made
+by another process, while writes made by a process are seen right
+away by that process. Rows that are not found are not cached, so that
+a process never takes a row inserted by another one for missing.
+"""
+
+import collections
+import copy
+import threading
+
+import oslo_db.exception
+from oslo_utils import timeutils
+import sqlalchemy as sa
+
+from zaqar.storage.sqlalchemy import tables
+
+
+class VersionedCache(object):
+    """Caches rows read from tables, until the tables change.
+
+    :param driver: SQLAlchemy control driver
+    :param poll_interval: Maximum number of seconds between checks for
+        changes made by other processes. When 0, nothing is cached.
+    """
+
+    def __init__(self, driver, poll_interval):
+        self._driver = driver
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._last_poll = None
+
+        # NOTE: Versions of the tables seen by the last poll, and the
+        # cached values, by table name.
+        self._versions = {}
+        self._entries = collections.defaultdict(dict)
+
+        # NOTE: Bumped whenever the entries of a table are dropped, so
+        # that values loaded in the meantime are not cached.
+        self._generations = collections.defaultdict(int)
+
+    def get(self, table, key, load):
+        """Gets a value read from a table, loading it if not cached.
+
+        :param table: Name of the table the value is read from
+        :param key: Key of the value, unique within the table
+        :param load: Callable loading the value from the database.
+            Exceptions raised by it are passed through, and nothing is
+            cached. None, for rows that do not exist, is not cached
+            either, so that rows inserted by other processes are seen
+            right away.
+        :returns: A copy of the value
+        """
+
+        if not self._poll_interval:
+            return load()
+
+        self._poll()
+
+        with self._lock:
+            try:
+                return copy.deepcopy(self._entries[table][key])
+            except KeyError:
+                generation = self._generations[table]
+
+        value = load()
+        if value is None:
+            return None
+
+        with self._lock:
+            if self._generations[table] == generation:
+                self._entries[table][key] = copy.deepcopy(value)
+
+        return value
+
+    def invalidate(self, *table_names):
+        """Records that tables have been written to.
+
+        Meant to be called after every write, so that every process
+        stops using what it cached from the tables.
+
+        :param table_names: Names of the tables written to
+        """
+
+        for name in table_names:
+            self._bump(name)
+
+        with self._lock:
+            for name in table_names:
+                self._drop(name)
+
+    def _bump(self, name):
+        versions = tables.Versions
+        stmt = sa.sql.update(versions).where(
+            versions.c.name == name
+        ).values(version=versions.c.version + 1)
+
+        if self._driver.run(stmt).rowcount:
+            return
+
+        try:
+            stmt = sa.sql.insert(versions).values(name=name, version=1)
+            self._driver.run(stmt)
+        except oslo_db.exception.DBDuplicateEntry:
+            # NOTE: Another process inserted it first
+            stmt = sa.sql.update(versions).where(
+                versions.c.name == name
+            ).values(version=versions.c.version + 1)
+            self._driver.run(stmt)
+
+    def _drop(self, name):
+        self._entries.pop(name, None)
+        self._generations[name] += 1
+
+    def _poll(self):
+        now = timeutils.utcnow_ts(microsecond=True)
+        if (self._last_poll is not None and
+                now - self._last_poll < self._poll_interval):
+            return
+
+        stmt = sa.sql.select([tables.Versions.c.name,
+                              tables.Versions.c.version])
+        versions = dict(tuple(row) for row in self._driver.run(stmt))
+
+        with self._lock:
+            for name in set(self._versions) | set(versions):
+                if self._versions.get(name) != versions.get(name):
+                    self._drop(name)
+
+            self._versions = versions
+            self._last_poll = now
@@ -48,15 +48,22 @@ class CatalogueController(base.CatalogueBase):
         return (_normalize(v) for v in cursor)
 
     def get(self, project, queue):
+        entry = self.driver.table_cache.get(
+            tables.Catalogue.name, (project, queue),
+            lambda: self._get(project, queue))
+
+        if entry is None:
+            raise errors.QueueNotMapped(queue, project)
+
+        return entry
+
+    def _get(self, project, queue):
         stmt = sa.sql.select([tables.Catalogue]).where(
             _match(project, queue)
         )
         entry = self.driver.run(stmt).fetchone()
 
-        if entry is None:
-            raise errors.QueueNotMapped(queue, project)
-
-        return _normalize(entry)
+        return None if entry is None else _normalize(entry)
 
     def exists(self, project, queue):
         try:
@@ -75,18 +82,22 @@ class CatalogueController(base.CatalogueBase):
             self._update(project, queue, pool)
         except oslo_db.exception.DBDuplicateError:
             self._update(project, queue, pool)
+        else:
+            self.driver.table_cache.invalidate(tables.Catalogue.name)
 
     def delete(self, project, queue):
         stmt = sa.sql.delete(tables.Catalogue).where(
             _match(project, queue)
         )
         self.driver.run(stmt)
+        self.driver.table_cache.invalidate(tables.Catalogue.name)
 
     def _update(self, project, queue, pool):
         stmt = sa.sql.update(tables.Catalogue).where(
             _match(project, queue)
         ).values(pool=pool)
         self.driver.run(stmt)
+        self.driver.table_cache.invalidate(tables.Catalogue.name)
 
     def update(self, project, queue, pool=None):
         if pool is None:
@@ -100,6 +111,7 @@ class CatalogueController(base.CatalogueBase):
     def drop_all(self):
         stmt = sa.sql.expression.delete(tables.Catalogue)
         self.driver.run(stmt)
+        self.driver.table_cache.invalidate(tables.Catalogue.name)
 
 
 def _normalize(entry):
@@ -20,6 +20,7 @@ import sqlalchemy as sa
 
 from zaqar.common import decorators
 from zaqar import storage
+from zaqar.storage.sqlalchemy import cache
 from zaqar.storage.sqlalchemy import controllers
 from zaqar.storage.sqlalchemy import options
 
@@ -58,6 +59,13 @@ class ControlDriver(storage.ControlDriverBase):
 
         return engine
 
+    @decorators.lazy_property(write=False)
+    def table_cache(self):
+        # NOTE: Kept by the driver, since controllers are created
+        # anew whenever they are accessed.
+        return cache.VersionedCache(self,
+                                    self.sqlalchemy_conf.cache_poll_interval)
+
     # TODO(cpp-cabrera): expose connect/close as a context manager
     # that acquires the connection to the DB for the desired scope and
     # closes it once the operations are completed
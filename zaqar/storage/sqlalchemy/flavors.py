@@ -60,16 +60,21 @@ class FlavorsController(base.FlavorsBase):
 
     @utils.raises_conn_error
     def get(self, name, project=None, detailed=False):
-        stmt = sa.sql.select([tables.Flavors]).where(
-            sa.and_(tables.Flavors.c.name == name,
-                    tables.Flavors.c.project == project)
-        )
+        def load():
+            stmt = sa.sql.select([tables.Flavors]).where(
+                sa.and_(tables.Flavors.c.name == name,
+                        tables.Flavors.c.project == project)
+            )
+
+            flavor = self.driver.run(stmt).fetchone()
+            return None if flavor is None else _normalize(flavor, detailed)
 
-        flavor = self.driver.run(stmt).fetchone()
+        flavor = self.driver.table_cache.get(tables.Flavors.name,
+                                             (name, project, detailed), load)
         if flavor is None:
             raise errors.FlavorDoesNotExist(name)
 
-        return _normalize(flavor, detailed)
+        return flavor
 
     @utils.raises_conn_error
     def create(self, name, pool_group, project=None, capabilities=None):
@@ -90,6 +95,8 @@ class FlavorsController(base.FlavorsBase):
             self.update(name, pool_group=pool_group,
                         project=project,
                         capabilities=cap)
+        else:
+            self.driver.table_cache.invalidate(tables.Flavors.name)
 
     @utils.raises_conn_error
     def exists(self, name, project=None):
@@ -121,6 +128,8 @@ class FlavorsController(base.FlavorsBase):
         if res.rowcount == 0:
             raise errors.FlavorDoesNotExist(name)
 
+        self.driver.table_cache.invalidate(tables.Flavors.name)
+
     @utils.raises_conn_error
     def delete(self, name, project=None):
         stmt = sa.sql.expression.delete(tables.Flavors).where(
@@ -128,11 +137,13 @@ class FlavorsController(base.FlavorsBase):
                     tables.Flavors.c.project == project)
         )
         self.driver.run(stmt)
+        self.driver.table_cache.invalidate(tables.Flavors.name)
 
     @utils.raises_conn_error
     def drop_all(self):
         stmt = sa.sql.expression.delete(tables.Flavors)
         self.driver.run(stmt)
+        self.driver.table_cache.invalidate(tables.Flavors.name)
 
 
 def _normalize(flavor, detailed=False):
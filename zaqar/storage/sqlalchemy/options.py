@@ -25,7 +25,15 @@ _COMMON_SQLALCHEMY_OPTIONS = (
                help='An sqlalchemy URL'),
 )
 
-MANAGEMENT_SQLALCHEMY_OPTIONS = _COMMON_SQLALCHEMY_OPTIONS
+MANAGEMENT_SQLALCHEMY_OPTIONS = _COMMON_SQLALCHEMY_OPTIONS + (
+    cfg.FloatOpt('cache_poll_interval', default=1.0, min=0,
+                 help=('Maximum number of seconds between checks for '
+                       'changes made to the queues, pools, flavors and '
+                       'catalogue by other processes. Lookups are served '
+                       'from an in-process cache in between, so changes '
+                       'made by other processes may take this long to be '
+                       'seen. Set to 0 to disable the cache.')),
+)
 
 MANAGEMENT_SQLALCHEMY_GROUP = 'drivers:management_store:sqlalchemy'
 
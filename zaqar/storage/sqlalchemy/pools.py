@@ -67,15 +67,20 @@ class PoolsController(base.PoolsBase):
 
     @utils.raises_conn_error
     def _get(self, name, detailed=False):
-        stmt = sa.sql.select([tables.Pools]).where(
-            tables.Pools.c.name == name
-        )
+        def load():
+            stmt = sa.sql.select([tables.Pools]).where(
+                tables.Pools.c.name == name
+            )
 
-        pool = self.driver.run(stmt).fetchone()
+            pool = self.driver.run(stmt).fetchone()
+            return None if pool is None else _normalize(pool, detailed)
+
+        pool = self.driver.table_cache.get(tables.Pools.name,
+                                           (name, detailed), load)
         if pool is None:
             raise errors.PoolDoesNotExist(name)
 
-        return _normalize(pool, detailed)
+        return pool
 
     def _ensure_group_exists(self, name):
         try:
@@ -104,6 +109,8 @@ class PoolsController(base.PoolsBase):
             # method with introduction of upsert
             self._update(name, weight=weight, uri=uri,
                          group=group, options=options)
+        else:
+            self.driver.table_cache.invalidate(tables.Pools.name)
 
     @utils.raises_conn_error
     def _exists(self, name):
@@ -137,6 +144,8 @@ class PoolsController(base.PoolsBase):
         if res.rowcount == 0:
             raise errors.PoolDoesNotExist(name)
 
+        self.driver.table_cache.invalidate(tables.Pools.name)
+
     @utils.raises_conn_error
     def _delete(self, name):
         stmt = sa.sql.expression.delete(tables.Pools).where(
@@ -144,6 +153,10 @@ class PoolsController(base.PoolsBase):
         )
         self.driver.run(stmt)
 
+        # NOTE: Deleting a pool deletes its catalogue entries as well
+        self.driver.table_cache.invalidate(tables.Pools.name,
+                                           tables.Catalogue.name)
+
     @utils.raises_conn_error
     def _drop_all(self):
         stmt = sa.sql.expression.delete(tables.Pools)
@@ -151,6 +164,12 @@ class PoolsController(base.PoolsBase):
         stmt = sa.sql.expression.delete(tables.PoolGroup)
         self.driver.run(stmt)
 
+        # NOTE: Deleting the pools and their groups deletes the catalogue
+        # entries and the flavors as well
+        self.driver.table_cache.invalidate(tables.Pools.name,
+                                           tables.Catalogue.name,
+                                           tables.Flavors.name)
+
 
 def _normalize(pool, detailed=False):
     ret = {
@@ -59,16 +59,26 @@ class QueueController(storage.Queue):
         if project is None:
             project = ''
 
-        sel = sa.sql.select([tables.Queues.c.metadata], sa.and_(
-            tables.Queues.c.project == project,
-            tables.Queues.c.name == name
-        ))
-
-        queue = self.driver.run(sel).fetchone()
-        if queue is None:
+        metadata = self._lookup(name, project)
+        if metadata is None:
             raise errors.QueueDoesNotExist(name, project)
 
-        return utils.json_decode(queue[0])
+        return metadata
+
+    def _lookup(self, name, project):
+        """Gets the metadata of a queue, or None if it does not exist."""
+
+        def load():
+            sel = sa.sql.select([tables.Queues.c.metadata], sa.and_(
+                tables.Queues.c.project == project,
+                tables.Queues.c.name == name
+            ))
+
+            queue = self.driver.run(sel).fetchone()
+            return None if queue is None else utils.json_decode(queue[0])
+
+        return self.driver.table_cache.get(tables.Queues.name,
+                                           (project, name), load)
 
     def _get(self, name, project=None):
         try:
@@ -89,20 +99,14 @@ class QueueController(storage.Queue):
         except oslo_db.exception.DBDuplicateEntry:
             return False
 
+        self.driver.table_cache.invalidate(tables.Queues.name)
         return res.rowcount == 1
 
     def _exists(self, name, project):
         if project is None:
             project = ''
 
-        sel = sa.sql.select([tables.Queues.c.id], sa.and_(
-                            tables.Queues.c.project == project,
-                            tables.Queues.c.name == name
-                            ))
-        res = self.driver.run(sel)
-        r = res.fetchone()
-        res.close()
-        return r is not None
+        return self._lookup(name, project) is not None
 
     def set_metadata(self, name, metadata, project):
         if project is None:
@@ -115,6 +119,7 @@ class QueueController(storage.Queue):
                   values(metadata=utils.json_encode(metadata)))
 
         res = self.driver.run(update)
+        self.driver.table_cache.invalidate(tables.Queues.name)
 
         try:
             if res.rowcount != 1:
@@ -130,6 +135,7 @@ class QueueController(storage.Queue):
             tables.Queues.c.project == project,
             tables.Queues.c.name == name))
         self.driver.run(dlt)
+        self.driver.table_cache.invalidate(tables.Queues.name)
 
     def _stats(self, name, project):
         pass
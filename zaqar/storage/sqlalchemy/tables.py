@@ -59,3 +59,8 @@ Catalogue = sa.Table('Catalogue', metadata,
                      sa.Column('project', sa.String(64)),
                      sa.Column('queue', sa.String(64), nullable=False),
                      sa.UniqueConstraint('project', 'queue'))
+
+
+Versions = sa.Table('Versions', metadata,
+                    sa.Column('name', sa.String(64), primary_key=True),
+                    sa.Column('version', sa.INTEGER, nullable=False))
@@ -106,8 +106,7 @@ class ClaimController(storage.Claim):
         messages, marker = message_ctrl._list(queue, project, limit=limit,
                                               include_claimed=False)
 
-        claimed = []
-        for msg in messages:
+        def claim(msg):
             claim_count = msg.get('claim_count', 0)
             md5 = hashlib.md5()
             md5.update(
@@ -155,6 +154,7 @@ class ClaimController(storage.Claim):
                              'x-delete-after': msg_ttl})
 
                 message_ctrl._delete(queue, msg['id'], project)
+                return None
 
             else:
                 try:
@@ -169,20 +169,27 @@ class ClaimController(storage.Claim):
                                  'x-delete-after': msg_ttl})
                 except swiftclient.ClientException as exc:
                     if exc.http_status == 412:
-                        continue
+                        return None
                     raise
                 else:
                     msg['claim_id'] = claim_id
                     msg['ttl'] = msg_ttl
                     msg['claim_count'] = claim_count
-                    claimed.append(msg)
+                    return msg
+
+        # NOTE: Each message is claimed by its own conditional PUT, so
+        # they can all be sent at once. The ones that were updated in
+        # the meantime fail the If-Match check and are left out.
+        claimed = [msg for msg in utils._map_concurrently(
+            self.driver.executor, claim, messages) if msg is not None]
 
         utils._put_or_create_container(
             self._client,
             utils._claim_container(queue, project),
             claim_id,
             jsonutils.dumps([msg['id'] for msg in claimed]),
-            content_type='application/json',
+            content_type=utils._claim_content_type(
+                len(claimed), math.ceil(timeutils.utcnow_ts(True) + ttl)),
             headers={'x-delete-after': ttl}
         )
 
@@ -200,8 +207,10 @@ class ClaimController(storage.Claim):
                 raise errors.ClaimDoesNotExist(claim_id, queue, project)
             raise
 
+        expires = math.ceil(timeutils.utcnow_ts(True) + metadata['ttl'])
         self._client.put_object(container, claim_id, obj,
-                                content_type='application/json',
+                                content_type=utils._claim_content_type(
+                                    len(jsonutils.loads(obj)), expires),
                                 headers={'x-delete-after': metadata['ttl']})
 
     def delete(self, queue, claim_id, project=None):
@@ -11,6 +11,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import threading
+
+import futurist
 from osprofiler import profiler
 from six.moves import urllib
 
@@ -46,6 +50,12 @@ class DataDriver(storage.DataDriverBase):
     def connection(self):
         return _ClientWrapper(self.swift_conf)
 
+    @decorators.lazy_property(write=False)
+    def executor(self):
+        """Pool of threads shared by the requests made to Swift."""
+        return futurist.ThreadPoolExecutor(
+            max_workers=self.swift_conf.request_workers)
+
     def is_alive(self):
         try:
             self.connection.get_capabilities()
@@ -86,22 +96,31 @@ class DataDriver(storage.DataDriverBase):
         raise NotImplementedError("No health checks")
 
     def close(self):
-        pass
+        self.connection.close()
+
+        executor = getattr(self, '_lazy_executor', None)
+        if executor is not None:
+            executor.shutdown(wait=False)
 
 
 class _ClientWrapper(object):
     """Wrapper around swiftclient.Connection.
 
     This wraps swiftclient.Connection to give the same API, but provide a
-    thread-safe alternative with a different object for every method call. It
-    maintains performance by managing authentication itself, and passing the
-    token afterwards.
+    thread-safe alternative: every method call checks out a connection from
+    a pool, and checks it back in once done, so that connections and their
+    keep-alive HTTP sessions are reused. It maintains performance by managing
+    authentication itself, and passing the token afterwards.
     """
 
     def __init__(self, conf):
         self.conf = conf
         self.parsed_url = urllib.parse.urlparse(conf.uri)
         self.session = None
+        self._lock = threading.Lock()
+
+        # NOTE: Idle connections, the most recently used last
+        self._idle = collections.deque()
 
     def _init_auth(self):
         auth = generic.Password(
@@ -115,9 +134,50 @@ class _ClientWrapper(object):
             auth_url=self.conf.auth_url)
         self.session = keystone_session.Session(auth=auth)
 
+    def _checkout(self):
+        with self._lock:
+            if self.session is None:
+                self._init_auth()
+            if self._idle:
+                return self._idle.pop()
+
+        return swiftclient.Connection(session=self.session,
+                                      insecure=self.conf.insecure)
+
+    def _checkin(self, client):
+        with self._lock:
+            if len(self._idle) < self.conf.connection_pool_size:
+                self._idle.append(client)
+                return
+
+        client.close()
+
     def __getattr__(self, attr):
-        if self.session is None:
-            self._init_auth()
-        client = swiftclient.Connection(session=self.session,
-                                        insecure=self.conf.insecure)
-        return getattr(client, attr)
+        # NOTE: Raises AttributeError for anything that is not an
+        # attribute of connections.
+        getattr(swiftclient.Connection, attr)
+
+        def call(*args, **kwargs):
+            client = self._checkout()
+            try:
+                result = getattr(client, attr)(*args, **kwargs)
+            except swiftclient.ClientException:
+                # NOTE: Swift answered, so the connection can be reused.
+                self._checkin(client)
+                raise
+            except Exception:
+                client.close()
+                raise
+
+            self._checkin(client)
+            return result
+
+        return call
+
+    def close(self):
+        """Closes the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, collections.deque()
+
+        for client in idle:
+            client.close()
@@ -11,7 +11,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import copy
 import datetime
 import functools
 import uuid
@@ -143,15 +142,18 @@ class MessageController(storage.Message):
                                          limit=limit * 2,
                                          query_string=query_string)
         yield utils._filter_messages(objects, filters, marker, get_object,
-                                     list_objects, limit=limit)
+                                     list_objects, limit=limit,
+                                     executor=self.driver.executor)
         yield marker and marker['next']
 
     def list(self, queue, project=None, marker=None,
              limit=storage.DEFAULT_MESSAGES_PER_PAGE,
              echo=False, client_uuid=None,
-             include_claimed=False):
-        return self._list(queue, project, marker, limit, echo,
-                          client_uuid, include_claimed)
+             include_claimed=False,
+             projection=storage.MESSAGE_PROJECTION_FULL):
+        results = self._list(queue, project, marker, limit, echo,
+                             client_uuid, include_claimed)
+        return self._project_listing(results, projection)
 
     def first(self, queue, project=None, sort=1):
         if sort not in (1, -1):
@@ -205,13 +207,21 @@ class MessageController(storage.Message):
                 pass
 
     def post(self, queue, messages, client_uuid, project=None):
-        # TODO(flwang): It would be nice if we can create a middleware in Swift
-        # to accept a json list so that Zaqar can create objects in bulk.
-        return [self._create_msg(queue, m, client_uuid, project)
-                for m in messages]
-
-    def _create_msg(self, queue, msg, client_uuid, project):
-        slug = str(uuid.uuid1())
+        # NOTE: Swift's bulk middleware can create the objects of an
+        # archive in a single request, but not with an X-Delete-After,
+        # which messages rely on to expire. Upload them concurrently
+        # instead, returning their IDs in the order they were given.
+        # Messages are listed in the order of their object names, so
+        # the names are generated up front, in that order.
+        def create(item):
+            slug, msg = item
+            return self._create_msg(queue, msg, client_uuid, project, slug)
+
+        slugs = [str(uuid.uuid1()) for msg in messages]
+        return utils._map_concurrently(self.driver.executor, create,
+                                       zip(slugs, messages))
+
+    def _create_msg(self, queue, msg, client_uuid, project, slug):
         contents = jsonutils.dumps(
             {'body': msg.get('body', {}), 'claim_id': None,
              'ttl': msg['ttl'], 'claim_count': 0})
@@ -321,50 +331,55 @@ class MessageQueueHandler(object):
         if not self._queue_ctrl.exists(name, project=project):
             raise errors.QueueDoesNotExist(name, project)
 
-        total = 0
-        claimed = 0
         container = utils._message_container(name, project)
 
+        # NOTE: Messages that have expired but have not been removed by
+        # Swift yet are counted until they are, and the messages of a
+        # claim are counted as claimed until it expires or is deleted.
         try:
-            _, objects = self._client.get_container(container)
+            headers, first = self._client.get_container(container, limit=1)
+            _, last = self._client.get_container(container, limit=1,
+                                                 query_string='reverse=on')
         except swiftclient.ClientException as exc:
             if exc.http_status == 404:
                 raise errors.QueueIsEmpty(name, project)
+            raise
 
-        newest = None
-        oldest = None
         now = timeutils.utcnow_ts(True)
-        for obj in objects:
-            try:
-                headers = self._client.head_object(container, obj['name'])
-            except swiftclient.ClientException as exc:
-                if exc.http_status != 404:
-                    raise
-            else:
-                created = float(headers['x-timestamp'])
-                created_iso = datetime.datetime.utcfromtimestamp(
-                    created).strftime('%Y-%m-%dT%H:%M:%SZ')
-                newest = {
-                    'id': obj['name'],
-                    'age': now - created,
-                    'created': created_iso}
-                if oldest is None:
-                    oldest = copy.deepcopy(newest)
-                total += 1
-                if headers.get('x-object-meta-claimid'):
-                    claimed += 1
+        total = int(headers.get('x-container-object-count', 0))
+        claimed = min(total, self._count_claimed(name, project, now))
 
         msg_stats = {
             'claimed': claimed,
             'free': total - claimed,
             'total': total,
         }
-        if newest is not None:
-            msg_stats['newest'] = newest
-            msg_stats['oldest'] = oldest
+        if first and last:
+            msg_stats['oldest'] = self._message_stat(first[0], now)
+            msg_stats['newest'] = self._message_stat(last[0], now)
 
         return {'messages': msg_stats}
 
+    def _count_claimed(self, name, project, now):
+        try:
+            _, claims = self._client.get_container(
+                utils._claim_container(name, project), full_listing=True)
+        except swiftclient.ClientException as exc:
+            if exc.http_status == 404:
+                return 0
+            raise
+
+        return sum(utils._claimed_count(claim, now) for claim in claims)
+
+    def _message_stat(self, obj, now):
+        created = utils._listing_timestamp(obj)
+        created_iso = datetime.datetime.utcfromtimestamp(
+            created).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return {
+            'id': obj['name'],
+            'age': now - created,
+            'created': created_iso}
+
     def exists(self, queue, project=None):
         try:
             self._client.head_container(utils._message_container(queue,
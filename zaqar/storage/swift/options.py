@@ -26,6 +26,18 @@ MESSAGE_SWIFT_OPTIONS = (
     cfg.StrOpt("project_domain_name", help="Domain name containing project"),
     cfg.StrOpt("user_domain_id", default="default", help="User's domain id"),
     cfg.StrOpt("user_domain_name", help="User's domain name"),
+    cfg.IntOpt("request_workers", default=8, min=1,
+               help=("Maximum number of concurrent requests made to Swift "
+                     "by each process when fetching or updating several "
+                     "messages at once, e.g. when listing or claiming "
+                     "messages.")),
+    cfg.IntOpt("connection_pool_size", default=10, min=0,
+               help=("Maximum number of idle connections to Swift kept "
+                     "open by each process, to be reused by later "
+                     "requests. More connections are opened when needed, "
+                     "and closed once done if there are already that many "
+                     "idle ones. 0 closes every connection after a single "
+                     "request.")),
 )
 
 
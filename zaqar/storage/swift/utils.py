@@ -11,6 +11,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import calendar
+import collections
+
+from futurist import waiters
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import swiftclient
@@ -61,6 +65,43 @@ def _message_to_json(message_id, msg, headers, now):
     }
 
 
+def _claim_content_type(num_messages, expires):
+    """Content type of a claim object.
+
+    The number of messages claimed, and when the claim expires, are
+    kept in parameters of the content type so that they show up in
+    container listings, for counting claimed messages without fetching
+    every claim.
+    """
+    return 'application/json; count=%d; expires=%d' % (num_messages,
+                                                       expires)
+
+
+def _claimed_count(obj, now):
+    """Number of messages claimed by a claim, from its listing entry.
+
+    :returns: The number of messages, or 0 if the claim has expired or
+        does not record it
+    """
+    params = dict(param.strip().split('=', 1)
+                  for param in obj['content_type'].split(';')[1:]
+                  if '=' in param)
+    try:
+        if int(params['expires']) <= now:
+            return 0
+        return int(params['count'])
+    except (KeyError, ValueError):
+        return 0
+
+
+def _listing_timestamp(obj):
+    """UNIX timestamp of the last modification of a listed object."""
+    modified = timeutils.normalize_time(
+        timeutils.parse_isotime(obj['last_modified']))
+    return (calendar.timegm(modified.timetuple()) +
+            modified.microsecond / 1000000.0)
+
+
 def _subscription_to_json(sub, headers):
     sub = jsonutils.loads(sub)
     now = timeutils.utcnow_ts(True)
@@ -73,50 +114,86 @@ def _subscription_to_json(sub, headers):
             'confirmed': sub['confirmed']}
 
 
+def _map_concurrently(executor, func, items):
+    """Calls a function for each item, using the threads of an executor.
+
+    :returns: List of the values returned by `func`, in the same order
+        as the items
+    :raises Exception: The first exception raised by `func`, once all
+        the calls have completed
+    """
+    futures = [executor.submit(func, item) for item in items]
+    waiters.wait_for_all(futures)
+    return [future.result() for future in futures]
+
+
 def _filter_messages(messages, filters, marker, get_object, list_objects,
-                     limit):
+                     limit, executor):
     """Create a filtering iterator over a list of messages.
 
     The function accepts a list of filters to be filtered
     before the the message can be included as a part of the reply.
+
+    The objects of each page of messages are fetched concurrently by
+    the threads of `executor`, ahead of being filtered in order. No
+    more objects are fetched at a time than there are messages left
+    to return, so that no more objects are fetched overall than when
+    fetching them one at a time.
     """
     now = timeutils.utcnow_ts(True)
 
-    for msg in messages:
-        if msg is None:
-            continue
+    names = collections.deque(msg['name'] for msg in messages
+                              if msg is not None)
+    fetches = collections.deque()
 
-        marker['next'] = msg['name']
-        try:
-            headers, obj = get_object(msg['name'])
-        except swiftclient.ClientException as exc:
-            if exc.http_status == 404:
-                continue
-            raise
-        obj = jsonutils.loads(obj)
-        for should_skip in filters:
-            if should_skip(obj, headers):
-                break
-        else:
-            limit -= 1
-            yield {
-                'id': marker['next'],
-                'ttl': obj['ttl'],
-                'client_uuid': headers['x-object-meta-clientid'],
-                'body': obj['body'],
-                'age': now - float(headers['x-timestamp']),
-                'claim_id': obj['claim_id'],
-                'claim_count': obj.get('claim_count', 0),
-            }
-            if limit <= 0:
+    try:
+        while True:
+            # NOTE: Every object skipped makes room for another fetch.
+            while names and len(fetches) < limit:
+                name = names.popleft()
+                fetches.append((name, executor.submit(get_object, name)))
+
+            if not fetches:
                 break
+
+            name, fetch = fetches.popleft()
+            marker['next'] = name
+            try:
+                headers, obj = fetch.result()
+            except swiftclient.ClientException as exc:
+                if exc.http_status == 404:
+                    continue
+                raise
+            obj = jsonutils.loads(obj)
+            for should_skip in filters:
+                if should_skip(obj, headers):
+                    break
+            else:
+                limit -= 1
+                yield {
+                    'id': marker['next'],
+                    'ttl': obj['ttl'],
+                    'client_uuid': headers['x-object-meta-clientid'],
+                    'body': obj['body'],
+                    'age': now - float(headers['x-timestamp']),
+                    'claim_id': obj['claim_id'],
+                    'claim_count': obj.get('claim_count', 0),
+                }
+                if limit <= 0:
+                    break
+    finally:
+        # NOTE: Objects past the point where the caller stopped
+        # iterating are not needed.
+        for _, fetch in fetches:
+            fetch.cancel()
+
     if limit > 0 and marker:
         # We haven't reached the limit, let's try to get some more messages
         _, objects = list_objects(marker=marker['next'])
         if not objects:
             return
         for msg in _filter_messages(objects, filters, marker, get_object,
-                                    list_objects, limit):
+                                    list_objects, limit, executor):
             yield msg
 
 
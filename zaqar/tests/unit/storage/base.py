@@ -18,6 +18,7 @@ import collections
 import datetime
 import math
 import random
+import threading
 import time
 import uuid
 
@@ -479,6 +480,61 @@ class MessageControllerTest(ControllerBaseTest):
         load_messages(5, self.queue_name, echo=True, project=self.project,
                       marker=next(interaction), client_uuid=client_uuid)
 
+    def test_list_projection(self):
+        ids = self.controller.post(self.queue_name,
+                                   [{'ttl': 120, 'body': n} for n in range(3)],
+                                   project=self.project,
+                                   client_uuid=uuid.uuid4())
+
+        def list_messages(projection):
+            interaction = self.controller.list(self.queue_name,
+                                               project=self.project,
+                                               echo=True,
+                                               projection=projection)
+            msgs = list(next(interaction))
+            self.assertEqual(sorted(ids), sorted(m['id'] for m in msgs))
+            return msgs, next(interaction)
+
+        full, marker = list_messages(storage.MESSAGE_PROJECTION_FULL)
+        for message in full:
+            self.assertIn('body', message)
+            self.assertIn('ttl', message)
+
+        metadata, metadata_marker = list_messages(
+            storage.MESSAGE_PROJECTION_METADATA)
+        self.assertEqual(marker, metadata_marker)
+        for message in metadata:
+            self.assertNotIn('body', message)
+            self.assertIn('ttl', message)
+
+        msg_ids, ids_marker = list_messages(storage.MESSAGE_PROJECTION_IDS)
+        self.assertEqual(marker, ids_marker)
+        for message in msg_ids:
+            self.assertEqual({'id'}, set(message))
+
+    def test_long_poll(self):
+        def list_messages():
+            interaction = self.controller.list(self.queue_name,
+                                               project=self.project,
+                                               echo=True)
+            return list(next(interaction))
+
+        self.assertEqual([], self.controller.long_poll(
+            self.queue_name, list_messages, project=self.project))
+
+        post = threading.Timer(0.2, _insert_fixtures,
+                               (self.controller, self.queue_name),
+                               {'project': self.project, 'num': 2,
+                                'client_uuid': uuid.uuid4()})
+        post.start()
+        self.addCleanup(post.join)
+
+        start = time.time()
+        msgs = self.controller.long_poll(self.queue_name, list_messages,
+                                         project=self.project, timeout=10)
+        self.assertEqual(2, len(msgs))
+        self.assertLess(time.time() - start, 10)
+
     def test_multi_ids(self):
         messages_in = [{'ttl': 120, 'body': 0}, {'ttl': 240, 'body': 1}]
         ids = self.controller.post(self.queue_name, messages_in,
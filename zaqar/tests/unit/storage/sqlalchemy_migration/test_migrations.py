@@ -165,6 +165,10 @@ class ZaqarMigrationsCheckers(object):
         # currently, 005 is just a placeholder
         pass
 
+    def _check_006(self, engine, data):
+        self.assertColumnsExist(engine, 'Versions', ['name', 'version'])
+        self.assertColumnCount(engine, 'Versions', ['name', 'version'])
+
 
 class TestMigrationsMySQL(ZaqarMigrationsCheckers,
                           base.BaseWalkMigrationTestCase,
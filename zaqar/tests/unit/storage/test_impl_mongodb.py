@@ -15,9 +15,11 @@
 
 import collections
 import datetime
+import threading
 import time
 import uuid
 
+import futurist
 import mock
 from oslo_utils import timeutils
 from pymongo import cursor
@@ -31,7 +33,9 @@ from zaqar import storage
 from zaqar.storage import errors
 from zaqar.storage import mongodb
 from zaqar.storage.mongodb import controllers
+from zaqar.storage.mongodb import messages
 from zaqar.storage.mongodb import options
+from zaqar.storage.mongodb import repartition
 from zaqar.storage.mongodb import utils
 from zaqar.storage import pooling
 from zaqar import tests as testing
@@ -143,6 +147,30 @@ class MongodbUtilsTest(MongodbSetupMixin, testing.TestBase):
 
         self.assertEqual([self.mongodb_conf.max_reconnect_attempts], num_calls)
 
+    def test_fan_out(self):
+        threads = set()
+
+        def square(n):
+            threads.add(threading.current_thread().ident)
+            return n * n
+
+        self.assertEqual([0, 1, 4, 9], utils.fan_out(square, range(4)))
+        self.assertEqual({threading.current_thread().ident}, threads)
+
+        executor = futurist.ThreadPoolExecutor(max_workers=3)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual([0, 1, 4, 9],
+                         utils.fan_out(square, range(4), executor))
+        self.assertEqual([], utils.fan_out(square, [], executor))
+
+        def fail(n):
+            if n == 2:
+                raise pymongo.errors.OperationFailure('boom')
+            return n
+
+        self.assertRaises(pymongo.errors.OperationFailure,
+                          utils.fan_out, fail, range(4), executor)
+
 
 @testing.requires_mongodb
 class MongodbDriverTest(MongodbSetupMixin, testing.TestBase):
@@ -166,6 +194,24 @@ class MongodbDriverTest(MongodbSetupMixin, testing.TestBase):
             self.assertThat(db.name, matchers.StartsWith(
                 data.mongodb_conf.database))
 
+    def test_executor(self):
+        self.config(unreliable=True)
+        cache = oslo_cache.get_cache(self.conf)
+        control = mongodb.ControlDriver(self.conf, cache)
+        data = mongodb.DataDriver(self.conf, cache, control)
+
+        executor = data.executor
+        self.assertIs(executor, data.executor)
+
+        with mock.patch.object(executor, 'shutdown') as shutdown:
+            data.close()
+        shutdown.assert_called_once_with(wait=False)
+        executor.shutdown()
+
+        self.config(options.MESSAGE_MONGODB_GROUP, partition_workers=1)
+        data = mongodb.DataDriver(self.conf, cache, control)
+        self.assertIsNone(data.executor)
+
     def test_version_match(self):
         self.config(unreliable=True)
         cache = oslo_cache.get_cache(self.conf)
@@ -301,6 +347,30 @@ class MongodbMessageTests(MongodbSetupMixin, base.MessageControllerTest):
             self.assertIn('queue_marker', indexes)
             self.assertIn('counting', indexes)
 
+    def test_index_checks(self):
+        num_partitions = len(self.controller._collections)
+
+        with mock.patch.object(self.controller, '_ensure_indexes') as create:
+            self.assertEqual(0, self.controller._check_indexes())
+            self.assertFalse(create.called)
+
+            self.assertEqual(num_partitions,
+                             self.controller._check_indexes(force=True))
+            self.assertEqual(num_partitions, create.call_count)
+
+        # NOTE: Indexes dropped by hand get created again, as well as
+        # the ones of the stats collections.
+        collection = self.controller._collections[0]
+        collection.drop_index('active')
+        self.controller._collections[-1].stats.drop_indexes()
+        self.assertEqual(min(2, num_partitions),
+                         self.controller._check_indexes())
+
+        for collection in self.controller._collections:
+            self.assertIn('active', collection.index_information())
+            self.assertIn('queue', collection.stats.index_information())
+        self.assertEqual(0, self.controller._check_indexes())
+
     def test_message_counter(self):
         queue_name = self.queue_name
         iterations = 10
@@ -368,6 +438,360 @@ class MongodbMessageTests(MongodbSetupMixin, base.MessageControllerTest):
 
         timeutils.clear_time_override()
 
+    def test_duplicate_stats_are_merged(self):
+        collection = self.controller._collection(self.queue_name,
+                                                 self.project)
+        scope = utils.scope_queue_name(self.queue_name, self.project)
+
+        # NOTE: Documents created by concurrent first posts, before the
+        # stats index was unique.
+        collection.stats.drop_indexes()
+        collection.stats.insert_many([
+            {'p_q': scope, 'c': {'v': 3, 't': 0}},
+            {'p_q': scope, 'c': {'v': 7, 't': 0}},
+            {'p_q': scope, messages.REPARTITION_PENDING: True},
+            {'p_q': scope + '-other', 'c': {'v': 1, 't': 0}},
+        ])
+
+        self.controller._ensure_indexes(collection)
+
+        docs = list(collection.stats.find({'p_q': scope}))
+        self.assertEqual(1, len(docs))
+        self.assertEqual(7, docs[0]['c']['v'])
+        self.assertTrue(docs[0][messages.REPARTITION_PENDING])
+        self.assertEqual(1, collection.stats.find(
+            {'p_q': scope + '-other'}).count())
+
+    def test_message_counter_concurrent_upsert(self):
+        m = mock.MagicMock(controllers.QueueController)
+        self.controller._queue_ctrl = m
+        del self.controller._queue_ctrl._get_counter
+        del self.controller._queue_ctrl._inc_counter
+
+        stats = self.controller._collection(self.queue_name,
+                                            self.project).stats
+        find_one_and_update = type(stats).find_one_and_update
+        raised = []
+
+        # NOTE: Another request creates the stats document of the queue
+        # right before each of these do.
+        def upsert_conflict(collection, *args, **kwargs):
+            if len(raised) < 2:
+                raised.append(True)
+                raise pymongo.errors.DuplicateKeyError('E11000')
+            return find_one_and_update(collection, *args, **kwargs)
+
+        with mock.patch.object(type(stats), 'find_one_and_update',
+                               autospec=True,
+                               side_effect=upsert_conflict):
+            self.assertEqual(0, self.controller._get_counter(
+                self.queue_name, self.project))
+            self.assertEqual(1, self.controller._inc_counter(
+                self.queue_name, self.project))
+
+        self.assertEqual(2, len(raised))
+
+    @mock.patch('oslo_context.context.get_current')
+    def test_stats_cache(self, get_current):
+        self.config(options.MESSAGE_MONGODB_GROUP, stats_cache_ttl=60)
+        get_current.return_value = None
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        queue_name = self.queue_name
+
+        base._insert_fixtures(self.controller, queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=2)
+        stats = self.queue_controller.stats(queue_name, project=self.project)
+        self.assertEqual(2, stats['messages']['total'])
+        self.assertIn('oldest', stats['messages'])
+
+        base._insert_fixtures(self.controller, queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=3)
+        stats = self.queue_controller.stats(queue_name, project=self.project)
+        self.assertEqual(2, stats['messages']['total'])
+
+        # NOTE: Strongly consistent requests get exact counts
+        get_current.return_value = mock.Mock(consistent_reads=True)
+        stats = self.queue_controller.stats(queue_name, project=self.project)
+        self.assertEqual(5, stats['messages']['total'])
+        get_current.return_value = None
+
+        base._insert_fixtures(self.controller, queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=1)
+
+        # NOTE: The garbage collector only refreshes stale summaries
+        self.driver.gc()
+        stats = self.queue_controller.stats(queue_name, project=self.project)
+        self.assertEqual(5, stats['messages']['total'])
+
+        timeutils.advance_time_delta(datetime.timedelta(seconds=60))
+
+        self.driver.gc()
+        with mock.patch.object(self.driver.message_controller,
+                               '_count') as count:
+            stats = self.queue_controller.stats(queue_name,
+                                                project=self.project)
+            self.assertFalse(count.called)
+
+        self.assertEqual(6, stats['messages']['total'])
+        self.assertEqual(6, stats['messages']['free'])
+
+    def test_stats_summary_concurrent_upsert(self):
+        base._insert_fixtures(self.controller, self.queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=2)
+
+        stats = self.controller._collection(self.queue_name,
+                                            self.project).stats
+        update_one = type(stats).update_one
+        raised = []
+
+        # NOTE: Another request creates the stats document of the queue
+        # right before this one does.
+        def upsert_conflict(collection, *args, **kwargs):
+            if not raised:
+                raised.append(True)
+                raise pymongo.errors.DuplicateKeyError('E11000')
+            return update_one(collection, *args, **kwargs)
+
+        with mock.patch.object(type(stats), 'update_one', autospec=True,
+                               side_effect=upsert_conflict):
+            summary = self.controller._refresh_stats_summary(
+                self.queue_name, self.project)
+
+        self.assertEqual([True], raised)
+        self.assertEqual(summary, self.controller._get_stats_summary(
+            self.queue_name, self.project))
+
+    def test_drain_project(self):
+        client_uuid = uuid.uuid4()
+        queues = ['drain-%d' % n for n in range(4)]
+        for queue_name in queues:
+            self.queue_controller.create(queue_name, project=self.project)
+            base._insert_fixtures(self.controller, queue_name,
+                                  project=self.project,
+                                  client_uuid=client_uuid, num=3)
+
+        self.queue_controller.create('drain-other', project='other-project')
+        base._insert_fixtures(self.controller, 'drain-other',
+                              project='other-project',
+                              client_uuid=client_uuid, num=2)
+
+        self.assertEqual(12, self.driver.drain(self.project))
+
+        for queue_name in queues:
+            self.assertTrue(self.queue_controller.exists(queue_name,
+                                                         self.project))
+            stats = self.queue_controller.stats(queue_name,
+                                                project=self.project)
+            self.assertEqual(0, stats['messages']['total'])
+
+        stats = self.queue_controller.stats('drain-other',
+                                            project='other-project')
+        self.assertEqual(2, stats['messages']['total'])
+
+        timings = self.driver._health()['partition_operations']
+        self.assertEqual(self.controller._num_partitions,
+                         timings['drain']['partitions'])
+        self.assertIn('message_volume', timings)
+
+    @mock.patch.object(repartition, 'SETTLE_SECONDS', 0)
+    def test_repartition(self):
+        # NOTE: Keep the message counters in the stats collections of
+        # the partitions, as when the control plane is not MongoDB.
+        queue_ctrl = mock.MagicMock(controllers.QueueController)
+        del queue_ctrl._get_counter
+        del queue_ctrl._inc_counter
+        self.controller._queue_ctrl = queue_ctrl
+
+        client_uuid = uuid.uuid4()
+        queues = ['repartition-%d' % n for n in range(8)]
+        for queue_name in queues:
+            self.queue_controller.create(queue_name, project=self.project)
+            base._insert_fixtures(self.controller, queue_name,
+                                  project=self.project,
+                                  client_uuid=client_uuid, num=3)
+
+        previous = self.controller._num_partitions
+        target = previous * 2
+        moving = [q for q in queues
+                  if (utils.get_partition(previous, q, self.project) !=
+                      utils.get_partition(target, q, self.project))]
+        self.assertNotEqual([], moving)
+
+        self.assertEqual(len(moving),
+                         repartition.prepare(self.controller, target))
+
+        self.config(options.MESSAGE_MONGODB_GROUP, partitions=target,
+                    previous_partitions=previous)
+
+        # NOTE: Replace the driver so that the databases of the new
+        # partitions get dropped too.
+        self.driver = mongodb.DataDriver(self.conf, self.driver.cache,
+                                         self.control)
+        controller = self.driver.message_controller
+        controller._queue_ctrl = queue_ctrl
+
+        def count_messages():
+            return dict((q, len(list(next(controller.list(
+                q, project=self.project, echo=True))))) for q in queues)
+
+        # NOTE: Queues keep using their previous partition until moved
+        self.assertEqual(dict.fromkeys(queues, 3), count_messages())
+        counters = dict((q, controller._get_counter(q, self.project))
+                        for q in queues)
+
+        throttle = repartition.Throttle(0)
+        self.assertEqual((len(moving), len(moving) * 3),
+                         repartition.migrate(controller, throttle))
+        self.assertEqual(dict.fromkeys(queues, 3), count_messages())
+
+        for queue_name in moving:
+            old = utils.get_partition(previous, queue_name, self.project)
+            query = {'p_q': utils.scope_queue_name(queue_name, self.project)}
+            self.assertIsNone(controller._collections[old].find_one(query))
+
+        # NOTE: The message counters carry on in the new partitions, so
+        # that new messages get markers past the ones of the messages
+        # moved.
+        for queue_name in queues:
+            base._insert_fixtures(controller, queue_name,
+                                  project=self.project,
+                                  client_uuid=client_uuid, num=2)
+            self.assertEqual(counters[queue_name] + 2,
+                             controller._get_counter(queue_name,
+                                                     self.project))
+        self.assertEqual(dict.fromkeys(queues, 5), count_messages())
+
+        # NOTE: Nothing left to move, and running again is harmless
+        self.assertEqual((0, 0), repartition.cutover(controller, throttle))
+        self.assertEqual((0, 0), repartition.migrate(controller, throttle))
+
+    @mock.patch.object(repartition, 'SETTLE_SECONDS', 0)
+    def test_repartition_deleted_messages(self):
+        client_uuid = uuid.uuid4()
+        queues = ['repartition-%d' % n for n in range(8)]
+        for queue_name in queues:
+            self.queue_controller.create(queue_name, project=self.project)
+            base._insert_fixtures(self.controller, queue_name,
+                                  project=self.project,
+                                  client_uuid=client_uuid, num=3)
+
+        previous = self.controller._num_partitions
+        target = previous * 2
+        moving = [q for q in queues
+                  if (utils.get_partition(previous, q, self.project) !=
+                      utils.get_partition(target, q, self.project))]
+        repartition.prepare(self.controller, target)
+
+        self.config(options.MESSAGE_MONGODB_GROUP, partitions=target,
+                    previous_partitions=previous)
+        self.driver = mongodb.DataDriver(self.conf, self.driver.cache,
+                                         self.control)
+        controller = self.driver.message_controller
+
+        def list_ids(queue_name):
+            return [msg['id'] for msg in next(controller.list(
+                queue_name, project=self.project, echo=True))]
+
+        # NOTE: Delete a message of each queue before it is moved, and
+        # another one once its messages have been read to be moved but
+        # not copied yet.
+        deleted = []
+        for queue_name in moving:
+            msg_id = list_ids(queue_name)[0]
+            controller.delete(queue_name, msg_id, project=self.project)
+            deleted.append(msg_id)
+
+        insert_missing = utils.insert_missing
+
+        def delete_then_insert(collection, docs):
+            doc = docs[-1]
+            queue_name = utils.descope_queue_name(doc['p_q'])
+            controller.delete(queue_name, str(doc['_id']),
+                              project=self.project)
+            deleted.append(str(doc['_id']))
+            return insert_missing(collection, docs)
+
+        throttle = repartition.Throttle(0)
+        with mock.patch.object(utils, 'insert_missing',
+                               side_effect=delete_then_insert):
+            num_queues, _ = repartition.migrate(controller, throttle)
+        self.assertEqual(len(moving), num_queues)
+
+        for queue_name in queues:
+            ids = list_ids(queue_name)
+            self.assertEqual(1 if queue_name in moving else 3, len(ids))
+            self.assertEqual([], [i for i in ids if i in deleted])
+
+    def test_long_poll_wakeups(self):
+        self.config(options.MESSAGE_MONGODB_GROUP, long_poll_wakeups=True)
+        controller = self.controller_class(self.driver)
+        self.assertNotEqual({}, controller._wakeup_listeners)
+
+        listener = controller._wakeup_listener(self.queue_name,
+                                               self.project)
+        func = mock.Mock(side_effect=[[], [], ['message']])
+
+        with mock.patch.object(listener, 'watch') as watch:
+            posted = watch.return_value.__enter__.return_value
+            self.assertEqual(['message'], controller.long_poll(
+                self.queue_name, func, project=self.project, timeout=10))
+
+        self.assertEqual(3, func.call_count)
+        self.assertEqual(2, posted.wait.call_count)
+
+        with mock.patch.object(listener, 'notify') as notify:
+            base._insert_fixtures(controller, self.queue_name,
+                                  project=self.project,
+                                  client_uuid=uuid.uuid4(), num=1)
+
+        notify.assert_called_once_with(
+            utils.scope_queue_name(self.queue_name, self.project))
+
+
+@testing.requires_mongodb
+class MongodbMarkerBlockMessageTests(MongodbSetupMixin,
+                                     base.MessageControllerTest):
+
+    driver_class = mongodb.DataDriver
+    config_file = 'wsgi_mongodb.conf'
+    controller_class = controllers.MessageController
+    control_driver_class = mongodb.ControlDriver
+
+    # NOTE(kgriffs): MongoDB's TTL scavenger only runs once a minute
+    gc_interval = 60
+
+    def _prepare_conf(self):
+        super(MongodbMarkerBlockMessageTests, self)._prepare_conf()
+        self.config(options.MESSAGE_MONGODB_GROUP, marker_block_size=10)
+
+    def test_marker_blocks(self):
+        queue_name = self.queue_name
+
+        with mock.patch.object(self.controller, '_inc_counter',
+                               wraps=self.controller._inc_counter) as inc:
+            for i in range(4):
+                self.controller.post(queue_name, [{'ttl': 60}] * 3,
+                                     'uuid', project=self.project)
+
+            # NOTE: 3 posts fit in the first block of 10 markers
+            self.assertEqual(2, inc.call_count)
+
+            # NOTE: Posts larger than a block get a block of their own
+            self.controller.post(queue_name, [{'ttl': 60}] * 12,
+                                 'uuid', project=self.project)
+            self.assertEqual(3, inc.call_count)
+
+        collection = self.controller._collection(queue_name, self.project)
+        markers = [msg['k'] for msg in collection.find(sort=[('_id', 1)])]
+        self.assertEqual(24, len(set(markers)))
+        self.assertEqual(sorted(markers), markers)
+
 
 @testing.requires_mongodb
 class MongodbFIFOMessageTests(MongodbSetupMixin, base.MessageControllerTest):
@@ -448,6 +872,45 @@ class MongodbFIFOMessageTests(MongodbSetupMixin, base.MessageControllerTest):
 
         self.assertEqual(expected_ids, actual_ids)
 
+        stats = self.controller._post_stats
+        self.assertEqual(2, stats['posts'])
+        self.assertEqual(1, stats['failures'])
+        self.assertEqual(stats['attempts'] - 2, stats['conflicts'])
+
+    def test_concurrent_posts(self):
+        client_uuid = uuid.uuid4()
+        num_posts = 8
+
+        def post(n):
+            self.controller.post(self.queue_name,
+                                 [{'ttl': 60, 'body': [n, 0]},
+                                  {'ttl': 60, 'body': [n, 1]}],
+                                 client_uuid, project=self.project)
+
+        threads = [threading.Thread(target=post, args=(n,))
+                   for n in range(num_posts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # NOTE: Posts made by the same process never conflict
+        self.assertEqual({'posts': num_posts, 'attempts': num_posts,
+                          'conflicts': 0, 'failures': 0},
+                         self.controller._post_stats)
+
+        interaction = self.controller.list(self.queue_name,
+                                           project=self.project, echo=True,
+                                           limit=num_posts * 2)
+        bodies = [m['body'] for m in next(interaction)]
+        self.assertEqual(num_posts * 2, len(bodies))
+
+        # NOTE: The messages of each post are kept together
+        for first, second in zip(bodies[::2], bodies[1::2]):
+            self.assertEqual(first[0], second[0])
+
+        self.assertEqual({}, self.controller._post_locks._locks)
+
 
 @testing.requires_mongodb
 class MongodbClaimTests(MongodbSetupMixin, base.ClaimControllerTest):
@@ -484,6 +947,107 @@ class MongodbClaimTests(MongodbSetupMixin, base.ClaimControllerTest):
                           claim_id, {'ttl': 1, 'grace': 0},
                           project=self.project)
 
+    def test_dead_letter_queue_bulk(self):
+        dlq_name = 'DLQ'
+        self.queue_controller.create(dlq_name, project=self.project)
+        self.queue_controller.set_metadata(self.queue_name,
+                                           {'_max_claim_count': 1,
+                                            '_dead_letter_queue': dlq_name},
+                                           project=self.project)
+        base._insert_fixtures(self.message_controller, self.queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=3)
+
+        collection = self.message_controller._collection(self.queue_name,
+                                                         self.project)
+        with mock.patch.object(collection, 'bulk_write',
+                               wraps=collection.bulk_write) as bulk_write:
+            claim_id, messages = self.controller.create(
+                self.queue_name, {'ttl': 1, 'grace': 0},
+                project=self.project)
+            self.assertEqual(3, len(list(messages)))
+            self.assertEqual(1, bulk_write.call_count)
+
+        time.sleep(1)
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 0},
+                                                    project=self.project)
+        self.assertIsNone(claim_id)
+
+        dlq_messages = self.message_controller.list(dlq_name,
+                                                    project=self.project,
+                                                    include_claimed=True)
+        self.assertEqual(3, len(list(next(dlq_messages))))
+
+        stats = self.queue_controller.stats(self.queue_name,
+                                            project=self.project)
+        self.assertEqual(0, stats['messages']['total'])
+
+    def test_dead_letter_queue_move_across_partitions(self):
+        msg_ctrl = self.message_controller
+        collection = msg_ctrl._collection(self.queue_name, self.project)
+        dlq_name = next(name for name in ('DLQ-%d' % i for i in range(100))
+                        if msg_ctrl._collection(name, self.project) !=
+                        collection)
+        dlq_collection = msg_ctrl._collection(dlq_name, self.project)
+        self.queue_controller.create(dlq_name, project=self.project)
+        base._insert_fixtures(msg_ctrl, self.queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=3)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 0},
+                                                    project=self.project)
+        oid = utils.to_oid(claim_id)
+        ids = [utils.to_oid(msg['id']) for msg in messages]
+
+        # NOTE: The first message was copied by an interrupted attempt,
+        # and the last one was taken by another claim in the meantime.
+        dlq_collection.insert_one(collection.find_one({'_id': ids[0]}))
+        taken = collection.find_one({'_id': ids[2]})['c']
+        taken['id'] = utils.to_oid('0' * 23 + '1')
+        collection.update_one({'_id': ids[2]}, {'$set': {'c': taken}})
+
+        queue_meta = {'_max_claim_count': 0,
+                      '_dead_letter_queue': dlq_name}
+        num_moved = self.controller._update_claim_counts(
+            collection, self.project, oid, [(_id, 0) for _id in ids],
+            queue_meta)
+        self.assertEqual(2, num_moved)
+
+        self.assertEqual(2, dlq_collection.find(
+            {'_id': {'$in': ids}}).count())
+        self.assertEqual([ids[2]], [msg['_id'] for msg in collection.find(
+            {'_id': {'$in': ids}})])
+
+
+@testing.requires_mongodb
+class MongodbAtomicClaimTests(MongodbClaimTests):
+
+    def _prepare_conf(self):
+        super(MongodbAtomicClaimTests, self)._prepare_conf()
+        self.config(options.MESSAGE_MONGODB_GROUP, claim_strategy='atomic')
+
+    def test_claims_do_not_overlap(self):
+        base._insert_fixtures(self.message_controller, self.queue_name,
+                              project=self.project, client_uuid=uuid.uuid4(),
+                              num=12)
+
+        meta = {'ttl': 60, 'grace': 10}
+        claimed = set()
+        for _ in range(3):
+            claim_id, messages = self.controller.create(self.queue_name, meta,
+                                                        project=self.project,
+                                                        limit=5)
+            claimed.update(msg['id'] for msg in messages)
+
+        # NOTE: The last claim only gets the 2 messages left
+        self.assertEqual(12, len(claimed))
+
+        claim_id, messages = self.controller.create(self.queue_name, meta,
+                                                    project=self.project)
+        self.assertIsNone(claim_id)
+
 
 @testing.requires_mongodb
 class MongodbSubscriptionTests(MongodbSetupMixin,
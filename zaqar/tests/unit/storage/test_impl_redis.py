@@ -25,9 +25,13 @@ from zaqar.common import cache as oslo_cache
 from zaqar.common import errors
 from zaqar import storage
 from zaqar.storage import mongodb
+from zaqar.storage.redis import claims
 from zaqar.storage.redis import controllers
 from zaqar.storage.redis import driver
+from zaqar.storage.redis import expiry
 from zaqar.storage.redis import messages
+from zaqar.storage.redis import migration
+from zaqar.storage.redis import models
 from zaqar.storage.redis import options
 from zaqar.storage.redis import utils
 from zaqar import tests as testing
@@ -84,14 +88,21 @@ class RedisUtilsTest(testing.TestBase):
         self.assertEqual('123.', utils.scope_queue_name(None, '123'))
 
     def test_scope_messages_set(self):
-        self.assertEqual('.my-q.', utils.scope_message_ids_set('my-q'))
-        self.assertEqual('p.my-q.', utils.scope_message_ids_set('my-q', 'p'))
-        self.assertEqual('p.my-q.s',
+        self.assertEqual('{.my-q}.', utils.scope_message_ids_set('my-q'))
+        self.assertEqual('{p.my-q}.',
+                         utils.scope_message_ids_set('my-q', 'p'))
+        self.assertEqual('{p.my-q}.s',
                          utils.scope_message_ids_set('my-q', 'p', 's'))
 
-        self.assertEqual('..', utils.scope_message_ids_set(None))
-        self.assertEqual('123..', utils.scope_message_ids_set(None, '123'))
-        self.assertEqual('..s', utils.scope_message_ids_set(None, None, 's'))
+        self.assertEqual('{.}.', utils.scope_message_ids_set(None))
+        self.assertEqual('{123.}.', utils.scope_message_ids_set(None, '123'))
+        self.assertEqual('{.}.s', utils.scope_message_ids_set(None, None, 's'))
+
+    def test_message_key(self):
+        self.assertEqual('{p.my-q}.abc',
+                         utils.message_key('my-q', 'p', 'abc'))
+        self.assertEqual(['{.my-q}.a', '{.my-q}.b'],
+                         utils.message_keys('my-q', None, ['a', 'b']))
 
     def test_descope_messages_set(self):
         key = utils.scope_message_ids_set('my-q')
@@ -154,6 +165,33 @@ class RedisUtilsTest(testing.TestBase):
         self.assertEqual(body, basic_msg['body'])
         self.assertEqual(msg.ttl, basic_msg['ttl'])
 
+    def test_compact_message_round_trip(self):
+        now = timeutils.utcnow_ts()
+        body = {'text': u'ab\u00e7' * 100}
+
+        for compact, threshold in ((False, 0), (True, 0), (True, 64)):
+            msg = _create_sample_message(now=now, claimed=True, body=body)
+            msg.compact = compact
+
+            pipe = mock.Mock()
+            msg.to_redis(pipe, 'key', compression_threshold=threshold)
+            # NOTE: Simulate redis-py converting the values to bytes
+            hmap = dict((k.encode(), v if isinstance(v, bytes)
+                         else str(v).encode())
+                        for k, v in pipe.hmset.call_args[0][1].items())
+
+            self.assertEqual(compact, b'm' in hmap)
+            self.assertEqual(threshold > 0,
+                             hmap[b'b'].startswith(models.BODY_ZLIB))
+
+            restored = models.Message.from_hmap(hmap)
+            self.assertEqual(compact, restored.compact)
+            self.assertEqual(msg.id, restored.id)
+            self.assertEqual(str(msg.client_uuid), restored.client_uuid)
+            self.assertEqual(msg.created, restored.created)
+            self.assertEqual(str(msg.claim_id), restored.claim_id)
+            self.assertEqual(body, restored.body)
+
     def test_retries_on_connection_error(self):
         num_calls = [0]
 
@@ -181,6 +219,87 @@ class RedisDriverTest(testing.TestBase):
 
         self.assertIsInstance(redis_driver.connection, redis.StrictRedis)
 
+    def test_read_connection(self):
+        oslo_cache.register_config(self.conf)
+        cache = oslo_cache.get_cache(self.conf)
+        redis_driver = driver.DataDriver(self.conf, cache,
+                                         driver.ControlDriver
+                                         (self.conf, cache))
+
+        self.assertIsNone(redis_driver.replica_connection)
+        self.assertIs(redis_driver.connection, redis_driver.read_connection)
+
+        self.config(options.MESSAGE_REDIS_GROUP, read_from_replicas=True,
+                    replica_uris=['redis://example.com:6380'])
+        redis_driver = driver.DataDriver(self.conf, cache,
+                                         driver.ControlDriver
+                                         (self.conf, cache))
+
+        replica = redis_driver.replica_connection
+        self.assertEqual(6380,
+                         replica.connection_pool.connection_kwargs['port'])
+        self.assertIs(replica, redis_driver.read_connection)
+
+        # NOTE: Requests asking for strong consistency read from the master
+        ctxt = mock.Mock(consistent_reads=True)
+        with mock.patch.object(driver.context, 'get_current',
+                               return_value=ctxt):
+            self.assertIs(redis_driver.connection,
+                          redis_driver.read_connection)
+
+            ctxt.consistent_reads = False
+            self.assertIs(replica, redis_driver.read_connection)
+
+    def test_read_from_replicas_invalid(self):
+        oslo_cache.register_config(self.conf)
+        cache = oslo_cache.get_cache(self.conf)
+        redis_driver = driver.DataDriver(self.conf, cache,
+                                         driver.ControlDriver
+                                         (self.conf, cache))
+
+        # NOTE: A single Redis server has no replicas to discover
+        self.config(options.MESSAGE_REDIS_GROUP, read_from_replicas=True)
+        self.assertRaises(errors.ConfigurationError,
+                          lambda: redis_driver.replica_connection)
+
+    def test_replica_status(self):
+        oslo_cache.register_config(self.conf)
+        cache = oslo_cache.get_cache(self.conf)
+        redis_driver = driver.DataDriver(self.conf, cache,
+                                         driver.ControlDriver
+                                         (self.conf, cache))
+        self.config(options.MESSAGE_REDIS_GROUP, read_from_replicas=True,
+                    replica_uris=['redis://example.com:6380'])
+
+        info = {
+            'role': 'master',
+            'connected_slaves': 1,
+            'master_repl_offset': 1500,
+            'slave0': {'ip': '10.0.0.2', 'port': 6380, 'state': 'online',
+                       'offset': 1200, 'lag': 1},
+        }
+
+        with mock.patch.object(redis_driver.connection, 'info',
+                               return_value=info):
+            replicas = redis_driver._health()['replicas']
+
+        self.assertEqual([{'host': '10.0.0.2', 'port': 6380,
+                           'state': 'online', 'offset_lag': 300,
+                           'lag': 1}], replicas)
+
+    def test_health_pool_stats(self):
+        oslo_cache.register_config(self.conf)
+        cache = oslo_cache.get_cache(self.conf)
+        redis_driver = driver.DataDriver(self.conf, cache,
+                                         driver.ControlDriver
+                                         (self.conf, cache))
+
+        redis_driver.connection.ping()
+        stats = redis_driver._health()['connection_pool']
+        self.assertGreaterEqual(stats['created'], 1)
+        self.assertEqual(0, stats['in_use'])
+        self.assertEqual(stats['created'], stats['available'])
+
     def test_version_match(self):
         oslo_cache.register_config(self.conf)
         cache = oslo_cache.get_cache(self.conf)
@@ -281,6 +400,110 @@ class RedisDriverTest(testing.TestBase):
         self.assertEqual('dumbledore', uri.master)
         self.assertEqual(0.5, uri.socket_timeout)
 
+    def test_connection_uri_pool_options(self):
+        uri = driver.ConnectionURI('redis://example.com')
+        self.assertIsNone(uri.max_connections)
+        self.assertFalse(uri.blocking)
+        self.assertEqual(20.0, uri.pool_timeout)
+        self.assertFalse(uri.socket_keepalive)
+        self.assertEqual(0, uri.health_check_interval)
+
+        uri = driver.ConnectionURI(
+            'redis://example.com?max_connections=10&blocking=true'
+            '&pool_timeout=2.5&socket_keepalive=1&health_check_interval=30')
+        self.assertEqual(10, uri.max_connections)
+        self.assertTrue(uri.blocking)
+        self.assertEqual(2.5, uri.pool_timeout)
+        self.assertTrue(uri.socket_keepalive)
+        self.assertEqual(30, uri.health_check_interval)
+
+        client = driver._get_direct_client(uri)
+        pool = client.connection_pool
+        self.assertIsInstance(pool, redis.BlockingConnectionPool)
+        self.assertEqual(10, pool.max_connections)
+        self.assertEqual(2.5, pool.timeout)
+        self.assertIs(driver._HealthCheckedConnection, pool.connection_class)
+
+        uri = driver.ConnectionURI('redis:/tmp/redis.sock?max_connections=5')
+        pool = driver._get_direct_client(uri).connection_pool
+        self.assertEqual(5, pool.max_connections)
+        self.assertEqual({'max_connections': 5, 'created': 0, 'in_use': 0,
+                          'available': 0}, driver._get_pool_stats(pool))
+
+    def test_connection_uri_pool_options_invalid(self):
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis://example.com?max_connections=many')
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis://example.com?blocking=maybe')
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis://s1?master=dumbledore&blocking=true')
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis+cluster://h1?health_check_interval=5')
+
+    def test_connection_uri_cluster(self):
+        uri = driver.ConnectionURI('redis+cluster://h1:7000,h2')
+        self.assertEqual(driver.STRATEGY_CLUSTER, uri.strategy)
+        self.assertEqual([{'host': 'h1', 'port': 7000},
+                          {'host': 'h2', 'port': 6379}], uri.startup_nodes)
+        self.assertEqual(0.1, uri.socket_timeout)
+
+        uri = driver.ConnectionURI(
+            'redis+cluster://h1:7000?socket_timeout=0.5')
+        self.assertEqual(driver.STRATEGY_CLUSTER, uri.strategy)
+        self.assertEqual(0.5, uri.socket_timeout)
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis+cluster://h1:not_an_integer')
+
+    def test_connection_uri_password_and_ssl(self):
+        uri = driver.ConnectionURI('redis://:secret@example.com:7777')
+        self.assertEqual(driver.STRATEGY_TCP, uri.strategy)
+        self.assertEqual('secret', uri.password)
+        self.assertEqual('example.com', uri.hostname)
+        self.assertFalse(uri.ssl)
+
+        uri = driver.ConnectionURI(
+            'redis+cluster://:secret@h1:7000,h2?ssl=true')
+        self.assertEqual('secret', uri.password)
+        self.assertTrue(uri.ssl)
+        self.assertEqual([{'host': 'h1', 'port': 7000},
+                          {'host': 'h2', 'port': 6379}], uri.startup_nodes)
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis:/tmp/redis.sock?ssl=true')
+
+        self.assertRaises(errors.ConfigurationError,
+                          driver.ConnectionURI,
+                          'redis://example.com?ssl=maybe')
+
+    def test_expiry_listener_cluster_node_clients(self):
+        pool = mock.Mock(connection_kwargs={'password': 'secret',
+                                            'ssl': True,
+                                            'socket_timeout': 0.5})
+        pool.nodes.all_masters.return_value = [{'host': 'h1', 'port': 7000},
+                                               {'host': 'h2', 'port': 7001}]
+        data_driver = mock.Mock()
+        data_driver.connection.connection_pool = pool
+
+        clients = expiry.ExpiryListener(data_driver)._node_clients()
+
+        self.assertEqual(2, len(clients))
+        node_pool = clients[1].connection_pool
+        self.assertEqual('h2', node_pool.connection_kwargs['host'])
+        self.assertEqual('secret', node_pool.connection_kwargs['password'])
+        self.assertEqual(0.5, node_pool.connection_kwargs['socket_timeout'])
+        self.assertIs(redis.connection.SSLConnection,
+                      node_pool.connection_class)
+
 
 @testing.requires_redis
 class RedisQueuesTest(base.QueueControllerTest):
@@ -356,6 +579,109 @@ class RedisMessagesTest(base.MessageControllerTest):
         num_removed = self.controller.gc()
         self.assertEqual(100, num_removed)
 
+    def test_gc_incremental(self):
+        self.config(options.MESSAGE_REDIS_GROUP,
+                    gc_max_keys=100, gc_max_time=0)
+
+        self.queue_controller.create(self.queue_name)
+        for _ in range(250):
+            self.controller.post(self.queue_name,
+                                 [{'ttl': 0, 'body': {}}],
+                                 client_uuid=uuidutils.generate_uuid())
+
+        num_removed = self.controller.gc(incremental=True)
+        self.assertEqual(100, num_removed)
+        self.assertTrue(self.connection.exists(messages.GC_CHECKPOINT_KEY))
+
+        num_removed = self.controller.gc(incremental=True)
+        self.assertEqual(100, num_removed)
+
+        num_removed = self.controller.gc(incremental=True)
+        self.assertEqual(50, num_removed)
+        self.assertFalse(self.connection.exists(messages.GC_CHECKPOINT_KEY))
+
+    def test_expiry_listener_removes_expired_ids(self):
+        self.queue_controller.create(self.queue_name)
+        message_ids = self.controller.post(
+            self.queue_name,
+            [{'ttl': 300, 'body': {}} for _ in range(3)],
+            client_uuid=uuidutils.generate_uuid())
+
+        # Simulate Redis expiring the message
+        message_key = utils.message_key(self.queue_name, None,
+                                        message_ids[1])
+        self.connection.delete(message_key)
+
+        listener = expiry.ExpiryListener(self.driver)
+        num_removed = listener._remove_expired([message_key,
+                                                'not-a-message'])
+        self.assertEqual(1, num_removed)
+
+        msgset_key = utils.msgset_key(self.queue_name)
+        freeset_key = utils.freeset_key(self.queue_name)
+        self.assertEqual(2, self.connection.zcard(msgset_key))
+        self.assertEqual(2, self.connection.zcard(freeset_key))
+
+    def test_migrate_legacy_keys(self):
+        self.queue_controller.create(self.queue_name)
+        message_ids = self.controller.post(
+            self.queue_name,
+            [{'ttl': 300, 'body': {'n': i}} for i in range(3)],
+            client_uuid=uuidutils.generate_uuid())
+
+        # NOTE: Simulate the key layout of older releases
+        legacy_msgset_key = '.' + self.queue_name + '.messages'
+        for suffix in migration._QUEUE_KEY_SUFFIXES:
+            key = utils.scope_queue_key(self.queue_name, None, suffix)
+            if self.connection.exists(key):
+                self.connection.rename(
+                    key, '.' + self.queue_name + '.' + suffix)
+        for message_id in message_ids:
+            self.connection.rename(
+                utils.message_key(self.queue_name, None, message_id),
+                message_id)
+        self.connection.zrem(messages.MSGSET_INDEX_KEY,
+                             utils.msgset_key(self.queue_name))
+        self.connection.zadd(messages.MSGSET_INDEX_KEY, 1, legacy_msgset_key)
+
+        num_queues, num_keys = migration.migrate(self.connection)
+        self.assertEqual(1, num_queues)
+        self.assertGreater(num_keys, 3)
+        self.assertFalse(self.connection.exists(legacy_msgset_key))
+
+        msg = self.controller.get(self.queue_name, message_ids[1])
+        self.assertEqual({'n': 1}, msg['body'])
+        self.assertEqual(3, self.controller._count(self.queue_name, None))
+
+        # Running it again is harmless
+        self.assertEqual((0, 0), migration.migrate(self.connection))
+
+    def test_pop_skips_claimed_messages(self):
+        self.queue_controller.create(self.queue_name)
+        message_ids = self.controller.post(
+            self.queue_name,
+            [{'ttl': 300, 'body': {'n': i}} for i in range(5)],
+            client_uuid=uuidutils.generate_uuid())
+
+        claim_ctrl = self.driver.claim_controller
+        claim_id, claimed = claim_ctrl.create(self.queue_name,
+                                              {'ttl': 60, 'grace': 60},
+                                              limit=2)
+
+        popped = self.controller.pop(self.queue_name, 10)
+        self.assertEqual(message_ids[2:], [msg['id'] for msg in popped])
+        self.assertEqual([{'n': i} for i in range(2, 5)],
+                         [msg['body'] for msg in popped])
+
+        # NOTE: Only the claimed messages are left, and popping did
+        # not leave any claims behind.
+        self.assertEqual(2, self.controller._count(self.queue_name, None))
+        claims_set_key = utils.scope_claims_set(self.queue_name, None,
+                                                'claims')
+        self.assertEqual([claim_id.encode()],
+                         self.connection.zrange(claims_set_key, 0, -1))
+        self.assertEqual([], self.controller.pop(self.queue_name, 10))
+
     def test_invalid_uuid(self):
         queue_name = 'invalid-uuid-test'
         msgs = [{
@@ -367,6 +693,47 @@ class RedisMessagesTest(base.MessageControllerTest):
                           client_id)
 
 
+@testing.requires_redis
+class RedisCompactMessagesTest(RedisMessagesTest):
+
+    def setUp(self):
+        super(RedisCompactMessagesTest, self).setUp()
+        self.config(options.MESSAGE_REDIS_GROUP,
+                    message_encoding='compact', compression_threshold=16)
+
+    def test_compact_encoding(self):
+        self.queue_controller.create(self.queue_name)
+        body = {'text': 'z' * 100}
+        message_ids = self.controller.post(
+            self.queue_name, [{'ttl': 300, 'body': body}],
+            client_uuid=uuidutils.generate_uuid())
+
+        hmap = self.connection.hgetall(
+            utils.message_key(self.queue_name, None, message_ids[0]))
+        self.assertNotIn(b'id', hmap)
+        self.assertTrue(hmap[b'b'].startswith(models.BODY_ZLIB))
+
+        msg = self.controller.get(self.queue_name, message_ids[0])
+        self.assertEqual(body, msg['body'])
+
+    def test_read_hash_encoding(self):
+        self.queue_controller.create(self.queue_name)
+
+        self.config(options.MESSAGE_REDIS_GROUP, message_encoding='hash')
+        hash_ids = self.controller.post(
+            self.queue_name, [{'ttl': 300, 'body': {'n': 0}}],
+            client_uuid=uuidutils.generate_uuid())
+
+        self.config(options.MESSAGE_REDIS_GROUP, message_encoding='compact')
+        compact_ids = self.controller.post(
+            self.queue_name, [{'ttl': 300, 'body': {'n': 1}}],
+            client_uuid=uuidutils.generate_uuid())
+
+        msgs = list(next(self.controller.list(self.queue_name, echo=True)))
+        self.assertEqual(hash_ids + compact_ids, [m['id'] for m in msgs])
+        self.assertEqual([{'n': 0}, {'n': 1}], [m['body'] for m in msgs])
+
+
 @testing.requires_redis
 class RedisClaimsTest(base.ClaimControllerTest):
     driver_class = driver.DataDriver
@@ -466,6 +833,216 @@ class RedisClaimsTest(base.ClaimControllerTest):
         num_removed = self.controller._gc(self.queue_name, None)
         self.assertEqual(5, num_removed)
 
+    def test_claim_uses_free_set(self):
+        for _ in range(10):
+            self.message_controller.post(self.queue_name,
+                                         [{'ttl': 300, 'body': 'yo gabba'}],
+                                         client_uuid=uuidutils.generate_uuid(),
+                                         project=self.project)
+
+        freeset_key = utils.freeset_key(self.queue_name, self.project)
+        claimedset_key = utils.claimedset_key(self.queue_name, self.project)
+        self.assertEqual(10, self.connection.zcard(freeset_key))
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project,
+                                                    limit=3)
+        self.assertEqual(3, len(list(messages)))
+        self.assertEqual(7, self.connection.zcard(freeset_key))
+        self.assertEqual(3, self.connection.zcard(claimedset_key))
+
+        # NOTE: Released messages must be claimable again
+        self.controller.delete(self.queue_name, claim_id,
+                               project=self.project)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project,
+                                                    limit=10)
+        self.assertEqual(10, len(list(messages)))
+        self.assertEqual(0, self.connection.zcard(freeset_key))
+        self.assertEqual(10, self.connection.zcard(claimedset_key))
+
+    def test_count_claimed_messages(self):
+        for _ in range(5):
+            self.message_controller.post(self.queue_name,
+                                         [{'ttl': 300, 'body': 'yo gabba'}],
+                                         client_uuid=uuidutils.generate_uuid(),
+                                         project=self.project)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project,
+                                                    limit=3)
+        self.assertEqual(3, self.controller._count_messages(self.queue_name,
+                                                            self.project))
+
+        self.controller.delete(self.queue_name, claim_id,
+                               project=self.project)
+        self.assertEqual(0, self.controller._count_messages(self.queue_name,
+                                                            self.project))
+
+        self.controller.create(self.queue_name, {'ttl': 60, 'grace': 60},
+                               project=self.project, limit=2)
+
+        # NOTE: GC must be able to recount claimed messages from scratch
+        claimedset_key = utils.claimedset_key(self.queue_name, self.project)
+        self.connection.delete(claimedset_key)
+        self.assertEqual(0, self.controller._count_messages(self.queue_name,
+                                                            self.project))
+
+        self.driver.message_controller.gc()
+        self.assertEqual(2, self.controller._count_messages(self.queue_name,
+                                                            self.project))
+
+    def test_bulk_delete_claimed_messages(self):
+        message_ids = self.message_controller.post(
+            self.queue_name,
+            [{'ttl': 300, 'body': 'yo gabba'} for _ in range(3)],
+            client_uuid=uuidutils.generate_uuid(),
+            project=self.project)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project)
+        self.assertEqual(3, len(list(messages)))
+
+        self.message_controller.bulk_delete(self.queue_name,
+                                            message_ids[:2] + ['nonexistent'],
+                                            project=self.project)
+
+        claim, messages = self.controller.get(self.queue_name, claim_id,
+                                              project=self.project)
+        self.assertEqual([message_ids[2]], [msg['id'] for msg in messages])
+        claim_key = utils.scope_queue_key(self.queue_name, self.project,
+                                          claim_id)
+        self.assertEqual(1, int(self.connection.hget(claim_key, 'n')))
+        self.assertEqual(1, self.message_controller._count(self.queue_name,
+                                                           self.project))
+
+    def _post_to_dead_letter_queue(self, dlq_name):
+        self.queue_controller.create(dlq_name, project=self.project)
+        self.queue_controller.set_metadata(self.queue_name,
+                                           {'_max_claim_count': 1,
+                                            '_dead_letter_queue': dlq_name},
+                                           project=self.project)
+        return self.message_controller.post(
+            self.queue_name, [{'ttl': 300, 'body': 'yo gabba'}],
+            client_uuid=uuidutils.generate_uuid(), project=self.project)
+
+    def test_dead_letter_queue_claimed_while_moving(self):
+        dlq_name = 'DLQ'
+        message_ids = self._post_to_dead_letter_queue(dlq_name)
+        meta = {'ttl': 60, 'grace': 60}
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.controller.create(self.queue_name, meta, project=self.project)
+        timeutils.advance_time_seconds(61)
+
+        msg_ctrl = self.driver.message_controller
+        index_messages = msg_ctrl._index_messages
+        dlq_claims = []
+
+        def index_then_claim(queue, project, message_ids):
+            index_messages(queue, project, message_ids)
+
+            # NOTE: Claim the dead letter queue as soon as the message
+            # shows up in it, before the claim that moved it returns.
+            dlq_claims.append(self.controller.create(dlq_name, meta,
+                                                     project=project))
+
+        with mock.patch.object(msg_ctrl, '_index_messages',
+                               side_effect=index_then_claim):
+            claim_id, messages = self.controller.create(
+                self.queue_name, meta, project=self.project)
+
+        self.assertIsNone(claim_id)
+        self.assertEqual(1, len(dlq_claims))
+        self.assertEqual(0, msg_ctrl._count(self.queue_name, self.project))
+        self.assertEqual(1, msg_ctrl._count(dlq_name, self.project))
+
+        # NOTE: The message is still claimed by the claim that moved it,
+        # and can be claimed from the dead letter queue once that claim
+        # expires.
+        timeutils.advance_time_seconds(61)
+        claim_id, messages = self.controller.create(dlq_name, meta,
+                                                    project=self.project)
+        self.assertEqual(message_ids, [msg['id'] for msg in messages])
+
+    def test_move_deleted_message(self):
+        dlq_name = 'DLQ'
+        message_ids = self._post_to_dead_letter_queue(dlq_name)
+        self.message_controller.delete(self.queue_name, message_ids[0],
+                                       project=self.project)
+
+        self.assertFalse(self.controller._move_message(
+            self.queue_name, dlq_name, self.project, message_ids[0], {}))
+        self.assertFalse(self.connection.exists(
+            utils.message_key(dlq_name, self.project, message_ids[0])))
+        self.assertEqual(0, self.message_controller._count(dlq_name,
+                                                           self.project))
+
+    def test_delete_claimed_messages_shrinks_claim(self):
+        message_ids = self.message_controller.post(
+            self.queue_name,
+            [{'ttl': 300, 'body': 'yo gabba'} for _ in range(3)],
+            client_uuid=uuidutils.generate_uuid(),
+            project=self.project)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project)
+        self.assertEqual(3, len(list(messages)))
+
+        claim_msgs_key = claims._claim_messages_key(self.queue_name,
+                                                    self.project, claim_id)
+        self.assertEqual(3, self.connection.llen(claim_msgs_key))
+
+        self.message_controller.delete(self.queue_name, message_ids[0],
+                                       project=self.project, claim=claim_id)
+        self.message_controller.bulk_delete(self.queue_name,
+                                            [message_ids[1]],
+                                            project=self.project)
+
+        self.assertEqual([message_ids[2].encode()],
+                         self.connection.lrange(claim_msgs_key, 0, -1))
+
+    def test_gc_indexes_untracked_messages(self):
+        for _ in range(5):
+            self.message_controller.post(self.queue_name,
+                                         [{'ttl': 300, 'body': 'yo gabba'}],
+                                         client_uuid=uuidutils.generate_uuid(),
+                                         project=self.project)
+
+        # NOTE: Simulate messages posted before the free set existed
+        freeset_key = utils.freeset_key(self.queue_name, self.project)
+        self.connection.delete(freeset_key)
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project,
+                                                    limit=10)
+        self.assertEqual(0, len(list(messages)))
+
+        self.message_controller.gc()
+
+        claim_id, messages = self.controller.create(self.queue_name,
+                                                    {'ttl': 60, 'grace': 60},
+                                                    project=self.project,
+                                                    limit=10)
+        self.assertEqual(5, len(list(messages)))
+
+
+@testing.requires_redis
+class RedisCompactClaimsTest(RedisClaimsTest):
+
+    def setUp(self):
+        super(RedisCompactClaimsTest, self).setUp()
+        self.config(options.MESSAGE_REDIS_GROUP,
+                    message_encoding='compact', compression_threshold=16)
+
 
 @testing.requires_redis
 class RedisSubscriptionTests(base.SubscriptionControllerTest):
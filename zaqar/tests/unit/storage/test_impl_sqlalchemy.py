@@ -12,9 +12,16 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
+import uuid
+
+from oslo_utils import timeutils
 import six
+import sqlalchemy as sa
 
+from zaqar import storage
+from zaqar.storage import errors
 from zaqar.storage import sqlalchemy
+from zaqar.storage.sqlalchemy import cache
 from zaqar.storage.sqlalchemy import controllers
 from zaqar.storage.sqlalchemy import tables
 from zaqar.storage.sqlalchemy import utils
@@ -56,6 +63,101 @@ class SqlalchemyFlavorsTest(DBCreateMixin, base.FlavorsControllerTest):
     control_driver_class = sqlalchemy.ControlDriver
 
 
+class SqlalchemyTableCacheTest(DBCreateMixin, base.ControllerBaseTest):
+    config_file = 'wsgi_sqlalchemy.conf'
+    driver_class = sqlalchemy.ControlDriver
+    controller_class = controllers.CatalogueController
+    controller_base_class = storage.CatalogueBase
+    control_driver_class = sqlalchemy.ControlDriver
+
+    def setUp(self):
+        super(SqlalchemyTableCacheTest, self).setUp()
+        self.controller = self.driver.catalogue_controller
+        self.project = six.text_type(uuid.uuid4())
+        self.queue = six.text_type(uuid.uuid4())
+        self.pool = str(uuid.uuid1())
+
+        self.driver.pools_controller.create(self.pool, 100, 'localhost')
+        self.addCleanup(self.driver.pools_controller.drop_all)
+        self.controller.insert(self.project, self.queue, self.pool)
+        self.addCleanup(self.controller.drop_all)
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def _move_entry(self, pool):
+        # NOTE: Writes the way another process would, the cache of this
+        # process not being aware of it.
+        stmt = sa.sql.update(tables.Catalogue).where(
+            tables.Catalogue.c.queue == self.queue
+        ).values(pool=pool)
+        self.driver.run(stmt)
+        cache.VersionedCache(self.driver, 1).invalidate('Catalogue')
+
+    def test_entries_are_cached(self):
+        entry = self.controller.get(self.project, self.queue)
+        self._move_entry(None)
+
+        self.assertEqual(entry, self.controller.get(self.project,
+                                                    self.queue))
+
+    def test_changes_are_seen_after_poll_interval(self):
+        self.controller.get(self.project, self.queue)
+        self._move_entry(None)
+
+        timeutils.advance_time_seconds(1)
+        entry = self.controller.get(self.project, self.queue)
+        self.assertIsNone(entry['pool'])
+
+    def test_own_writes_are_seen_right_away(self):
+        self.controller.get(self.project, self.queue)
+        self.controller.delete(self.project, self.queue)
+
+        self.assertRaises(errors.QueueNotMapped, self.controller.get,
+                          self.project, self.queue)
+
+    def test_missing_entries_are_not_cached(self):
+        # NOTE: Inserts the way another process would, the cache of this
+        # process not being aware of it.
+        queue = six.text_type(uuid.uuid4())
+        self.assertFalse(self.controller.exists(self.project, queue))
+
+        stmt = tables.Catalogue.insert().values(
+            project=self.project, queue=queue, pool=self.pool)
+        self.driver.run(stmt)
+        cache.VersionedCache(self.driver, 1).invalidate('Catalogue')
+
+        self.assertTrue(self.controller.exists(self.project, queue))
+
+    def test_missing_queues_are_not_cached(self):
+        queue_ctrl = self.driver.queue_controller
+        queue = six.text_type(uuid.uuid4())
+        self.assertFalse(queue_ctrl.exists(queue, self.project))
+
+        stmt = tables.Queues.insert().values(
+            project=self.project, name=queue,
+            metadata=utils.json_encode({}))
+        self.driver.run(stmt)
+        self.addCleanup(queue_ctrl.delete, queue, project=self.project)
+        cache.VersionedCache(self.driver, 1).invalidate('Queues')
+
+        self.assertTrue(queue_ctrl.exists(queue, self.project))
+
+    def test_cached_values_are_copies(self):
+        self.controller.get(self.project, self.queue)['pool'] = None
+
+        entry = self.controller.get(self.project, self.queue)
+        self.assertEqual(self.pool, entry['pool'])
+
+    def test_disabled(self):
+        self.driver.table_cache._poll_interval = 0
+        self.controller.get(self.project, self.queue)
+        self._move_entry(None)
+
+        entry = self.controller.get(self.project, self.queue)
+        self.assertIsNone(entry['pool'])
+
+
 class MsgidTests(testing.TestBase):
 
     def test_encode(self):
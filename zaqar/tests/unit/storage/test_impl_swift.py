@@ -10,10 +10,21 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import threading
+import uuid
+
+import futurist
+import mock
+from oslo_serialization import jsonutils
+import swiftclient
+
 from zaqar.common import cache as oslo_cache
 from zaqar.storage import mongodb
 from zaqar.storage.swift import controllers
 from zaqar.storage.swift import driver
+from zaqar.storage.swift import messages
+from zaqar.storage.swift import options
+from zaqar.storage.swift import utils
 from zaqar import tests as testing
 from zaqar.tests.unit.storage import base
 
@@ -55,3 +66,202 @@ class SwiftDriverTest(testing.TestBase):
                                          (self.conf, cache))
 
         self.assertTrue(swift_driver.is_alive())
+
+
+class SwiftUtilsTest(testing.TestBase):
+
+    def setUp(self):
+        super(SwiftUtilsTest, self).setUp()
+        self.executor = futurist.ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown, wait=False)
+
+    def test_filter_messages(self):
+        names = ['m%d' % n for n in range(8)]
+        threads = set()
+        fetched = []
+
+        def get_object(name):
+            threads.add(threading.current_thread().ident)
+            fetched.append(name)
+            if name == 'm2':
+                raise swiftclient.ClientException('gone', http_status=404)
+            obj = {'ttl': 60, 'body': name, 'claim_id': None}
+            headers = {'x-timestamp': '0',
+                       'x-object-meta-clientid': 'client'}
+            return headers, jsonutils.dumps(obj)
+
+        def list_objects(marker):
+            start = names.index(marker) + 1
+            return None, [{'name': name} for name in names[start:start + 4]]
+
+        def is_odd(obj, headers):
+            return int(obj['body'][1:]) % 2
+
+        marker = {}
+        messages = utils._filter_messages(
+            [{'name': name} for name in names[:4]], [is_odd], marker,
+            get_object, list_objects, limit=3, executor=self.executor)
+
+        self.assertEqual(['m0', 'm4', 'm6'], [m['id'] for m in messages])
+        self.assertEqual('m6', marker['next'])
+        self.assertNotIn(threading.current_thread().ident, threads)
+
+        # NOTE: No more objects are fetched than one at a time would.
+        self.assertEqual(names[:7], sorted(fetched))
+
+    def test_map_concurrently(self):
+        def square(n):
+            return n * n
+
+        self.assertEqual([0, 1, 4, 9], utils._map_concurrently(
+            self.executor, square, range(4)))
+
+        def fail(n):
+            if n == 2:
+                raise swiftclient.ClientException('boom', http_status=500)
+            return n
+
+        self.assertRaises(swiftclient.ClientException,
+                          utils._map_concurrently, self.executor, fail,
+                          range(4))
+
+    def test_claimed_count(self):
+        claim = {'content_type': utils._claim_content_type(3, 1000)}
+        self.assertEqual(3, utils._claimed_count(claim, 999))
+        self.assertEqual(0, utils._claimed_count(claim, 1000))
+
+        claim = {'content_type': 'application/json'}
+        self.assertEqual(0, utils._claimed_count(claim, 999))
+
+    def test_stats(self):
+        def get_container(container, limit=None, query_string=None,
+                          full_listing=False):
+            if container.startswith('zaqar_claim'):
+                return {}, [
+                    {'content_type': utils._claim_content_type(2, 2000)},
+                    {'content_type': utils._claim_content_type(4, 1000)},
+                ]
+
+            name = 'last' if query_string == 'reverse=on' else 'first'
+            return {'x-container-object-count': '5'}, [
+                {'name': name, 'last_modified': '1970-01-01T00:20:00.000000'}
+            ]
+
+        handler = messages.MessageQueueHandler.__new__(
+            messages.MessageQueueHandler)
+        handler._queue_ctrl = mock.Mock()
+        handler._client = mock.Mock()
+        handler._client.get_container.side_effect = get_container
+
+        with mock.patch('oslo_utils.timeutils.utcnow_ts', return_value=1500):
+            stats = handler.stats('q', project='p')['messages']
+
+        self.assertEqual(3, handler._client.get_container.call_count)
+        self.assertFalse(handler._client.head_object.called)
+
+        self.assertEqual(5, stats['total'])
+        self.assertEqual(2, stats['claimed'])
+        self.assertEqual(3, stats['free'])
+        self.assertEqual('first', stats['oldest']['id'])
+        self.assertEqual('last', stats['newest']['id'])
+        self.assertEqual(300, stats['newest']['age'])
+        self.assertEqual('1970-01-01T00:20:00Z', stats['newest']['created'])
+
+    def test_post(self):
+        controller = messages.MessageController.__new__(
+            messages.MessageController)
+        controller.driver = mock.Mock(executor=self.executor)
+        controller._client = mock.Mock()
+
+        # NOTE: Messages are listed in the order of their object names,
+        # which are generated by the calling thread, in order.
+        threads = []
+        slugs = [uuid.UUID(int=n) for n in range(5)]
+
+        def uuid1():
+            threads.append(threading.current_thread())
+            return slugs[len(threads) - 1]
+
+        with mock.patch('uuid.uuid1', side_effect=uuid1):
+            ids = controller.post('q', [{'ttl': 60, 'body': n}
+                                        for n in range(5)], 'client')
+
+        self.assertEqual([threading.current_thread()] * 5, threads)
+        self.assertEqual([str(slug) for slug in slugs], ids)
+
+        calls = controller._client.put_object.call_args_list
+        self.assertEqual(5, len(calls))
+        bodies = dict((call[0][1], jsonutils.loads(call[1]['contents']))
+                      for call in calls)
+        self.assertEqual(list(range(5)),
+                         [bodies[msg_id]['body'] for msg_id in ids])
+
+
+class SwiftClientWrapperTest(testing.TestBase):
+
+    def setUp(self):
+        super(SwiftClientWrapperTest, self).setUp()
+        self.conf.register_opts(options.MESSAGE_SWIFT_OPTIONS,
+                                group=options.MESSAGE_SWIFT_GROUP)
+        self.config(options.MESSAGE_SWIFT_GROUP, connection_pool_size=1)
+
+        patcher = mock.patch('swiftclient.Connection', autospec=True)
+        self.connection_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = driver._ClientWrapper(
+            self.conf[options.MESSAGE_SWIFT_GROUP])
+        self.client.session = mock.Mock()
+
+    def test_connections_are_reused(self):
+        self.client.head_container('c')
+        self.client.get_object('c', 'o')
+        self.assertEqual(1, self.connection_class.call_count)
+
+        connection = self.connection_class.return_value
+        connection.get_object.side_effect = swiftclient.ClientException(
+            'gone', http_status=404)
+        self.assertRaises(swiftclient.ClientException,
+                          self.client.get_object, 'c', 'o')
+        self.assertEqual(1, self.connection_class.call_count)
+        self.assertFalse(connection.close.called)
+
+        self.client.close()
+        connection.close.assert_called_once_with()
+
+    def test_broken_connections_are_closed(self):
+        connection = self.connection_class.return_value
+        connection.get_object.side_effect = IOError
+        self.assertRaises(IOError, self.client.get_object, 'c', 'o')
+        connection.close.assert_called_once_with()
+
+        connection.get_object.side_effect = None
+        self.client.get_object('c', 'o')
+        self.assertEqual(2, self.connection_class.call_count)
+
+    def test_pool_size(self):
+        threads = [threading.Thread(target=self.client.head_container,
+                                    args=('c',))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(self.client._idle))
+        self.assertEqual(self.connection_class.call_count - 1,
+                         self.connection_class.return_value.close.call_count)
+
+    def test_driver_close(self):
+        data_driver = driver.DataDriver.__new__(driver.DataDriver)
+        data_driver.swift_conf = self.conf[options.MESSAGE_SWIFT_GROUP]
+
+        with mock.patch('futurist.ThreadPoolExecutor') as executor_class:
+            data_driver.close()
+            self.assertFalse(executor_class.called)
+
+            data_driver.executor.submit(len, 'message')
+            data_driver.close()
+
+        executor_class.return_value.shutdown.assert_called_once_with(
+            wait=False)
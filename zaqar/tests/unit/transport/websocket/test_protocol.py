@@ -92,3 +92,25 @@ class TestMessagingProtocol(base.TestBase):
         self.protocol.onMessage(req, in_binary)
         resp = loads(send_mock.call_args[0][0])
         self.assertEqual(200, resp['headers']['status'])
+
+    def test_on_message_wait_failure(self):
+        dumps, loads, create_req = test_utils.get_pack_tools(binary=False)
+        body = {'queue_name': 'waiting-queue', 'wait': 1}
+        req = create_req('message_list', body, self.headers)
+        send_mock = mock.Mock()
+        self.protocol.sendMessage = send_mock
+
+        # NOTE: Run the worker right away, in the calling thread.
+        loop = mock.Mock()
+        loop.run_in_executor.side_effect = lambda executor, func: func()
+        loop.call_soon_threadsafe.side_effect = (
+            lambda func, *args: func(*args))
+        self.protocol._loop = loop
+
+        with mock.patch.object(self.protocol._handler, 'process_request',
+                               side_effect=RuntimeError('boom')):
+            self.protocol.onMessage(req, False)
+
+        resp = loads(send_mock.call_args[0][0])
+        self.assertEqual(500, resp['headers']['status'])
+        self.assertIn('error', resp['body'])
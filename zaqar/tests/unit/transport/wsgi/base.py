@@ -99,8 +99,15 @@ class TestBase(testing.TestBase):
             self.srmock.status = falcon.HTTP_400
             return
 
-        return self.app(ftest.create_environ(path=path, **kwargs),
-                        self.srmock)
+        result = self.app(ftest.create_environ(path=path, **kwargs),
+                          self.srmock)
+
+        # NOTE: Streamed responses are consumed here so that tests can
+        # handle them like any other response.
+        if not isinstance(result, list):
+            result = [b''.join(result)]
+
+        return result
 
     def simulate_get(self, *args, **kwargs):
         """Simulate a GET request."""
@@ -187,3 +187,20 @@ class TestUtils(testtools.TestCase):
         length = None
         self.assertRaises(falcon.HTTPBadRequest,
                           utils.deserialize, stream, length)
+
+    def test_stream_json_list(self):
+        items = [{'id': 1, 'body': u'☃'}, {'id': 2, 'body': None}]
+        trailers = [('links', lambda: [{'rel': 'next'}])]
+
+        chunks = list(utils.stream_json_list('messages', iter(items),
+                                             trailers))
+        self.assertEqual(len(items) + 2, len(chunks))
+
+        doc = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual({'messages': items, 'links': [{'rel': 'next'}]},
+                         doc)
+
+    def test_stream_json_list_empty(self):
+        chunks = utils.stream_json_list('messages', [])
+        doc = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual({'messages': []}, doc)
@@ -76,6 +76,12 @@ _TRANSPORT_LIMITS_OPTIONS = (
                deprecated_group='limits:transport',
                help='Defines the maximum message grace period in seconds.'),
 
+    cfg.IntOpt('max_message_wait', default=20, min=0,
+               help=('Maximum number of seconds a request listing or '
+                     'claiming messages may wait for messages to be '
+                     'available, with the "wait" parameter. Waiting '
+                     'requests hold on to an API worker.')),
+
     cfg.ListOpt('subscriber_types', default=['http', 'https', 'mailto',
                                              'trust+http', 'trust+https'],
                 help='Defines supported subscriber types.'),
@@ -470,6 +476,21 @@ class Validator(object):
             raise ValidationFailed(
                 msg, self._limits_conf.max_messages_per_page)
 
+    def message_wait(self, wait):
+        """Restrictions on the time spent waiting for messages.
+
+        :param wait: Number of seconds to wait for messages to be
+            available, or None
+        :raises ValidationFailed: if the wait is out of range
+        """
+
+        uplimit = self._limits_conf.max_message_wait
+        if wait is not None and not (0 <= wait <= uplimit):
+            msg = _(u'Wait must be at least 0 and may not '
+                    'be greater than {0}.')
+
+            raise ValidationFailed(msg, uplimit)
+
     def message_deletion(self, ids=None, pop=None):
         """Restrictions involving deletion of messages.
 
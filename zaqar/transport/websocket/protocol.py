@@ -113,7 +113,7 @@ class MessagingProtocol(websocket.WebSocketServerProtocol):
                     if 'URL-Signature' in payload.get('headers', {}):
                         if self._handler.verify_signature(
                                 self.factory._secret_key, payload):
-                            resp = self._handler.process_request(req, self)
+                            resp = self._process_request(req, isBinary)
                         else:
                             body = {'error': 'Not authentified.'}
                             resp = self._handler.create_response(
@@ -126,7 +126,11 @@ class MessagingProtocol(websocket.WebSocketServerProtocol):
             elif payload.get('action') == 'authenticate':
                 return self._authenticate(payload, isBinary)
             else:
-                resp = self._handler.process_request(req, self)
+                resp = self._process_request(req, isBinary)
+            if resp is None:
+                # NOTE: The response is sent once the request has been
+                # processed in the background.
+                return
             if payload.get('action') == consts.SUBSCRIPTION_CREATE:
                 # NOTE(Eva-i): this will make further websocket
                 # notifications encoded in the same format as the last
@@ -145,6 +149,27 @@ class MessagingProtocol(websocket.WebSocketServerProtocol):
         self.factory.unregister(self.proto_id)
         LOG.info("WebSocket connection closed: %s", reason)
 
+    def _process_request(self, req, in_binary):
+        # NOTE: Requests waiting for messages are processed in a worker
+        # thread so that they do not block the other connections.
+        if not req._body.get('wait'):
+            return self._handler.process_request(req, self)
+
+        def process():
+            try:
+                resp = self._handler.process_request(req, self)
+            except Exception as ex:
+                # NOTE: Nothing waits for the worker, so the client has
+                # to be told about the failure here.
+                LOG.exception(ex)
+                body = {'error': 'Unexpected error.'}
+                resp = self._handler.create_response(500, body, req)
+
+            self._loop.call_soon_threadsafe(self._send_response,
+                                            resp, in_binary)
+
+        self._loop.run_in_executor(None, process)
+
     def _authenticate(self, payload, in_binary):
         self._auth_in_binary = in_binary
         self._auth_app = self._auth_strategy(self._auth_start)
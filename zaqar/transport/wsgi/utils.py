@@ -16,6 +16,7 @@ import falcon
 import jsonschema
 
 from oslo_log import log as logging
+from oslo_utils import encodeutils
 import six
 
 from zaqar.i18n import _
@@ -217,6 +218,37 @@ def validate(validator, document):
         )
 
 
+def stream_json_list(name, items, trailers=()):
+    """Serializes a JSON object holding a list, one item at a time.
+
+    Allows large responses to be sent as they are serialized, rather
+    than first building them up in memory. The output is the same as
+    serializing the whole object at once.
+
+    :param name: Name of the member holding the list
+    :param items: Iterable of JSON-serializable items
+    :param trailers: Sequence of (name, callable) tuples for the
+        members that follow the list. The callables are only called
+        once all items have been serialized, so the value they return
+        may depend on the items.
+    :returns: Generator of UTF-8 encoded chunks
+    """
+
+    yield encodeutils.safe_encode(u'{%s: [' % utils.to_json(name))
+
+    separator = b''
+    for item in items:
+        yield separator + encodeutils.safe_encode(utils.to_json(item))
+        separator = b', '
+
+    chunk = b']'
+    for member, get_value in trailers:
+        chunk += (b', ' + encodeutils.safe_encode(utils.to_json(member)) +
+                  b': ' + encodeutils.safe_encode(utils.to_json(get_value())))
+
+    yield chunk + b'}'
+
+
 def message_url(message, base_path, claim_id=None):
     path = "/".join([base_path, 'messages', message['id']])
     if claim_id:
@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+
 import falcon
 from oslo_log import log as logging
 import six
@@ -104,9 +106,11 @@ class CollectionResource(object):
                 client_uuid=client_uuid,
                 **kwargs)
 
-            # Buffer messages
-            cursor = next(results)
-            messages = list(cursor)
+            # NOTE: Messages are streamed to the client as they are
+            # fetched, but the first one is fetched right away so that
+            # storage errors can still be turned into an error response.
+            cursor = iter(next(results))
+            first = next(cursor, None)
 
         except validation.ValidationFailed as ex:
             LOG.debug(ex)
@@ -114,37 +118,37 @@ class CollectionResource(object):
 
         except storage_errors.QueueDoesNotExist as ex:
             LOG.debug(ex)
-            messages = None
+            first = None
 
         except Exception as ex:
             LOG.exception(ex)
             description = _(u'Messages could not be listed.')
             raise wsgi_errors.HTTPServiceUnavailable(description)
 
-        if not messages:
-            messages = []
-
-        else:
+        messages = []
+        if first is not None:
             # Found some messages, so prepare the response
-            kwargs['marker'] = next(results)
             base_path = req.path.rsplit('/', 1)[0]
-            messages = [wsgi_utils.format_message_v1_1(m, base_path,
+            messages = (wsgi_utils.format_message_v1_1(m, base_path,
                                                        m['claim_id'])
-                        for m in messages]
+                        for m in itertools.chain([first], cursor))
+
+        def links():
+            if first is None:
+                return []
 
-        links = []
-        if messages:
-            links = [
+            # NOTE: The marker is only known once all the messages of
+            # the page have been listed.
+            kwargs['marker'] = next(results)
+            return [
                 {
                     'rel': 'next',
                     'href': req.path + falcon.to_query_str(kwargs)
                 }
             ]
 
-        return {
-            'messages': messages,
-            'links': links
-        }
+        return wsgi_utils.stream_json_list('messages', messages,
+                                           [('links', links)])
 
     # ----------------------------------------------------------------------
     # Interface
@@ -216,11 +220,11 @@ class CollectionResource(object):
         ids = req.get_param_as_list('ids')
 
         if ids is None:
-            response = self._get(req, project_id, queue_name)
+            resp.stream = self._get(req, project_id, queue_name)
+            return
 
-        else:
-            response = self._get_by_id(req.path.rsplit('/', 1)[0], project_id,
-                                       queue_name, ids)
+        response = self._get_by_id(req.path.rsplit('/', 1)[0], project_id,
+                                   queue_name, ids)
 
         if response is None:
             # NOTE(TheSriram): Trying to get a message by id, should
@@ -61,6 +61,7 @@ class CollectionResource(object):
         # Check for an explicit limit on the # of messages to claim
         limit = req.get_param_as_int('limit')
         claim_options = {} if limit is None else {'limit': limit}
+        wait = req.get_param_as_int('wait')
 
         # NOTE(kgriffs): Clients may or may not actually include the
         # Content-Length header when the body is empty; the following
@@ -74,10 +75,7 @@ class CollectionResource(object):
             document = wsgi_utils.deserialize(req.stream, req.content_length)
             metadata = wsgi_utils.sanitize(document, self._claim_post_spec)
 
-        # Claim some messages
-        try:
-            self._validate.claim_creation(metadata, limit=limit)
-
+        def claim_messages():
             cid, msgs = self._claim_controller.create(
                 queue_name,
                 metadata=metadata,
@@ -87,6 +85,22 @@ class CollectionResource(object):
             # Buffer claimed messages
             # TODO(kgriffs): optimize, along with serialization (below)
             resp_msgs = list(msgs)
+            if resp_msgs:
+                return cid, resp_msgs
+
+        # Claim some messages
+        try:
+            self._validate.claim_creation(metadata, limit=limit)
+            self._validate.message_wait(wait)
+
+            if wait:
+                claimed = self._claim_controller.long_poll(
+                    queue_name, claim_messages, project=project_id,
+                    timeout=wait)
+            else:
+                claimed = claim_messages()
+
+            cid, resp_msgs = claimed or (None, [])
 
         except validation.ValidationFailed as ex:
             LOG.debug(ex)